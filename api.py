@@ -1,22 +1,40 @@
+from fastapi import WebSocket, WebSocketDisconnect, Query
 from fastapi.routing import APIRouter
-from extraction.lidar_ex import read_lidar_from_folder
-from extraction.image_ex import read_images_from_folder
-from extraction.imu_gps import read_imu, read_gps
-from extraction.sync import synchronize_data
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import Response, StreamingResponse, PlainTextResponse
 from config import settings, get_logger
-from projection.calibrate import visualize_lidar_on_image
-import json
+from metrics import metrics
+import time
+import asyncio
+import importlib
 import traceback
 
+#numpy, pandas, scipy and cv2 come in through the extraction/projection/jobs modules, which are
+#imported inside the endpoints that use them so a worker starts (and answers /healthz) without them
 router = APIRouter()
 logger = get_logger(__name__)
 
+async def import_module(name:str):
+    """Imports a module for an async endpoint on the threadpool, the first import can take a second"""
+    return await run_in_threadpool(importlib.import_module, name)
+
+@router.get("/healthz")
+async def healthz():
+    """ Liveness check, answers without loading any of the data processing libraries """
+    return {"message": "ok", 'success': True}
+
 @router.get("/project-lidar")
-async def calibrate_and_project_lidar(frame_number:str):
-    """ Accepts a frame number and projects the Lidar points onto the image """
+def calibrate_and_project_lidar(frame_number:str, radius:int = Query(0, ge=0, le=settings.OVERLAY_MAX_RADIUS), blend:str = 'overwrite', image_format:str = None):
+    """ Accepts a frame number and projects the Lidar points onto the image.
+    With image_format (png/jpeg) the encoded image is returned in the response instead of a path """
     logger.info(f'API project-lidar called with: {frame_number}')
     try:
-        output_path = visualize_lidar_on_image(frame_number)
+        from projection.calibrate import visualize_lidar_on_image, encode_overlay
+        if image_format:
+            encoded = encode_overlay(frame_number, image_format, radius=radius, blend=blend)
+            media_type = 'image/png' if image_format.lower() == 'png' else 'image/jpeg'
+            return Response(content=encoded, media_type=media_type)
+        output_path = visualize_lidar_on_image(frame_number, radius=radius, blend=blend)
         return {"message": "LiDAR points projected onto the image", 'success': True, 'data': {'output_image': output_path}}
     except FileNotFoundError as e:
         msg = "\nFrame number should be a numeric string , e.g: 0,1,2\n and file should be named as a 0 padded 10 digit numeric string"
@@ -25,31 +43,61 @@ async def calibrate_and_project_lidar(frame_number:str):
     except Exception as e:
         return {"message": str(e), 'success': False}
     
-@router.get("/synchronize-sensor")
-async def extract_synchronize(folder_path: str = None):
-    """ Accepts a folder path, parses and synchronizes the sensor data """
-    lidar_path = folder_path + settings.LIDAR_DIR
-    lidar_parsed_path = folder_path + settings.LIDAR_OUT_DIR
-    image_path = folder_path + settings.IMAGE_DIR
-    image_parsed_path = folder_path + settings.IMAGES_OUT_DIR
-    imu_path = folder_path + settings.IMU_PATH
-    gps_path = folder_path + settings.GPS_PATH
-
-    try:
-        logger.info(f'API synchronize-sensor called with: {folder_path} \nCreating Lidar parsed output')
-        lidar_dict = read_lidar_from_folder(lidar_path, lidar_parsed_path)
-        
-        logger.info('Creating Image parsed output')
-        image_dict = read_images_from_folder(image_path, image_parsed_path)
+@router.get("/project-lidar/depth")
+def project_lidar_depth(frame_number: str, output_format: str = 'png', colormap: str = 'jet', color_by: str = 'depth'):
+    """ Sparse z-buffered depth map of a frame, nearest LiDAR return per pixel.
+    output_format: 'png' (uint16, meters * 256, 0 = no return), 'npy' (float32 meters)
+    or 'colormap' (camera image with the points colored by depth or reflectance) """
+    logger.info(f'API project-lidar/depth called with: {frame_number}')
+    try:
+        from projection.depth import export_depth, DEPTH_PNG_SCALE
+        content = export_depth(frame_number, output_format, colormap=colormap, color_by=color_by)
+        if output_format == 'npy':
+            return Response(content=content, media_type='application/octet-stream')
+        headers = {'X-Depth-Scale': str(DEPTH_PNG_SCALE)} if output_format == 'png' else None
+        return Response(content=content, media_type='image/png', headers=headers)
+    except Exception as e:
+        logger.info(f'Error: {traceback.format_exc()}')
+        return {"message": str(e), 'success': False}
+
+@router.get("/project-lidar/sequence")
+def project_lidar_sequence(start: int, end: int, output_format: str = 'mp4', fps: float = None, radius: int = Query(0, ge=0, le=settings.OVERLAY_MAX_RADIUS), blend: str = 'overwrite'):
+    """ Renders the overlay for frames start..end (inclusive) on the shared render process pool
+    into an MP4 or a numbered png/jpeg image set in BONUS_OUT_DIR """
+    logger.info(f'API project-lidar/sequence called with: {start}..{end}')
+    try:
+        from projection.sequence import render_sequence
+        data = render_sequence(
+            start, end, output_format=output_format, fps=fps or settings.SEQUENCE_FPS, radius=radius, blend=blend,
+            max_workers=settings.SEQUENCE_WORKERS or None, prefetch=settings.SEQUENCE_PREFETCH,
+        )
+        return {"message": f"Rendered {data['frames']} frames", 'success': True, 'data': data}
+    except Exception as e:
+        logger.info(f'Error: {traceback.format_exc()}')
+        return {"message": str(e), 'success': False}
 
-        #lidar_dict = {1701985839.321918: 'data_q123/lidarout/lidar_1701985839_321918010.npy', 1701985839.3622098: 'data_q123/lidarout/lidar_1701985839_362209796.npy', 1701985839.4104006: 'data_q123/lidarout/lidar_1701985839_410400629.npy', 1701985839.46123: 'data_q123/lidarout/lidar_1701985839_461230039.npy', 1701985839.5114465: 'data_q123/lidarout/lidar_1701985839_511446475.npy', 1701985839.571546: 'data_q123/lidarout/lidar_1701985839_571546077.npy', 1701985839.6105914: 'data_q123/lidarout/lidar_1701985839_610591411.npy', 1701985839.6685147: 'data_q123/lidarout/lidar_1701985839_668514728.npy', 1701985839.71749: 'data_q123/lidarout/lidar_1701985839_717489957.npy', 1701985839.768327: 'data_q123/lidarout/lidar_1701985839_768326997.npy', 1701985839.8149107: 'data_q123/lidarout/lidar_1701985839_814910650.npy', 1701985839.8614798: 'data_q123/lidarout/lidar_1701985839_861479759.npy', 1701985839.9191844: 'data_q123/lidarout/lidar_1701985839_919184446.npy', 1701985839.9638753: 'data_q123/lidarout/lidar_1701985839_963875293.npy', 1701985840.0157256: 'data_q123/lidarout/lidar_1701985840_015725612.npy', 1701985840.0639946: 'data_q123/lidarout/lidar_1701985840_063994646.npy', 1701985840.1129212: 'data_q123/lidarout/lidar_1701985840_112921237.npy', 1701985840.1668463: 'data_q123/lidarout/lidar_1701985840_166846275.npy', 1701985840.2096665: 'data_q123/lidarout/lidar_1701985840_209666490.npy', 1701985840.2733428: 'data_q123/lidarout/lidar_1701985840_273342847.npy'}
-        #image_dict = {1701985839.6339679: 'data_q123/imagesout/image_1701985839_633967876.npy', 1701985839.7861893: 'data_q123/imagesout/image_1701985839_786189317.npy', 1701985839.9321508: 'data_q123/imagesout/image_1701985839_932150840.npy', 1701985840.0315874: 'data_q123/imagesout/image_1701985840_031587362.npy', 1701985840.1424825: 'data_q123/imagesout/image_1701985840_142482519.npy', 1701985840.246012: 'data_q123/imagesout/image_1701985840_246011972.npy', 1701985840.3654428: 'data_q123/imagesout/image_1701985840_365442752.npy', 1701985840.4922056: 'data_q123/imagesout/image_1701985840_492205619.npy', 1701985840.5944946: 'data_q123/imagesout/image_1701985840_594494581.npy', 1701985840.7037158: 'data_q123/imagesout/image_1701985840_703715801.npy'}
+@router.get("/synchronize-sensor")
+async def extract_synchronize(folder_path: str = None, lidar_storage: str = None, output_format: str = 'json'):
+    """ Accepts a folder path, parses and synchronizes the sensor data.
+    output_format: 'json' (single body), 'ndjson' (streamed in chunks) or 'npz' (one array per field) """
+    try:
+        if output_format not in ('json', 'ndjson', 'npz'):
+            raise ValueError(f"Unknown output format: {output_format}, expected json, ndjson or npz")
+        logger.info(f'API synchronize-sensor called with: {folder_path}')
+        jobs = await import_module('jobs')
+        output = await import_module('extraction.output')
+        #runs on the sync job pool, so it never overlaps a job for the same folder and waiting holds no thread
+        synchronized_df = await asyncio.wrap_future(jobs.job_manager.submit_inline(folder_path, lidar_storage))
+        if output_format == 'ndjson':
+            return StreamingResponse(output.iter_ndjson(synchronized_df, settings.SYNC_STREAM_CHUNK_SIZE), media_type='application/x-ndjson')
+        if output_format == 'npz':
+            return Response(
+                content=await run_in_threadpool(output.to_npz, synchronized_df),
+                media_type='application/octet-stream',
+                headers={'Content-Disposition': 'attachment; filename="synchronized_data.npz"'}
+            )
 
-        imu_data = read_imu(imu_path)
-        gps_data = read_gps(gps_path)
-            
-        logger.info('Synchronizing data')
-        data = synchronize_data(lidar_dict,image_dict, imu_data, gps_data)
+        data = await run_in_threadpool(lambda: list(output.iter_records(synchronized_df, settings.SYNC_STREAM_CHUNK_SIZE)))
         # writing synchronized data to a file
         # with open(settings.SYNC_DATA_OUT_PATH, 'w') as f:
         #     json.dump(data, f, indent=4)
@@ -58,4 +106,148 @@ async def extract_synchronize(folder_path: str = None):
     
     except Exception as e:
         logger.info(f'Error: {traceback.format_exc()}')
-        return {"message": str(e), 'success': False}
\ No newline at end of file
+        return {"message": str(e), 'success': False}
+
+@router.websocket("/synchronize-sensor/live")
+async def live_synchronize(websocket: WebSocket, folder_path: str, lidar_storage: str = None):
+    """ Synchronizes a folder that is still being recorded, sending every record as a JSON text message
+    once all sensors are past its timestamp. Ends after LIVE_IDLE_TIMEOUT seconds without new records. """
+    await websocket.accept()
+    logger.info(f'API synchronize-sensor/live called with: {folder_path}')
+    try:
+        live = await import_module('extraction.live')
+        from extraction.output import dumps_record
+        synchronizer = live.make_live_synchronizer(folder_path, lidar_storage)
+        last_data = time.time()
+        while True:
+            records = await run_in_threadpool(synchronizer.poll)
+            for record in records:
+                await websocket.send_text(dumps_record(record))
+            if records:
+                last_data = time.time()
+            elif time.time() - last_data >= settings.LIVE_IDLE_TIMEOUT:
+                break
+            await asyncio.sleep(settings.LIVE_POLL_INTERVAL)
+        for record in await run_in_threadpool(synchronizer.flush):
+            await websocket.send_text(dumps_record(record))
+        await websocket.close()
+    except WebSocketDisconnect:
+        logger.info(f'Live sync client for {folder_path} disconnected')
+    except Exception as e:
+        logger.info(f'Error: {traceback.format_exc()}')
+        await websocket.send_json({"message": str(e), 'success': False})
+        await websocket.close()
+
+@router.post("/synchronize-sensor/jobs")
+async def create_synchronize_job(folder_path: str, lidar_storage: str = None):
+    """ Queues a background synchronize-sensor run, an active job for the same folder is reused """
+    logger.info(f'API synchronize-sensor job requested for: {folder_path}')
+    try:
+        jobs = await import_module('jobs')
+        job, created = jobs.job_manager.submit(folder_path, lidar_storage)
+        message = "Sync job created" if created else "Sync job already running for this folder"
+        return {"message": message, 'success': True, 'data': job.status()}
+    except Exception as e:
+        logger.info(f'Error: {traceback.format_exc()}')
+        return {"message": str(e), 'success': False}
+
+@router.get("/synchronize-sensor/jobs/{job_id}")
+async def get_synchronize_job(job_id: str, include_data: bool = False):
+    """ Returns status, per stage progress and, once done, the result of a sync job """
+    jobs = await import_module('jobs')
+    job = jobs.job_manager.get(job_id)
+    if job is None:
+        return {"message": f"Unknown job: {job_id}", 'success': False}
+    return {"message": f"Job {job.state}", 'success': True, 'data': job.status(include_data=include_data)}
+
+@router.get("/frames")
+def frames_in_range(folder: str, start: float = None, end: float = None, limit: int = 100):
+    """ Returns synchronized records with start <= timestamp <= end from the folder's sync index """
+    try:
+        from extraction.sync_index import load_sync_index, query_range
+        index = load_sync_index(folder + settings.SYNC_INDEX_PATH)
+        data = query_range(index, start, end, limit)
+        return {"message": f"{len(data)} frames found", 'success': True, 'data': data}
+    except Exception as e:
+        logger.info(f'Error: {traceback.format_exc()}')
+        return {"message": str(e), 'success': False}
+
+@router.get("/frames/nearest")
+def frame_nearest(folder: str, t: float):
+    """ Returns the synchronized record closest in time to t from the folder's sync index """
+    try:
+        from extraction.sync_index import load_sync_index, query_nearest
+        index = load_sync_index(folder + settings.SYNC_INDEX_PATH)
+        data = query_nearest(index, t)
+        if data is None:
+            return {"message": "Sync index is empty", 'success': False}
+        return {"message": "Nearest frame found", 'success': True, 'data': data}
+    except Exception as e:
+        logger.info(f'Error: {traceback.format_exc()}')
+        return {"message": str(e), 'success': False}
+
+@router.get("/frames/near")
+def frames_near(folder: str, lat: float, lon: float, radius_m: float, limit: int = 100):
+    """ Returns synchronized records within radius_m meters of (lat, lon), nearest first, with their distance_m """
+    try:
+        if radius_m < 0:
+            raise ValueError("radius_m must be >= 0")
+        from extraction.sync_index import load_sync_index
+        from extraction.geo_index import load_geo_index, query_radius
+        index = load_sync_index(folder + settings.SYNC_INDEX_PATH)
+        geo = load_geo_index(folder + settings.GEO_INDEX_PATH)
+        data = query_radius(index, geo, lat, lon, radius_m, limit)
+        return {"message": f"{len(data)} frames found", 'success': True, 'data': data}
+    except Exception as e:
+        logger.info(f'Error: {traceback.format_exc()}')
+        return {"message": str(e), 'success': False}
+
+@router.get("/frames/bbox")
+def frames_in_bbox(folder: str, min_lat: float, min_lon: float, max_lat: float, max_lon: float, limit: int = 100):
+    """ Returns synchronized records whose GPS position is inside the bounding box, in time order """
+    try:
+        if min_lat > max_lat or min_lon > max_lon:
+            raise ValueError("Bounding box min_lat/min_lon must not exceed max_lat/max_lon")
+        from extraction.sync_index import load_sync_index
+        from extraction.geo_index import load_geo_index, query_bbox
+        index = load_sync_index(folder + settings.SYNC_INDEX_PATH)
+        geo = load_geo_index(folder + settings.GEO_INDEX_PATH)
+        data = query_bbox(index, geo, min_lat, min_lon, max_lat, max_lon, limit)
+        return {"message": f"{len(data)} frames found", 'success': True, 'data': data}
+    except Exception as e:
+        logger.info(f'Error: {traceback.format_exc()}')
+        return {"message": str(e), 'success': False}
+
+@router.get("/frames/lidar")
+def frame_lidar(folder: str, t: float, lod: int = 0, output_format: str = 'npy'):
+    """ Returns the LiDAR sweep of the synchronized record closest in time to t at a level of detail.
+    lod 0 is the full sweep, lod i is voxel downsampled with the i-th of LIDAR_LOD_VOXEL_SIZES.
+    output_format: 'npy' ((N, 4) float32 array) or 'json' """
+    try:
+        if output_format not in ('npy', 'json'):
+            raise ValueError(f"Unknown output format: {output_format}, expected npy or json")
+        import numpy as np
+        from extraction.output import to_npy
+        from extraction.sync_index import load_sync_index, query_nearest
+        from extraction.voxel import load_record_lod
+        index = load_sync_index(folder + settings.SYNC_INDEX_PATH)
+        record = query_nearest(index, t)
+        if record is None:
+            return {"message": "Sync index is empty", 'success': False}
+        points = load_record_lod(record, lod, settings.LIDAR_LOD_VOXEL_SIZES, settings.LIDAR_LOD_MODE)
+        if output_format == 'npy':
+            return Response(
+                content=to_npy(np.ascontiguousarray(points)),
+                media_type='application/octet-stream',
+                headers={'X-Frame-Timestamp': str(record['timestamp']), 'X-Points': str(len(points))}
+            )
+        data = {'timestamp': record['timestamp'], 'lod': lod, 'points': np.asarray(points).tolist()}
+        return {"message": f"{len(points)} points", 'success': True, 'data': data}
+    except Exception as e:
+        logger.info(f'Error: {traceback.format_exc()}')
+        return {"message": str(e), 'success': False}
+
+@router.get("/metrics")
+async def get_metrics():
+    """ Stage timings, throughput, bytes read/written and queue depths in the Prometheus text format """
+    return PlainTextResponse(metrics.render(), media_type='text/plain; version=0.0.4')
\ No newline at end of file
@@ -0,0 +1,76 @@
+import time
+import argparse
+import numpy as np
+from config import settings
+from benchmarks.bench_overlay import best_of
+from extraction.geo_index import build_geo_index, haversine_m, query_radius, query_bbox
+
+def synthetic_track(rows:int, seed:int = 0)->dict:
+    """Sync index columns for a random walk ride around Atlanta, one GPS fix per record, some missing"""
+    rng = np.random.default_rng(seed)
+    heading = np.cumsum(rng.normal(0, 0.05, rows))
+    step = rng.uniform(0.2, 0.6, rows)  #meters per record
+    north = np.cumsum(step * np.cos(heading))
+    east = np.cumsum(step * np.sin(heading))
+    latitude = 33.7756 + np.degrees(north / 6371008.8)
+    longitude = -84.3963 + np.degrees(east / (6371008.8 * np.cos(np.radians(33.7756))))
+    missing = rng.random(rows) < 0.01
+    latitude[missing] = np.nan
+    longitude[missing] = np.nan
+    return {"timestamp": 1701985839.0 + np.arange(rows) * 0.1, "latitude": latitude, "longitude": longitude}
+
+def scan_radius(index:dict, lat:float, lon:float, radius_m:float)->np.ndarray:
+    distances = haversine_m(index["latitude"], index["longitude"], lat, lon)
+    rows = np.flatnonzero(distances <= radius_m)
+    return rows[np.lexsort((rows, distances[rows]))]
+
+def scan_bbox(index:dict, min_lat:float, min_lon:float, max_lat:float, max_lon:float)->np.ndarray:
+    latitude, longitude = index["latitude"], index["longitude"]
+    return np.flatnonzero((latitude >= min_lat) & (latitude <= max_lat) & (longitude >= min_lon) & (longitude <= max_lon))
+
+def run(rows:int, queries:int, radius_m:float, cell_m:float, repeat:int)->dict:
+    """Build time of the grid index and per query time against a full scan, checking both return the same rows"""
+    index = synthetic_track(rows)
+    t = time.perf_counter()
+    geo = build_geo_index(index["latitude"], index["longitude"], cell_m)
+    build_s = time.perf_counter() - t
+
+    rng = np.random.default_rng(1)
+    positioned = np.flatnonzero(np.isfinite(index["latitude"]))
+    centers = [(float(index["latitude"][i]), float(index["longitude"][i])) for i in rng.choice(positioned, queries)]
+    span = np.degrees(radius_m / 6371008.8)
+    boxes = [(lat - span, lon - span, lat + span, lon + span) for lat, lon in centers]
+
+    matches = 0
+    for (lat, lon), box in zip(centers, boxes):
+        near = [record["frame_index"] for record in query_radius(index, geo, lat, lon, radius_m)]
+        assert near == scan_radius(index, lat, lon, radius_m).tolist(), f"radius query differs at {lat}, {lon}"
+        inside = [record["frame_index"] for record in query_bbox(index, geo, *box)]
+        assert inside == scan_bbox(index, *box).tolist(), f"bbox query differs for {box}"
+        matches += len(near)
+
+    return {
+        "rows": rows,
+        "build_s": build_s,
+        "mean_matches": matches / queries,
+        #limit=0 times the lookup without building the records, which both sides would pay
+        "radius_index_ms": 1000 * best_of(lambda: [query_radius(index, geo, lat, lon, radius_m, 0) for lat, lon in centers], repeat) / queries,
+        "radius_scan_ms": 1000 * best_of(lambda: [scan_radius(index, lat, lon, radius_m) for lat, lon in centers], repeat) / queries,
+        "bbox_index_ms": 1000 * best_of(lambda: [query_bbox(index, geo, *box, limit=0) for box in boxes], repeat) / queries,
+        "bbox_scan_ms": 1000 * best_of(lambda: [scan_bbox(index, *box) for box in boxes], repeat) / queries,
+    }
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Compare the grid geo index against a full scan of the sync index")
+    parser.add_argument('--rows', type=int, nargs='+', default=[10000, 100000, 1000000])
+    parser.add_argument('--queries', type=int, default=50)
+    parser.add_argument('--radius', type=float, default=50.0, help="query radius / half bbox size in meters")
+    parser.add_argument('--cell', type=float, default=settings.GEO_CELL_METERS, help="grid cell size in meters")
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    for rows in args.rows:
+        r = run(rows, args.queries, args.radius, args.cell, args.repeat)
+        print(f"{r['rows']} records (build {r['build_s'] * 1000:.0f} ms, {r['mean_matches']:.0f} matches per query, identical to scan): "
+              f"radius {r['radius_index_ms']:.3f} ms vs scan {r['radius_scan_ms']:.2f} ms ({r['radius_scan_ms'] / r['radius_index_ms']:.1f}x), "
+              f"bbox {r['bbox_index_ms']:.3f} ms vs scan {r['bbox_scan_ms']:.2f} ms ({r['bbox_scan_ms'] / r['bbox_index_ms']:.1f}x)")
@@ -0,0 +1,71 @@
+import os
+import sys
+import time
+import argparse
+import subprocess
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY = ('numpy', 'pandas', 'scipy', 'cv2')
+#what importing main used to pull in: every module behind an endpoint, and scipy through extraction.sync
+ENDPOINT_MODULES = (
+    'extraction.pipeline', 'extraction.output', 'extraction.sync_index', 'extraction.geo_index', 'extraction.voxel',
+    'extraction.live', 'jobs', 'projection.calibrate', 'projection.sequence', 'projection.depth', 'scipy.interpolate',
+)
+
+def parse_importtime(stderr:str)->dict:
+    """(self, cumulative) microseconds and nesting depth per module from python -X importtime output"""
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        name = name.rstrip()
+        #the indent is the nesting depth, only top level imports add up to the total
+        depth = (len(name) - len(name.lstrip())) // 2
+        modules.setdefault(name.strip(), (int(self_us), int(cumulative_us), depth))
+    return modules
+
+def cold_import(modules:tuple)->dict:
+    """Imports main plus modules in a fresh interpreter, returns import time totals in seconds"""
+    code = '; '.join(f'import {name}' for name in ('main',) + modules)
+    env = dict(os.environ, PYTHONPATH=ROOT + os.pathsep + os.environ.get('PYTHONPATH', ''))
+    t = time.perf_counter()
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], cwd=ROOT, env=env, capture_output=True, text=True, check=True)
+    wall_s = time.perf_counter() - t
+    modules = parse_importtime(result.stderr)
+    #a library's cost is the self time of all its submodules, wherever in the tree they were first imported
+    heavy = {lib: sum(self_us for name, (self_us, _, _) in modules.items() if name == lib or name.startswith(lib + '.')) for lib in HEAVY}
+    return {
+        'wall_s': wall_s,
+        'import_s': sum(cumulative_us for _, cumulative_us, depth in modules.values() if depth == 0) / 1e6,
+        'main_s': modules['main'][1] / 1e6,
+        'heavy': {lib: us / 1e6 for lib, us in heavy.items() if us},
+    }
+
+def run(repeat:int)->dict:
+    """Median cold start of the lazy app against one importing every endpoint module up front"""
+    results = {}
+    for variant, modules in (('lazy', ()), ('eager', ENDPOINT_MODULES)):
+        runs = [cold_import(modules) for _ in range(repeat)]
+        results[variant] = {
+            'wall_s': float(np.median([r['wall_s'] for r in runs])),
+            'import_s': float(np.median([r['import_s'] for r in runs])),
+            'main_s': float(np.median([r['main_s'] for r in runs])),
+            'heavy': runs[-1]['heavy'],
+        }
+    return results
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Cold start import time of the app (python -X importtime), lazy vs eager endpoint imports")
+    parser.add_argument('--repeat', type=int, default=5, help="fresh interpreters per variant, the median is reported")
+    args = parser.parse_args()
+
+    results = run(args.repeat)
+    for variant, r in results.items():
+        heavy = ', '.join(f"{name} {s * 1000:.0f} ms" for name, s in r['heavy'].items()) or 'none'
+        print(f"{variant}: process {r['wall_s'] * 1000:.0f} ms, imports {r['import_s'] * 1000:.0f} ms "
+              f"(main {r['main_s'] * 1000:.0f} ms), heavy libraries loaded: {heavy}")
+    lazy, eager = results['lazy'], results['eager']
+    print(f"cold start: {eager['import_s'] / lazy['import_s']:.1f}x less import time, "
+          f"{(eager['wall_s'] - lazy['wall_s']) * 1000:.0f} ms saved per worker start")
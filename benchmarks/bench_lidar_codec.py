@@ -0,0 +1,56 @@
+import os
+import glob
+import argparse
+import tempfile
+import numpy as np
+from config import settings
+from benchmarks.bench_overlay import best_of
+from extraction.lidar_codec import encode_sweep, decode_sweep, decode_header, check_error_bound, error_bound, read_compact
+
+def run(lidar_path:str, repeat:int, level:int)->dict:
+    """Size, encode/decode time and decode error of one sweep in the .npy and compact formats"""
+    points = np.fromfile(lidar_path, dtype=np.float32).reshape(-1, 4)
+    with tempfile.TemporaryDirectory() as tmp:
+        npy_path = os.path.join(tmp, 'sweep.npy')
+        compact_path = os.path.join(tmp, 'sweep.lzq')
+        np.save(npy_path, points)
+        data = encode_sweep(points, level=level)
+        with open(compact_path, 'wb') as f:
+            f.write(data)
+
+        decoded = decode_sweep(data)
+        check_error_bound(points, decoded, data)
+        npy_s = best_of(lambda: np.load(npy_path), repeat)
+        compact_s = best_of(lambda: read_compact(compact_path), repeat)
+        encode_s = best_of(lambda: encode_sweep(points, level=level), repeat)
+        return {
+            'file': os.path.basename(lidar_path),
+            'points': len(points),
+            'npy_bytes': os.path.getsize(npy_path),
+            'compact_bytes': len(data),
+            'ratio': os.path.getsize(npy_path) / len(data),
+            'encode_ms': encode_s * 1000,
+            'npy_load_mb_s': points.nbytes / npy_s / 1e6,
+            'compact_decode_mb_s': points.nbytes / compact_s / 1e6,
+            'max_error': np.abs(decoded.astype(np.float64) - points).max(axis=0),
+            'bound': error_bound(decode_header(data)),
+        }
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Compare the compact quantized LiDAR format against .npy sweeps")
+    parser.add_argument('--lidar-dir', default=settings.BONUS_LIDAR_DIR, help="folder of raw float32 xyzr .bin sweeps")
+    parser.add_argument('--limit', type=int, default=10, help="number of sweeps to measure")
+    parser.add_argument('--level', type=int, default=6, help="zlib compression level")
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    results = [run(path, args.repeat, args.level) for path in sorted(glob.glob(os.path.join(args.lidar_dir, '*.bin')))[:args.limit]]
+    for r in results:
+        print(f"{r['file']}: {r['points']} points, npy {r['npy_bytes'] / 1e6:.2f} MB, compact {r['compact_bytes'] / 1e6:.2f} MB "
+              f"({r['ratio']:.2f}x), encode {r['encode_ms']:.1f} ms, load npy {r['npy_load_mb_s']:.0f} MB/s, "
+              f"decode compact {r['compact_decode_mb_s']:.0f} MB/s, max error {np.round(r['max_error'], 4)} "
+              f"<= bound {np.round(r['bound'], 4)}")
+    if results:
+        total_npy = sum(r['npy_bytes'] for r in results)
+        total_compact = sum(r['compact_bytes'] for r in results)
+        print(f"total: {total_npy / 1e6:.1f} MB npy vs {total_compact / 1e6:.1f} MB compact, {total_npy / total_compact:.2f}x smaller")
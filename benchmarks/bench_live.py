@@ -0,0 +1,104 @@
+import os
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import numpy as np
+import pandas as pd
+from config import settings
+from extraction.helper import extract_timestamp
+from extraction.live import LiveSynchronizer
+from extraction.pipeline import synchronize_folder
+from benchmarks.generate_dataset import generate_dataset, add_dataset_arguments, dataset_kwargs
+from benchmarks.bench_sync import assert_equivalent
+
+class Recorder:
+    """Replays a finished ride into a new folder as if the bike were still recording it"""
+    def __init__(self, source:str, target:str):
+        self.source, self.target = source, target
+        self.files = []
+        for sensor, subdir in (("lidar", settings.LIDAR_DIR), ("image", settings.IMAGE_DIR)):
+            os.makedirs(target + subdir, exist_ok=True)
+            for name in os.listdir(source + subdir):
+                self.files.append((extract_timestamp(name, sensor), subdir, name))
+        self.files.sort()
+        self.samples = []
+        for path in (settings.IMU_PATH, settings.GPS_PATH):
+            with open(source + path) as f:
+                self.samples.extend((entry["timestamp"], path, entry) for entry in json.load(f))
+            with open(target + path, 'w') as f:
+                f.write('[')
+        self.samples.sort(key=lambda sample: sample[0])
+        self.written = {settings.IMU_PATH: 0, settings.GPS_PATH: 0}
+        self.file_pos = 0
+        self.sample_pos = 0
+        self.start = min(self.files[0][0], self.samples[0][0])
+        self.end = max(self.files[-1][0], self.samples[-1][0])
+
+    def advance(self, until:float):
+        """Writes every file and IMU/GPS sample recorded up to `until`"""
+        while self.file_pos < len(self.files) and self.files[self.file_pos][0] <= until:
+            _, subdir, name = self.files[self.file_pos]
+            shutil.copyfile(os.path.join(self.source + subdir, name), os.path.join(self.target + subdir, name))
+            self.file_pos += 1
+        appended = {}
+        while self.sample_pos < len(self.samples) and self.samples[self.sample_pos][0] <= until:
+            _, path, entry = self.samples[self.sample_pos]
+            appended.setdefault(path, []).append(entry)
+            self.sample_pos += 1
+        for path, entries in appended.items():
+            with open(self.target + path, 'a') as f:
+                for entry in entries:
+                    f.write((', ' if self.written[path] else '') + json.dumps(entry))
+                    self.written[path] += 1
+
+    def finish(self):
+        for path in self.written:
+            with open(self.target + path, 'a') as f:
+                f.write(']')
+
+def run(dataset:str, target:str, step_s:float, buffer_size:int)->dict:
+    recorder = Recorder(dataset, target)
+    synchronizer = LiveSynchronizer(target, buffer_size=buffer_size, warmup_samples=settings.LIVE_WARMUP_SAMPLES, settle_s=0.0)
+    records, lag, poll_s = [], [], []
+    now = recorder.start
+    while now < recorder.end + step_s:
+        recorder.advance(now)
+        t = time.perf_counter()
+        batch = synchronizer.poll()
+        poll_s.append(time.perf_counter() - t)
+        lag.extend(now - record["timestamp"] for record in batch)
+        records.extend(batch)
+        now += step_s
+    recorder.finish()
+    records.extend(synchronizer.flush())
+
+    buffered = {sensor: len(ring) for sensor, ring in synchronizer.rings.items()}
+    live_df = pd.DataFrame(records)
+    batch_df = synchronize_folder(target, 'npy')
+    assert_equivalent(live_df, batch_df)
+    return {
+        "records": len(records),
+        "polls": len(poll_s),
+        "poll_ms_mean": 1000 * float(np.mean(poll_s)),
+        "poll_ms_max": 1000 * float(np.max(poll_s)),
+        "lag_s_median": float(np.median(lag)) if lag else None,
+        "lag_s_max": float(np.max(lag)) if lag else None,
+        "buffered": buffered,
+    }
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Replay a synthetic ride through the live synchronizer and compare it to the batch sync")
+    add_dataset_arguments(parser)
+    parser.add_argument('--step', type=float, default=0.5, help="simulated seconds between polls")
+    parser.add_argument('--buffer-size', type=int, default=settings.LIVE_BUFFER_SIZE)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        dataset = os.path.join(tmp, 'ride')
+        generate_dataset(dataset, **dataset_kwargs(args))
+        r = run(dataset, os.path.join(tmp, 'live'), args.step, args.buffer_size)
+    print(f"{r['records']} records over {r['polls']} polls (identical to batch sync), poll {r['poll_ms_mean']:.1f} ms mean / "
+          f"{r['poll_ms_max']:.1f} ms max, emitted {r['lag_s_median']:.2f} s (median) / {r['lag_s_max']:.2f} s (max) "
+          f"after the reference timestamp, samples buffered at the end: {r['buffered']}")
@@ -0,0 +1,66 @@
+import os
+import time
+import argparse
+import numpy as np
+import cv2
+from config import settings
+from projection.calibrate import load_calibration, project_lidar_to_image, overlay_points_sequential
+from projection.raster import rasterize_points, reflectance_to_bgr
+
+def load_frame(frame_number:str)->tuple:
+    """Loads image, projected points and reflectance colors for a KITTI frame"""
+    image = cv2.imread(os.path.join(settings.BONUS_IMAGE_DIR, f"{frame_number.zfill(10)}.png"))
+    points = np.fromfile(os.path.join(settings.BONUS_LIDAR_DIR, f"{frame_number.zfill(10)}.bin"), dtype=np.float32).reshape(-1, 4)
+    calib_velo_to_cam = load_calibration(settings.CALIB_VELO_TO_CAM)
+    calib_cam_to_cam = load_calibration(settings.CALIB_CAM_TO_CAM)
+    points_2d = project_lidar_to_image(
+        points,
+        calib_velo_to_cam['R'].reshape(3, 3),
+        calib_velo_to_cam['T'],
+        calib_cam_to_cam['R_02'].reshape(3, 3),
+        calib_cam_to_cam['T_02'],
+        calib_cam_to_cam['R_rect_02'].reshape(3, 3),
+        calib_cam_to_cam['P_rect_02'].reshape(3, 4),
+    )
+    reflectance = points[:len(points_2d), 3]
+    return image, points_2d, reflectance
+
+def best_of(fn, repeat:int)->float:
+    """Best wall time of fn over repeat runs"""
+    timings = []
+    for _ in range(repeat):
+        t = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - t)
+    return min(timings)
+
+def run(frame_number:str, repeat:int)->dict:
+    image, points_2d, reflectance = load_frame(frame_number)
+    colors = (reflectance * 255).astype(np.uint8)
+    bgr = reflectance_to_bgr(reflectance)
+
+    expected = overlay_points_sequential(image.copy(), points_2d, colors)
+    actual = rasterize_points(image.copy(), points_2d, bgr)
+    if not np.array_equal(expected, actual):
+        raise AssertionError(f"Rasterized overlay differs from cv2.line loop on frame {frame_number}")
+
+    loop_s = best_of(lambda: overlay_points_sequential(image.copy(), points_2d, colors), repeat)
+    raster_s = best_of(lambda: rasterize_points(image.copy(), points_2d, bgr), repeat)
+    return {
+        'frame': frame_number,
+        'points': len(points_2d),
+        'loop_ms': loop_s * 1000,
+        'raster_ms': raster_s * 1000,
+        'speedup': loop_s / raster_s,
+    }
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Compare per-point cv2.line overlay against the NumPy rasterizer")
+    parser.add_argument('--frames', nargs='+', default=['0', '1', '2', '3', '4', '5'])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    for frame_number in args.frames:
+        r = run(frame_number, args.repeat)
+        print(f"frame {r['frame']}: {r['points']} points, loop {r['loop_ms']:.1f} ms, "
+              f"raster {r['raster_ms']:.1f} ms, speedup {r['speedup']:.1f}x (outputs identical)")
@@ -0,0 +1,146 @@
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import subprocess
+import numpy as np
+import pandas as pd
+from config import settings
+from extraction.lidar_ex import read_lidar_from_folder, read_lidar_from_folder_sequential
+from extraction.lidar_store import write_lidar_store
+from extraction.image_ex import read_images_from_folder, read_images_from_folder_sequential
+from extraction.imu_gps import read_imu, read_gps, read_imu_json
+from extraction.sync import synchronize_data
+from projection.calibrate import render_overlay, encode_overlay, frame_paths, overlay_points_sequential
+from benchmarks.generate_dataset import generate_dataset, add_dataset_arguments, dataset_kwargs
+from benchmarks.bench_overlay import load_frame
+
+def folder_mb(folder:str)->float:
+    return sum(entry.stat().st_size for entry in os.scandir(folder)) / 1e6
+
+def measure(stage:str, variant:str, fn, repeat:int, items:int = None, mb:float = None, setup = None)->dict:
+    """Best of repeat runs, setup() runs untimed before each one"""
+    timings = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        t = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - t)
+    seconds = min(timings)
+    result = {"stage": stage, "variant": variant, "seconds": seconds, "runs": timings}
+    if items is not None:
+        result["items"] = items
+        result["items_per_s"] = items / seconds if seconds else None
+    if mb is not None:
+        result["mb"] = mb
+        result["mb_per_s"] = mb / seconds if seconds else None
+    print(f"{stage:>10} {variant:<24} {seconds * 1000:10.1f} ms")
+    return result
+
+def git_commit()->str:
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], text=True, stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run(dataset:str, repeat:int, kitti_frame:str)->list:
+    lidar_path = dataset + settings.LIDAR_DIR
+    image_path = dataset + settings.IMAGE_DIR
+    imu_path = dataset + settings.IMU_PATH
+    gps_path = dataset + settings.GPS_PATH
+    lidar_files = len(os.listdir(lidar_path))
+    image_files = len(os.listdir(image_path))
+    lidar_mb = folder_mb(lidar_path)
+    image_mb = folder_mb(image_path)
+    results = []
+
+    with tempfile.TemporaryDirectory() as scratch:
+        out = os.path.join(scratch, 'out')
+        clean = lambda: shutil.rmtree(out, ignore_errors=True)
+
+        results.append(measure('lidar', 'parallel', lambda: read_lidar_from_folder(lidar_path, out), repeat, lidar_files, lidar_mb, clean))
+        results.append(measure('lidar', 'sequential', lambda: read_lidar_from_folder_sequential(lidar_path, out), repeat, lidar_files, lidar_mb, clean))
+        results.append(measure('lidar', 'packed', lambda: write_lidar_store(lidar_path, out), repeat, lidar_files, lidar_mb, clean))
+        clean()
+        read_lidar_from_folder(lidar_path, out)
+        results.append(measure('lidar', 'parallel_unchanged', lambda: read_lidar_from_folder(lidar_path, out), repeat, lidar_files, lidar_mb))
+
+        results.append(measure('images', 'thread', lambda: read_images_from_folder(image_path, out), repeat, image_files, image_mb, clean))
+        results.append(measure('images', 'process', lambda: read_images_from_folder(image_path, out, executor='process'), repeat, image_files, image_mb, clean))
+        results.append(measure('images', 'thread_raw', lambda: read_images_from_folder(image_path, out, output_format='raw'), repeat, image_files, image_mb, clean))
+        results.append(measure('images', 'sequential', lambda: read_images_from_folder_sequential(image_path, out), repeat, image_files, image_mb, clean))
+
+        clean()
+        lidar_dict = read_lidar_from_folder(lidar_path, os.path.join(scratch, 'lidarout'))
+        image_dict = read_images_from_folder(image_path, os.path.join(scratch, 'imagesout'))
+
+    imu_mb = os.path.getsize(imu_path) / 1e6
+    gps_mb = os.path.getsize(gps_path) / 1e6
+    results.append(measure('imu_gps', 'json_load', lambda: (read_imu_json(imu_path), read_gps(gps_path, cache=False)), repeat, mb=imu_mb + gps_mb))
+    results.append(measure('imu_gps', 'streaming', lambda: (read_imu(imu_path, cache=False), read_gps(gps_path, cache=False)), repeat, mb=imu_mb + gps_mb))
+    read_imu(imu_path)
+    read_gps(gps_path)
+    results.append(measure('imu_gps', 'cached', lambda: (read_imu(imu_path), read_gps(gps_path)), repeat, mb=imu_mb + gps_mb))
+
+    imu_df = read_imu(imu_path)
+    gps_df = read_gps(gps_path)
+    imu_rows = len(imu_df)
+    results.append(measure('sync', 'numpy', lambda: synchronize_data(lidar_dict, image_dict, imu_df, gps_df, engine='numpy'), repeat, imu_rows))
+    results.append(measure('sync', 'pandas', lambda: synchronize_data(lidar_dict, image_dict, imu_df, gps_df, engine='pandas'), repeat, imu_rows))
+
+    try:
+        frame_paths(kitti_frame)
+    except FileNotFoundError:
+        print(f"Skipping projection, KITTI frame {kitti_frame} not found")
+        return results
+    results.append(measure('projection', 'rasterized', lambda: render_overlay(kitti_frame), repeat, 1))
+    image, points_2d, reflectance = load_frame(kitti_frame)
+    colors = (reflectance * 255).astype(np.uint8)
+    results.append(measure('projection', 'sequential_overlay_only', lambda: overlay_points_sequential(image.copy(), points_2d, colors), repeat, 1))
+    encode_overlay(kitti_frame)
+    results.append(measure('projection', 'cached_png', lambda: encode_overlay(kitti_frame), repeat, 1))
+    return results
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="End to end timing of the bike pipeline stages on a synthetic ride")
+    parser.add_argument('--dataset', help="existing ride folder, a synthetic one is generated in a temp dir if omitted")
+    parser.add_argument('--report', default='bench_report.json', help="machine readable output")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--kitti-frame', default='0')
+    add_dataset_arguments(parser)
+    args = parser.parse_args()
+
+    generated_dir = None
+    dataset_params = None
+    if args.dataset is None:
+        generated_dir = tempfile.mkdtemp(prefix='bike_ride_')
+        args.dataset = generated_dir
+        t = time.perf_counter()
+        dataset_params = generate_dataset(args.dataset, **dataset_kwargs(args))
+        print(f"Generated synthetic ride in {args.dataset} ({time.perf_counter() - t:.1f} s): {dataset_params}")
+    try:
+        results = run(args.dataset, args.repeat, args.kitti_frame)
+    finally:
+        if generated_dir is not None:
+            shutil.rmtree(generated_dir, ignore_errors=True)
+
+    report = {
+        "created": time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        "git_commit": git_commit(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "dataset": dataset_params or {"path": args.dataset},
+        "repeat": args.repeat,
+        "results": results,
+    }
+    with open(args.report, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Report written to {args.report}")
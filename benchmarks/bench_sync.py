@@ -0,0 +1,68 @@
+import time
+import argparse
+import numpy as np
+import pandas as pd
+import scipy.interpolate  #imported lazily by the pandas engine, load it here so it is not timed
+from extraction.sync import synchronize_frame
+
+def make_sensor_data(imu_rows:int, duration_s:float = 3600.0, seed:int = 0)->tuple:
+    """Synthetic timestamps and values: 10 Hz lidar, ~7 Hz camera, imu_rows IMU samples and 1 Hz GPS over duration_s"""
+    rng = np.random.default_rng(seed)
+    t0 = 1701985839.0
+
+    def jittered(rate_hz:float)->np.ndarray:
+        n = int(duration_s * rate_hz)
+        return t0 + np.arange(n) / rate_hz + rng.uniform(0, 0.2 / rate_hz, n)
+
+    lidar_ts = jittered(10.0)
+    image_ts = jittered(7.0)
+    lidar_data = {float(ts): f"lidarout/lidar_{i}.npy" for i, ts in enumerate(lidar_ts)}
+    image_data = {float(ts): f"imagesout/image_{i}.npy" for i, ts in enumerate(image_ts)}
+
+    #regular rate with jitter, uniformly drawn times collide at float64 resolution and the pandas path rejects duplicates
+    imu_ts = t0 + (np.arange(imu_rows) + rng.uniform(0, 0.2, imu_rows)) * (duration_s / imu_rows)
+    imu_df = pd.DataFrame({"timestamp": imu_ts})
+    for axis in "xyz":
+        imu_df[f"angular_velocity_{axis}"] = rng.standard_normal(imu_rows)
+    for axis in "xyz":
+        imu_df[f"linear_acceleration_{axis}"] = rng.standard_normal(imu_rows)
+
+    gps_ts = jittered(1.0)
+    gps_df = pd.DataFrame({
+        "timestamp": gps_ts,
+        "latitude": 33.77 + np.cumsum(rng.normal(0, 1e-5, len(gps_ts))),
+        "longitude": -84.39 + np.cumsum(rng.normal(0, 1e-5, len(gps_ts))),
+        "altitude": 300.0 + rng.normal(0, 0.5, len(gps_ts)),
+    })
+    return lidar_data, image_data, imu_df, gps_df
+
+def assert_equivalent(numpy_df:pd.DataFrame, pandas_df:pd.DataFrame):
+    """Same columns in the same order, exact for gathered columns, float tolerance for interpolated ones"""
+    if list(numpy_df.columns) != list(pandas_df.columns) or len(numpy_df) != len(pandas_df):
+        raise AssertionError(f"Shape mismatch: {list(numpy_df.columns)} vs {list(pandas_df.columns)}")
+    for name in numpy_df.columns:
+        a, b = numpy_df[name].to_numpy(), pandas_df[name].to_numpy()
+        if np.issubdtype(a.dtype, np.floating):
+            if not np.allclose(a, b, rtol=1e-12, atol=1e-9, equal_nan=True):
+                raise AssertionError(f"Column {name} differs, max abs diff {np.nanmax(np.abs(a - b))}")
+        elif not (a.astype(str) == b.astype(str)).all():
+            raise AssertionError(f"Column {name} differs")
+
+def timed(fn)->tuple:
+    t = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - t
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Compare the index based and merge based sync engines")
+    parser.add_argument('--imu-rows', nargs='+', type=int, default=[10_000, 100_000, 1_000_000, 10_000_000])
+    parser.add_argument('--duration', type=float, default=3600.0, help="ride length in seconds")
+    args = parser.parse_args()
+
+    for imu_rows in args.imu_rows:
+        data = make_sensor_data(imu_rows, args.duration)
+        numpy_df, numpy_s = timed(lambda: synchronize_frame(*data, engine="numpy"))
+        pandas_df, pandas_s = timed(lambda: synchronize_frame(*data, engine="pandas"))
+        assert_equivalent(numpy_df, pandas_df)
+        print(f"imu rows {imu_rows:>10}: {len(numpy_df)} records, numpy {numpy_s * 1000:.1f} ms, "
+              f"pandas {pandas_s * 1000:.1f} ms, speedup {pandas_s / numpy_s:.1f}x (outputs equivalent)")
@@ -0,0 +1,130 @@
+import os
+import json
+import argparse
+import numpy as np
+from config import settings
+
+def sensor_timestamps(rng:np.random.Generator, start:float, duration_s:float, rate_hz:float, jitter_ms:float)->np.ndarray:
+    """Nominal rate_hz clock with gaussian jitter, strictly increasing with at least a tenth of a period between samples"""
+    n = max(2, int(duration_s * rate_hz))
+    #jitter under half a period can't reorder or collide two samples, however large jitter_ms is
+    limit = 0.45 / rate_hz
+    jitter = np.clip(rng.normal(0, jitter_ms / 1000, n), -limit, limit)
+    return start + np.arange(n) / rate_hz + jitter
+
+def timestamp_filename(data_type:str, timestamp:float)->str:
+    """lidar_<sec>_<nsec>.bin / image_<sec>_<nsec>.bin as recorded on the bike"""
+    seconds, nanoseconds = divmod(int(round(timestamp * 1e9)), 10**9)
+    return f"{data_type}_{seconds}_{nanoseconds:09d}.bin"
+
+def make_sweep(rng:np.random.Generator, points:int)->np.ndarray:
+    """Ring shaped (N, 4) float32 sweep: x, y, z, reflectance in [0, 1]"""
+    n = int(points * rng.uniform(0.95, 1.05))
+    azimuth = rng.uniform(-np.pi, np.pi, n)
+    elevation = rng.uniform(-0.4, 0.1, n)
+    distance = rng.uniform(2, 60, n)
+    sweep = np.empty((n, 4), dtype=np.float32)
+    sweep[:, 0] = distance * np.cos(elevation) * np.cos(azimuth)
+    sweep[:, 1] = distance * np.cos(elevation) * np.sin(azimuth)
+    sweep[:, 2] = distance * np.sin(elevation)
+    sweep[:, 3] = rng.uniform(0, 1, n)
+    return sweep
+
+def write_image(path:str, frame:np.ndarray):
+    """Raw camera layout: uint32 width, uint32 height, then height*width*3 uint8"""
+    height, width = frame.shape[:2]
+    with open(path, 'wb') as f:
+        f.write(width.to_bytes(4, byteorder='little'))
+        f.write(height.to_bytes(4, byteorder='little'))
+        f.write(frame.tobytes())
+
+def generate_dataset(
+        out_dir:str,
+        duration_s:float = 60.0,
+        lidar_hz:float = 20.0,
+        camera_hz:float = 10.0,
+        imu_hz:float = 200.0,
+        gps_hz:float = 1.0,
+        jitter_ms:float = 2.0,
+        points:int = 30000,
+        width:int = 640,
+        height:int = 480,
+        seed:int = 0
+    )->dict:
+    """
+    Writes a synthetic ride in the layout /synchronize-sensor expects
+    (settings.LIDAR_DIR, IMAGE_DIR, IMU_PATH, GPS_PATH inside out_dir) and returns its parameters.
+    """
+    rng = np.random.default_rng(seed)
+    start = 1701985839.0
+    lidar_dir = out_dir + settings.LIDAR_DIR
+    image_dir = out_dir + settings.IMAGE_DIR
+    os.makedirs(lidar_dir, exist_ok=True)
+    os.makedirs(image_dir, exist_ok=True)
+
+    lidar_ts = sensor_timestamps(rng, start, duration_s, lidar_hz, jitter_ms)
+    for timestamp in lidar_ts:
+        make_sweep(rng, points).tofile(os.path.join(lidar_dir, timestamp_filename('lidar', timestamp)))
+
+    camera_ts = sensor_timestamps(rng, start, duration_s, camera_hz, jitter_ms)
+    gradient = np.linspace(0, 255, width, dtype=np.uint8)[np.newaxis, :, np.newaxis]
+    base = np.broadcast_to(gradient, (height, width, 3))
+    for i, timestamp in enumerate(camera_ts):
+        frame = (base + np.uint8(i % 256)).astype(np.uint8)
+        write_image(os.path.join(image_dir, timestamp_filename('image', timestamp)), frame)
+
+    imu_ts = sensor_timestamps(rng, start, duration_s, imu_hz, jitter_ms / 10)
+    angular = rng.normal(0, 0.05, (len(imu_ts), 3))
+    linear = rng.normal(0, 0.3, (len(imu_ts), 3)) + [0.0, 0.0, 9.81]
+    imu = [
+        {
+            "timestamp": float(timestamp),
+            "angular_velocity": dict(zip("xyz", map(float, av))),
+            "linear_acceleration": dict(zip("xyz", map(float, la))),
+        }
+        for timestamp, av, la in zip(imu_ts, angular, linear)
+    ]
+    with open(out_dir + settings.IMU_PATH, 'w') as f:
+        json.dump(imu, f)
+
+    gps_ts = sensor_timestamps(rng, start, duration_s, gps_hz, jitter_ms)
+    #roughly 5 m/s heading north-east from Georgia Tech, 3.2e-5 degrees per second on each axis
+    track = np.cumsum(rng.normal(3.2e-5 / gps_hz, 5e-6 / gps_hz, (len(gps_ts), 2)), axis=0)
+    gps = [
+        {"timestamp": float(timestamp), "latitude": 33.7756 + float(dlat), "longitude": -84.3963 + float(dlon), "altitude": 290.0 + float(rng.normal(0, 0.5))}
+        for timestamp, (dlat, dlon) in zip(gps_ts, track)
+    ]
+    with open(out_dir + settings.GPS_PATH, 'w') as f:
+        json.dump(gps, f)
+
+    return {
+        "duration_s": duration_s, "lidar_hz": lidar_hz, "camera_hz": camera_hz, "imu_hz": imu_hz, "gps_hz": gps_hz,
+        "jitter_ms": jitter_ms, "points": points, "width": width, "height": height, "seed": seed,
+        "lidar_frames": len(lidar_ts), "camera_frames": len(camera_ts), "imu_samples": len(imu_ts), "gps_samples": len(gps_ts),
+    }
+
+def add_dataset_arguments(parser:argparse.ArgumentParser):
+    parser.add_argument('--duration', type=float, default=60.0, help="ride length in seconds")
+    parser.add_argument('--lidar-hz', type=float, default=20.0)
+    parser.add_argument('--camera-hz', type=float, default=10.0)
+    parser.add_argument('--imu-hz', type=float, default=200.0)
+    parser.add_argument('--gps-hz', type=float, default=1.0)
+    parser.add_argument('--jitter-ms', type=float, default=2.0, help="std of per sample clock jitter, clipped to under half a sample period")
+    parser.add_argument('--points', type=int, default=30000, help="points per lidar sweep")
+    parser.add_argument('--width', type=int, default=640)
+    parser.add_argument('--height', type=int, default=480)
+    parser.add_argument('--seed', type=int, default=0)
+
+def dataset_kwargs(args:argparse.Namespace)->dict:
+    return {
+        "duration_s": args.duration, "lidar_hz": args.lidar_hz, "camera_hz": args.camera_hz, "imu_hz": args.imu_hz,
+        "gps_hz": args.gps_hz, "jitter_ms": args.jitter_ms, "points": args.points, "width": args.width,
+        "height": args.height, "seed": args.seed,
+    }
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Generate a synthetic bike ride for /synchronize-sensor")
+    parser.add_argument('out_dir')
+    add_dataset_arguments(parser)
+    args = parser.parse_args()
+    print(json.dumps(generate_dataset(args.out_dir, **dataset_kwargs(args)), indent=2))
@@ -20,7 +20,65 @@ class Settings(BaseSettings):
     BONUS_OUT_DIR: str = 'lidar_overlay'
     IMAGES_OUT_DIR: str = '/imagesout'
     LIDAR_OUT_DIR: str = '/lidarout'
+    IMU_GPS_CACHE_DIR: str = '/imugpsout'
     SYNC_DATA_OUT_PATH: str = 'synchronized_data.json'
+    SYNC_INDEX_PATH: str = '/sync_index.npz'
+    GEO_INDEX_PATH: str = '/geo_index.npz'
+
+    #Grid cell size in meters of the geo index over the GPS track used by /frames/near and /frames/bbox
+    GEO_CELL_METERS: float = 25.0
+
+    #LiDAR storage backend: 'npy' (one file per sweep), 'compact' (one quantized zlib file per sweep)
+    #or 'packed' (single memory-mapped store), compact sweeps are checked against their error bound when verified
+    LIDAR_STORAGE: str = 'npy'
+    LIDAR_COMPACT_VERIFY: bool = True
+
+    #Voxel grid levels of detail precomputed per sweep at ingest (npy storage), level i uses the
+    #i-th voxel size in meters, mode 'centroid' or 'first', empty (default) disables them, e.g. [0.2, 0.5, 1.0]
+    LIDAR_LOD_VOXEL_SIZES: list[float] = []
+    LIDAR_LOD_MODE: str = 'centroid'
+
+    #Image conversion: executor 'thread' or 'process', 0 workers uses the executor default,
+    #output 'npy' or 'raw' (headerless, memory mappable)
+    IMAGE_EXECUTOR: str = 'thread'
+    IMAGE_WORKERS: int = 0
+    IMAGE_CHUNK_SIZE: int = 16
+    IMAGE_OUTPUT_FORMAT: str = 'npy'
+
+    #Alignment engine for synchronize-sensor: 'numpy' (index based) or 'pandas' (merge based)
+    SYNC_ENGINE: str = 'numpy'
+
+    #Background sync jobs: concurrent runs, queued runs accepted, finished jobs remembered
+    SYNC_JOB_WORKERS: int = 2
+    SYNC_JOB_MAX_PENDING: int = 16
+    SYNC_JOB_HISTORY: int = 50
+
+    #Records per chunk when streaming synchronized data as NDJSON
+    SYNC_STREAM_CHUNK_SIZE: int = 1000
+
+    #Live tail mode: seconds between folder polls, seconds without new records before a live sync ends,
+    #samples buffered per sensor, lidar/image samples used to pick the reference sensor, and the
+    #minimum age of a new file before it is read (it may still be being written)
+    LIVE_POLL_INTERVAL: float = 0.5
+    LIVE_IDLE_TIMEOUT: float = 30.0
+    LIVE_BUFFER_SIZE: int = 4096
+    LIVE_WARMUP_SAMPLES: int = 50
+    LIVE_SETTLE_SECONDS: float = 0.2
+
+    #Add a Server-Timing header with per stage durations to every response
+    SERVER_TIMING: bool = False
+
+    #Overlay sequences: processes of the render pool shared by all requests (0 uses the CPU count),
+    #frames in flight per worker, video frame rate
+    SEQUENCE_WORKERS: int = 0
+    SEQUENCE_PREFETCH: int = 2
+    SEQUENCE_FPS: float = 10.0
+    #Largest point radius in pixels for overlays, each point is expanded to (2r+1)^2 pixels in memory
+    OVERLAY_MAX_RADIUS: int = 8
+
+    #Caching
+    OVERLAY_CACHE_SIZE: int = 64
+    DEPTH_CACHE_SIZE: int = 64
 
     class Config:
         case_sensitive = True
@@ -31,6 +89,10 @@ def get_logger(name=''):
     logger = logging.getLogger(name)
     os.makedirs('logs', exist_ok=True)
     logger.setLevel(logging.INFO)
+    #loggers are shared per name, only attach the file handler once
+    log_path = os.path.abspath('logs/debug.log')
+    if any(getattr(handler, 'baseFilename', None) == log_path for handler in logger.handlers):
+        return logger
     formatter = logging.Formatter(
             "[%(asctime)s] — %(name)s — %(levelname)s — %(funcName)s:%(lineno)d — %(message)s"
     )
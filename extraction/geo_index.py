@@ -0,0 +1,118 @@
+import os
+import numpy as np
+from functools import lru_cache
+from extraction.output import json_column
+from config import get_logger
+logger = get_logger(__name__)
+
+EARTH_RADIUS_M = 6371008.8
+#bits of the column (x) cell in a packed cell key, rows go above
+CELL_BITS = 31
+
+def local_xy(lat:np.ndarray, lon:np.ndarray, lat0:float, lon0:float)->tuple:
+    """Equirectangular meters east/north of (lat0, lon0), accurate to well under a cell over a ride"""
+    x = np.radians(np.asarray(lon, dtype=np.float64) - lon0) * EARTH_RADIUS_M * np.cos(np.radians(lat0))
+    y = np.radians(np.asarray(lat, dtype=np.float64) - lat0) * EARTH_RADIUS_M
+    return x, y
+
+def haversine_m(lat:np.ndarray, lon:np.ndarray, lat0:float, lon0:float)->np.ndarray:
+    lat, lon = np.radians(lat), np.radians(lon)
+    lat0, lon0 = np.radians(lat0), np.radians(lon0)
+    a = np.sin((lat - lat0) / 2) ** 2 + np.cos(lat) * np.cos(lat0) * np.sin((lon - lon0) / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+def build_geo_index(latitude:np.ndarray, longitude:np.ndarray, cell_m:float)->dict:
+    """
+    Uniform grid over the GPS track: every record with a position gets the key of its cell_m x cell_m
+    cell (row-major, row << 31 | column), rows of the sync index are stored sorted by key so a cell,
+    or a run of cells along a grid row, is one binary search away.
+    """
+    latitude = np.asarray(latitude, dtype=np.float64)
+    longitude = np.asarray(longitude, dtype=np.float64)
+    valid = np.flatnonzero(np.isfinite(latitude) & np.isfinite(longitude))
+    lat0 = float(latitude[valid].min()) if len(valid) else 0.0
+    lon0 = float(longitude[valid].min()) if len(valid) else 0.0
+    x, y = local_xy(latitude[valid], longitude[valid], lat0, lon0)
+    cells_x = np.floor(x / cell_m).astype(np.int64)
+    cells_y = np.floor(y / cell_m).astype(np.int64)
+    keys = (cells_y << CELL_BITS) | cells_x
+    order = np.argsort(keys, kind="stable")
+    return {
+        "keys": keys[order],
+        "rows": valid[order],
+        "origin": np.array([lat0, lon0]),
+        "cell_m": np.array(cell_m),
+        "max_cell": np.array([cells_x.max(initial=0), cells_y.max(initial=0)]),
+    }
+
+def save_geo_index(index_path:str, latitude:np.ndarray, longitude:np.ndarray, cell_m:float):
+    """Builds and persists the grid index for the rows of a saved sync index"""
+    geo = build_geo_index(latitude, longitude, cell_m)
+    tmp_path = index_path + ".tmp.npz"
+    np.savez(tmp_path, **geo)
+    os.replace(tmp_path, index_path)
+    logger.info(f"Saved geo index with {len(geo['rows'])} positioned records to {index_path}")
+
+def remove_geo_index(index_path:str):
+    """Deletes the grid index of an earlier sync, its rows would point into the wrong sync index"""
+    if os.path.exists(index_path):
+        os.remove(index_path)
+        logger.info(f"Removed stale geo index {index_path}, the synchronized records have no latitude/longitude")
+
+@lru_cache(maxsize=16)
+def _cached_geo_index(index_path:str, mtime_ns:int)->dict:
+    with np.load(index_path) as geo:
+        return {name: geo[name] for name in geo.files}
+
+def load_geo_index(index_path:str)->dict:
+    if not os.path.exists(index_path):
+        raise FileNotFoundError(f"No geo index at {index_path}, run /synchronize-sensor on the folder first (it needs GPS latitude/longitude)")
+    return _cached_geo_index(index_path, os.stat(index_path).st_mtime_ns)
+
+def candidate_rows(geo:dict, min_x:float, max_x:float, min_y:float, max_y:float)->np.ndarray:
+    """Sync index rows in the grid cells overlapping a local x/y rectangle, one binary search pair per grid row"""
+    cell_m = float(geo["cell_m"])
+    max_cell_x, max_cell_y = (int(c) for c in geo["max_cell"])
+    x0, x1 = max(0, int(np.floor(min_x / cell_m))), min(max_cell_x, int(np.floor(max_x / cell_m)))
+    y0, y1 = max(0, int(np.floor(min_y / cell_m))), min(max_cell_y, int(np.floor(max_y / cell_m)))
+    if x1 < x0 or y1 < y0:
+        return np.empty(0, dtype=np.int64)
+    grid_rows = np.arange(y0, y1 + 1, dtype=np.int64) << CELL_BITS
+    starts = np.searchsorted(geo["keys"], grid_rows | x0, side="left")
+    stops = np.searchsorted(geo["keys"], grid_rows | x1, side="right")
+    return np.concatenate([geo["rows"][start:stop] for start, stop in zip(starts, stops)])
+
+def _records(index:dict, rows:np.ndarray, distances:np.ndarray = None)->list:
+    """Sync index rows as records with their frame_index (row) and distance_m if given, NaN/inf as None"""
+    columns = {name: json_column(values[rows]) for name, values in index.items()}
+    columns["frame_index"] = rows.tolist()
+    if distances is not None:
+        columns["distance_m"] = distances.tolist()
+    return [dict(zip(columns, row)) for row in zip(*columns.values())]
+
+def query_radius(index:dict, geo:dict, lat:float, lon:float, radius_m:float, limit:int = None)->list:
+    """Records within radius_m meters (great circle) of (lat, lon), nearest first, at most limit of them"""
+    lat0, lon0 = geo["origin"]
+    x, y = local_xy(lat, lon, lat0, lon0)
+    #grid cells are laid out on the equirectangular plane, pad the box for its error at the track's scale
+    pad = radius_m * 1.01 + 1.0
+    rows = candidate_rows(geo, float(x) - pad, float(x) + pad, float(y) - pad, float(y) + pad)
+    distances = haversine_m(index["latitude"][rows], index["longitude"][rows], lat, lon)
+    inside = distances <= radius_m
+    rows, distances = rows[inside], distances[inside]
+    order = np.lexsort((rows, distances))
+    if limit is not None:
+        order = order[:max(0, limit)]
+    return _records(index, rows[order], distances[order])
+
+def query_bbox(index:dict, geo:dict, min_lat:float, min_lon:float, max_lat:float, max_lon:float, limit:int = None)->list:
+    """Records with min_lat <= latitude <= max_lat and min_lon <= longitude <= max_lon, in time order"""
+    lat0, lon0 = geo["origin"]
+    xs, ys = local_xy(np.array([min_lat, max_lat]), np.array([min_lon, max_lon]), lat0, lon0)
+    rows = candidate_rows(geo, xs[0] - 1.0, xs[1] + 1.0, ys[0] - 1.0, ys[1] + 1.0)
+    latitude, longitude = index["latitude"][rows], index["longitude"][rows]
+    inside = (latitude >= min_lat) & (latitude <= max_lat) & (longitude >= min_lon) & (longitude <= max_lon)
+    rows = np.sort(rows[inside])
+    if limit is not None:
+        rows = rows[:max(0, limit)]
+    return _records(index, rows)
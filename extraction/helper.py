@@ -1,3 +1,5 @@
+import numpy as np
+
 def extract_timestamp(filename:str, data_type:str)->float:
     """extract timestamp from filename"""
     try:
@@ -6,4 +8,14 @@ def extract_timestamp(filename:str, data_type:str)->float:
         timestamp = float(f"{timestamp_main}.{timestamp_decimal}")
         return timestamp
     except Exception as e:
-        raise ValueError(f"Error in extract_timestamp: {e}")
\ No newline at end of file
+        raise ValueError(f"Error in extract_timestamp: {e}")
+
+def closest_index(sensor_timestamps:np.ndarray, ref_timestamps:np.ndarray) -> np.ndarray:
+    """ Index of the closest sensor timestamp for every reference timestamp, ties go left """
+    if len(sensor_timestamps) == 1:
+        return np.zeros(len(ref_timestamps), dtype=np.intp)
+    idx = np.searchsorted(sensor_timestamps, ref_timestamps)
+    idx = np.clip(idx, 1, len(sensor_timestamps) - 1)
+    left = sensor_timestamps[idx - 1]
+    right = sensor_timestamps[idx]
+    return np.where(abs(left - ref_timestamps) <= abs(right - ref_timestamps), idx - 1, idx)
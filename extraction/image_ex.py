@@ -1,53 +1,151 @@
 import os
+import multiprocessing
 import numpy as np
 from extraction.helper import extract_timestamp
-from concurrent.futures import ThreadPoolExecutor
+from extraction.manifest import load_manifest, save_manifest, scan_sources, make_entry
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 import time
 from config import get_logger
+from metrics import metrics
 logger = get_logger(__name__)
 
-def read_image(file_path:str ,out_file_path:str)->np.ndarray:
+EXECUTORS = {'thread': ThreadPoolExecutor, 'process': ProcessPoolExecutor}
+
+def process_context():
+    """forkserver where available, else spawn: pools are started from server threads and must not fork them"""
+    return multiprocessing.get_context('forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn')
+
+def make_executor(executor:str, max_workers:int = None, **kwargs):
+    """Thread or process pool from EXECUTORS, process pools start their workers without forking the caller"""
+    if executor == 'process':
+        kwargs['mp_context'] = process_context()
+    return EXECUTORS[executor](max_workers=max_workers, **kwargs)
+
+IMAGE_HEADER_BYTES = 8
+PAGE_BYTES = 4096
+RAW_EXTENSION = '.rgb'
+
+def decode_image(file_path:str)->np.ndarray:
+    """
+    Maps the pixel payload of a raw image file in place, (height, width, 3) uint8.
+    Nothing is read or copied until the pages are touched.
+    """
     with open(file_path, 'rb') as f:
         # Read the width and height (each 4 bytes, uint32)
         width = int.from_bytes(f.read(4), byteorder='little')
         height = int.from_bytes(f.read(4), byteorder='little')
-        image_data = np.frombuffer(f.read(), dtype=np.uint8)
-        image = image_data.reshape((height, width, 3))
+    return np.memmap(file_path, dtype=np.uint8, mode='r', offset=IMAGE_HEADER_BYTES, shape=(height, width, 3))
+
+def raw_image_path(image_parsed_path:str, filename:str, shape:tuple)->str:
+    """Headerless output path, the shape is kept in the name: image_<ts>.<h>x<w>x<c>.rgb"""
+    return os.path.join(image_parsed_path, filename.replace('.bin', '.' + 'x'.join(str(d) for d in shape) + RAW_EXTENSION))
+
+def open_parsed_image(out_file_path:str)->np.ndarray:
+    """Memory maps a parsed image written as .npy or as headerless .rgb"""
+    if out_file_path.endswith(RAW_EXTENSION):
+        shape = tuple(int(d) for d in out_file_path[:-len(RAW_EXTENSION)].rsplit('.', 1)[1].split('x'))
+        return np.memmap(out_file_path, dtype=np.uint8, mode='r', shape=shape)
+    return np.load(out_file_path, mmap_mode='r')
+
+def read_image(file_path:str ,out_file_path:str)->np.ndarray:
+    image = decode_image(file_path)
+    #np.save writes straight from the mapped payload, no intermediate copy
     np.save(out_file_path, image)
     return image
 
-def process_image(filename, folder_path, image_parsed_path):
+def process_image(filename, folder_path, image_parsed_path, output_format='npy'):
     """
-    Processes a single image file
+    Processes a single image file, returns (timestamp, out_file_path, stage stats)
     """
     if filename.endswith('.bin') and filename.startswith('image_'):
         file_path = os.path.join(folder_path, filename)
         timestamp = extract_timestamp(filename, 'image')  
-        out_file_path = os.path.join(image_parsed_path, filename.replace('.bin', '.npy'))
-        read_image(file_path, out_file_path)
-        return timestamp, out_file_path
+        t = time.perf_counter()
+        image = decode_image(file_path)
+        #mapping reads nothing, faulting in one byte per page reads the payload without copying it
+        np.add.reduce(image.reshape(-1)[::PAGE_BYTES], dtype=np.uint64)
+        read_s = time.perf_counter() - t
+        t = time.perf_counter()
+        npy_path = os.path.join(image_parsed_path, filename.replace('.bin', '.npy'))
+        raw_path = raw_image_path(image_parsed_path, filename, image.shape)
+        out_file_path, stale_path = (raw_path, npy_path) if output_format == 'raw' else (npy_path, raw_path)
+        if output_format == 'raw':
+            image.tofile(out_file_path)
+        else:
+            np.save(out_file_path, image)
+        #a frame converted before in the other format would otherwise be left next to the new one
+        if os.path.exists(stale_path):
+            os.remove(stale_path)
+        stats = {'bytes': image.nbytes, 'read_s': read_s, 'write_s': time.perf_counter() - t}
+        return timestamp, out_file_path, stats
     return None
 
-def read_images_from_folder(folder_path:str, image_parsed_path:str)->dict:
+def process_image_chunk(filenames:list, folder_path:str, image_parsed_path:str, output_format:str)->list:
+    """Processes a chunk of image files in one task, keeps per-task overhead low on process pools"""
+    return [process_image(filename, folder_path, image_parsed_path, output_format) for filename in filenames]
+
+def _log_throughput(stats:list, wall_s:float):
+    """Logs per-stage throughput in MB/s, stage times are summed over workers"""
+    total_mb = sum(s['bytes'] for s in stats) / 1e6
+    read_s = sum(s['read_s'] for s in stats)
+    write_s = sum(s['write_s'] for s in stats)
+    logger.info(
+        f"images: {len(stats)} files, {total_mb:.1f} MB, "
+        f"read {total_mb / read_s if read_s else 0:.1f} MB/s, write {total_mb / write_s if write_s else 0:.1f} MB/s per worker, "
+        f"overall {total_mb / wall_s if wall_s else 0:.1f} MB/s"
+    )
+
+def read_images_from_folder(
+        folder_path:str,
+        image_parsed_path:str,
+        executor:str = 'thread',
+        max_workers:int = None,
+        chunk_size:int = 16,
+        output_format:str = 'npy'
+    )->dict:
     """
-    Reads all image files in a folder in parallel, saves them as .npy files,
-    and returns a dict mapping timestamps to file paths.
+    Reads new or changed image files in parallel, saves them as .npy files
+    (or headerless .rgb with output_format='raw'), and returns a dict mapping timestamps to file paths.
+    Files already listed in the output manifest with the same size and mtime are not re-converted.
+    executor is 'thread' or 'process', files are submitted in chunks of chunk_size.
     """
-    image_dict = {}
+    if executor not in EXECUTORS:
+        raise ValueError(f"Unknown executor: {executor}, expected one of {tuple(EXECUTORS)}")
+    if output_format not in ('npy', 'raw'):
+        raise ValueError(f"Unknown image output format: {output_format}, expected npy or raw")
     t= time.time()
     os.makedirs(image_parsed_path, exist_ok=True)
     try:
-        with ThreadPoolExecutor() as executor:
+        manifest, pending = scan_sources(folder_path, 'image', image_parsed_path, load_manifest(image_parsed_path))
+        #outputs written in the other format are converted again
+        expected_ext = RAW_EXTENSION if output_format == 'raw' else '.npy'
+        for filename, entry in list(manifest.items()):
+            if not entry['out_path'].endswith(expected_ext):
+                pending.append((filename, entry['size'], entry['mtime_ns']))
+                del manifest[filename]
+
+        chunk_size = max(1, chunk_size)
+        chunks = [pending[i:i + chunk_size] for i in range(0, len(pending), chunk_size)]
+        stats = []
+        metrics.set('queue_depth', len(chunks), queue='image_convert')
+        with make_executor(executor, max_workers) as pool:
             futures = [
-                executor.submit(process_image, filename, folder_path, image_parsed_path)
-                for filename in os.listdir(folder_path)
+                (pool.submit(process_image_chunk, [filename for filename, _, _ in chunk], folder_path, image_parsed_path, output_format), chunk)
+                for chunk in chunks
             ]
-            
-            for future in futures:
-                result = future.result()
-                if result:
-                    timestamp, out_file_path = result
-                    image_dict[timestamp] = out_file_path
+
+            for done, (future, chunk) in enumerate(futures, start=1):
+                for (filename, size, mtime_ns), (timestamp, out_file_path, file_stats) in zip(chunk, future.result()):
+                    manifest[filename] = make_entry(size, mtime_ns, timestamp, out_file_path)
+                    stats.append(file_stats)
+                    metrics.record_io('image_convert', bytes_read=size, bytes_written=file_stats['bytes'])
+                metrics.set('queue_depth', len(chunks) - done, queue='image_convert')
+        metrics.record_frames('image_convert', len(stats), time.time() - t)
+        save_manifest(image_parsed_path, manifest)
+
+        image_dict = dict(sorted((entry['timestamp'], entry['out_path']) for entry in manifest.values()))
+        if stats:
+            _log_throughput(stats, time.time() - t)
         logger.info(f"read images in: {time.time() - t:.2f}")
         return image_dict
     except Exception as e:
@@ -1,7 +1,227 @@
-import json 
+import os
+import json
+import numpy as np
 import pandas as pd
+from config import settings, get_logger
+from metrics import metrics
+logger = get_logger(__name__)
 
-def read_imu(imu_json:str)->pd.DataFrame:
+READ_CHUNK_BYTES = 1 << 20
+#bumped when the cache layout changes, older caches are parsed again
+CACHE_VERSION = 2
+IMU_GROUPS = ("angular_velocity", "linear_acceleration")
+
+def iter_json_array(file_path:str, chunk_bytes:int = READ_CHUNK_BYTES):
+    """Yields the elements of a top level JSON array one at a time, reading the file in chunks"""
+    decoder = json.JSONDecoder()
+    with open(file_path, "r") as f:
+        buffer = f.read(chunk_bytes)
+        pos = len(buffer) - len(buffer.lstrip())
+        if buffer[pos:pos + 1] != "[":
+            raise ValueError(f"{file_path} does not contain a JSON array")
+        pos += 1
+        eof = False
+        while True:
+            #skip whitespace and separators between elements
+            while True:
+                while pos < len(buffer) and buffer[pos] in " \t\r\n,":
+                    pos += 1
+                if pos < len(buffer) or eof:
+                    break
+                buffer, pos = f.read(chunk_bytes), 0
+                eof = not buffer
+            if pos >= len(buffer):
+                raise ValueError(f"Unterminated JSON array in {file_path}")
+            if buffer[pos] == "]":
+                return
+            try:
+                element, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                #element is cut by the chunk boundary, read more and retry
+                more = f.read(chunk_bytes)
+                if not more:
+                    raise
+                buffer, pos = buffer[pos:] + more, 0
+                continue
+            yield element
+            pos = end
+
+def flatten_imu(entry:dict)->dict:
+    flat = {"timestamp": entry["timestamp"]}
+    for group in IMU_GROUPS:
+        flat.update({f"{group}_{k}": v for k, v in entry[group].items()})
+    return flat
+
+def flatten_gps(entry:dict)->dict:
+    return entry
+
+def read_json_columns(file_path:str, flatten, block_rows:int = 8192)->pd.DataFrame:
+    """
+    Streams a JSON array of samples into columns. Numeric fields are copied block-wise into a
+    preallocated float64 array (sized from the file size, grown if needed), other fields into object arrays.
+    Columns are the union of the fields of all samples, in order of first appearance, and fields
+    missing from a sample become NaN/None. Fields that are integers in every sample come back as int64.
+    """
+    file_size = os.path.getsize(file_path)
+    metrics.record_io('imu_gps', bytes_read=file_size)
+    names, numeric_names, object_names = [], [], []
+    numeric, objects = None, {}
+    known, integer_names = set(), set()
+    block, count = [], 0
+
+    def flush():
+        nonlocal numeric, block, count
+        end = count + len(block)
+        if end > len(numeric):
+            grown = np.full((max(end, 2 * len(numeric)), len(numeric_names)), np.nan)
+            grown[:count] = numeric[:count]
+            numeric = grown
+        numeric[count:end] = block
+        block, count = [], end
+
+    def add_fields(flat:dict):
+        """Adds the fields of flat not seen yet, earlier rows get NaN/None for them"""
+        nonlocal numeric
+        new_numeric = []
+        for name, value in flat.items():
+            if name in known:
+                continue
+            known.add(name)
+            names.append(name)
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                new_numeric.append(name)
+                if type(value) is int and not count:
+                    integer_names.add(name)
+            else:
+                object_names.append(name)
+                objects[name] = [None] * count
+        if new_numeric:
+            if count:
+                logger.info(f"{file_path}: fields {new_numeric} first appear after {count} samples")
+            numeric_names.extend(new_numeric)
+            numeric = np.concatenate([numeric, np.full((len(numeric), len(new_numeric)), np.nan)], axis=1)
+
+    for entry in iter_json_array(file_path):
+        flat = flatten(entry)
+        if numeric is None:
+            #size estimate from the serialized length of the first sample
+            capacity = max(16, int(file_size / max(1, len(json.dumps(entry)) - 8)) + 16)
+            numeric = np.full((capacity, 0), np.nan)
+        if not known.issuperset(flat):
+            #rows of the pending block are as wide as the columns known when they were read
+            flush()
+            add_fields(flat)
+        block.append([flat.get(name, np.nan) for name in numeric_names])
+        for name in object_names:
+            objects[name].append(flat.get(name))
+        if integer_names:
+            integer_names.difference_update([name for name in integer_names if type(flat.get(name)) is not int])
+        if len(block) == block_rows:
+            flush()
+    if numeric is None:
+        return pd.DataFrame()
+    if block:
+        flush()
+
+    columns = {name: numeric[:count, i] for i, name in enumerate(numeric_names)}
+    columns.update({name: columns[name].astype(np.int64) for name in integer_names})
+    columns.update({name: np.array(values, dtype=object) for name, values in objects.items()})
+    return pd.DataFrame({name: columns[name] for name in names})
+
+def cache_path_for(source_path:str, cache_dir:str = None)->str:
+    """
+    Column cache of a source in cache_dir, keyed by the full source filename (imu.json -> imu.json.npz).
+    cache_dir defaults to IMU_GPS_CACHE_DIR inside the source's folder, the raw inputs are never written to.
+    """
+    if cache_dir is None:
+        cache_dir = os.path.dirname(os.path.abspath(source_path)) + settings.IMU_GPS_CACHE_DIR
+    return os.path.join(cache_dir, os.path.basename(source_path) + ".npz")
+
+def load_columns_cache(source_path:str, cache_dir:str = None)->pd.DataFrame:
+    """Returns the cached columns if the cache was written for this source with the same size and mtime, else None"""
+    cache_path = cache_path_for(source_path, cache_dir)
+    if not os.path.exists(cache_path):
+        return None
+    stat = os.stat(source_path)
+    try:
+        with np.load(cache_path) as cache:
+            if str(cache["__source_path"]) != os.path.abspath(source_path):
+                return None
+            if int(cache["__source_size"]) != stat.st_size or int(cache["__source_mtime_ns"]) != stat.st_mtime_ns:
+                return None
+            if int(cache["__version"]) != CACHE_VERSION:
+                return None
+            columns = {}
+            for i, name in enumerate(cache["__columns"]):
+                if f"json_{i}" in cache.files:
+                    #same None filled object arrays as read_json_columns, so pandas infers the same dtypes
+                    columns[str(name)] = np.array([json.loads(value) for value in cache[f"json_{i}"]], dtype=object)
+                else:
+                    columns[str(name)] = cache[f"col_{i}"]
+            return pd.DataFrame(columns)
+    except (OSError, ValueError, KeyError) as e:
+        logger.info(f"Ignoring unreadable cache {cache_path}: {e}")
+        return None
+
+def _json_cell(value)->str:
+    """JSON text of an object column value, missing values (None/NaN/NA) as null"""
+    if value is None or value is pd.NA or (isinstance(value, float) and value != value):
+        return "null"
+    return json.dumps(value)
+
+def save_columns_cache(source_path:str, df:pd.DataFrame, cache_dir:str = None):
+    """
+    Writes the column cache. Numeric columns are stored as is, other columns as one JSON text per value
+    so strings, booleans and missing values come back unchanged and loading needs no pickle.
+    """
+    cache_path = cache_path_for(source_path, cache_dir)
+    stat = os.stat(source_path)
+    arrays = {
+        "__columns": np.array(list(df.columns), dtype=str),
+        "__source_path": np.array(os.path.abspath(source_path)),
+        "__source_size": np.array(stat.st_size),
+        "__source_mtime_ns": np.array(stat.st_mtime_ns),
+        "__version": np.array(CACHE_VERSION),
+    }
+    for i, name in enumerate(df.columns):
+        values = df[name].to_numpy()
+        if values.dtype == object:
+            arrays[f"json_{i}"] = np.array([_json_cell(value) for value in values], dtype=str)
+        else:
+            arrays[f"col_{i}"] = values
+    tmp_path = cache_path + ".tmp.npz"
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        np.savez(tmp_path, **arrays)
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        logger.info(f"Could not write cache {cache_path}: {e}")
+
+def read_cached_columns(file_path:str, flatten, cache:bool, cache_dir:str = None)->pd.DataFrame:
+    if cache:
+        df = load_columns_cache(file_path, cache_dir)
+        if df is not None:
+            logger.info(f"Loaded {file_path} from cache")
+            return df
+    df = read_json_columns(file_path, flatten)
+    if cache:
+        save_columns_cache(file_path, df, cache_dir)
+    return df
+
+def read_imu(imu_json:str, cache:bool = True, cache_dir:str = None)->pd.DataFrame:
+    try:
+        return read_cached_columns(imu_json, flatten_imu, cache, cache_dir)
+    except Exception as e:
+        raise ValueError(f"Error in reading imu: {e}")
+
+def read_gps(gps_file:str, cache:bool = True, cache_dir:str = None)->pd.DataFrame:
+    try:
+        return read_cached_columns(gps_file, flatten_gps, cache, cache_dir)
+    except Exception as e:
+        raise ValueError(f"Error in reading gps: {e}")
+
+def read_imu_json(imu_json:str)->pd.DataFrame:
+    """json.load based reader, kept as the reference for read_imu"""
     try:
         with open(imu_json, "r") as f:
             imu_list = json.load(f)
@@ -13,16 +233,8 @@ def read_imu(imu_json:str)->pd.DataFrame:
             }
             for entry in imu_list
         ]
-    
+
         df = pd.DataFrame(flattened_data)
         return df
     except Exception as e:
         raise ValueError(f"Error in reading imu: {e}")
-    
-def read_gps(gps_file:str)->pd.DataFrame:
-    try:
-        with open(gps_file, "r") as f:
-            gps_list = json.load(f)
-        return pd.DataFrame(gps_list)
-    except Exception as e:
-        raise ValueError(f"Error in reading gps: {e}")
\ No newline at end of file
@@ -0,0 +1,128 @@
+import zlib
+import struct
+import numpy as np
+
+COMPACT_EXTENSION = '.lzq'
+COMPACT_MAGIC = b'LZQ1'
+#magic, points, chunk points, chunk count, xyz scale (3), xyz offset (3), reflectance scale, reflectance offset
+HEADER = struct.Struct('<4sIII3d3ddd')
+CHUNK_POINTS = 1 << 16
+#target position step in meters, larger sweeps fall back to extent / 65534
+POSITION_STEP = 0.01
+INT16_STEPS = 65534
+UINT8_STEPS = 255
+
+def finite_points(points:np.ndarray)->np.ndarray:
+    """Rows of an (N, 4) sweep without NaN/inf in any channel, the only ones the quantized format can hold"""
+    finite = np.isfinite(points).all(axis=1)
+    return points if finite.all() else points[finite]
+
+def quantization(points:np.ndarray, step:float = POSITION_STEP)->tuple:
+    """
+    Per-frame (scale, offset) for xyz and reflectance. Positions are centred on the sweep's bounding box
+    and stored as int16 in steps of `step`, widened only if the sweep is longer than 65534 steps on an axis.
+    Reflectance spans its own min..max in 255 uint8 steps.
+    """
+    if len(points) == 0:
+        return np.full(3, step), np.zeros(3), 1.0, 0.0
+    lo = points[:, :3].min(axis=0).astype(np.float64)
+    hi = points[:, :3].max(axis=0).astype(np.float64)
+    xyz_offset = (lo + hi) / 2
+    xyz_scale = np.maximum(step, (hi - lo) / INT16_STEPS)
+    r_lo, r_hi = float(points[:, 3].min()), float(points[:, 3].max())
+    r_scale = (r_hi - r_lo) / UINT8_STEPS or 1.0
+    return xyz_scale, xyz_offset, r_scale, r_lo
+
+def error_bound(header:dict)->np.ndarray:
+    """Largest absolute decode error per channel (x, y, z, reflectance): half a quantization step plus float32 rounding"""
+    scale = np.append(header['xyz_scale'], header['r_scale'])
+    offset = np.append(header['xyz_offset'], header['r_offset'])
+    magnitude = np.abs(offset) + scale * 32768
+    return scale / 2 + 4 * magnitude * np.finfo(np.float32).eps
+
+def encode_sweep(points:np.ndarray, step:float = POSITION_STEP, chunk_points:int = CHUNK_POINTS, level:int = 6)->bytes:
+    """
+    Compact encoding of an (N, 4) float32 x, y, z, reflectance sweep: int16 positions and uint8 reflectance
+    with per-frame scale/offset, stored as per-channel planes in chunks of chunk_points, each zlib compressed.
+    Points with a NaN/inf channel are dropped, they would make the scale and offset of the whole sweep NaN.
+    """
+    points = finite_points(np.asarray(points, dtype=np.float32).reshape(-1, 4))
+    xyz_scale, xyz_offset, r_scale, r_offset = quantization(points, step)
+    quantized_xyz = np.rint((points[:, :3] - xyz_offset) / xyz_scale).astype(np.int16)
+    quantized_r = np.rint((points[:, 3] - r_offset) / r_scale).astype(np.uint8)
+
+    chunks = []
+    for start in range(0, len(points), chunk_points):
+        stop = start + chunk_points
+        planes = np.ascontiguousarray(quantized_xyz[start:stop].T).tobytes() + quantized_r[start:stop].tobytes()
+        chunks.append(zlib.compress(planes, level))
+    header = HEADER.pack(COMPACT_MAGIC, len(points), chunk_points, len(chunks), *xyz_scale, *xyz_offset, r_scale, r_offset)
+    sizes = np.array([len(chunk) for chunk in chunks], dtype=np.uint32).tobytes()
+    return header + sizes + b''.join(chunks)
+
+def decode_header(data:bytes)->dict:
+    magic, count, chunk_points, chunk_count, *values = HEADER.unpack_from(data)
+    if magic != COMPACT_MAGIC:
+        raise ValueError("Not a compact LiDAR sweep")
+    return {
+        'points': count, 'chunk_points': chunk_points, 'chunk_count': chunk_count,
+        'xyz_scale': np.array(values[0:3]), 'xyz_offset': np.array(values[3:6]),
+        'r_scale': values[6], 'r_offset': values[7],
+    }
+
+def decode_sweep(data:bytes)->np.ndarray:
+    """Decodes encode_sweep output back to an (N, 4) float32 array"""
+    header = decode_header(data)
+    count, chunk_points = header['points'], header['chunk_points']
+    sizes = np.frombuffer(data, dtype=np.uint32, count=header['chunk_count'], offset=HEADER.size)
+    scale = np.append(header['xyz_scale'], header['r_scale']).astype(np.float32)
+    offset = np.append(header['xyz_offset'], header['r_offset']).astype(np.float32)
+
+    points = np.empty((count, 4), dtype=np.float32)
+    position = HEADER.size + sizes.nbytes
+    for i, size in enumerate(sizes):
+        planes = zlib.decompress(data[position:position + size])
+        position += int(size)
+        start = i * chunk_points
+        n = min(chunk_points, count - start)
+        chunk = points[start:start + n]
+        chunk[:, :3] = np.frombuffer(planes, dtype=np.int16, count=3 * n).reshape(3, n).T
+        chunk[:, 3] = np.frombuffer(planes, dtype=np.uint8, count=n, offset=6 * n)
+    points *= scale
+    points += offset
+    return points
+
+def check_error_bound(points:np.ndarray, decoded:np.ndarray, data:bytes):
+    """
+    Raises ValueError if a decoded sweep is further from the original than its quantization allows.
+    It is compared against the finite points of the original, the ones encode_sweep keeps.
+    """
+    header = decode_header(data)
+    points = finite_points(np.asarray(points, dtype=np.float32).reshape(-1, 4))
+    if decoded.shape != points.shape:
+        raise ValueError(f"Decoded shape {decoded.shape} does not match {points.shape}")
+    if len(points) == 0:
+        return
+    error = np.abs(decoded.astype(np.float64) - points).max(axis=0)
+    bound = error_bound(header)
+    if not np.isfinite(error).all() or (error > bound).any():
+        raise ValueError(f"Compact sweep error {error} exceeds bound {bound}")
+
+def write_compact(points:np.ndarray, out_file_path:str, verify:bool = False)->str:
+    """Writes a compact sweep, with verify the encoding is decoded again and checked against the error bound"""
+    data = encode_sweep(points)
+    if verify:
+        check_error_bound(points, decode_sweep(data), data)
+    with open(out_file_path, 'wb') as f:
+        f.write(data)
+    return out_file_path
+
+def read_compact(file_path:str)->np.ndarray:
+    with open(file_path, 'rb') as f:
+        return decode_sweep(f.read())
+
+def load_sweep(file_path:str)->np.ndarray:
+    """Loads a converted sweep written either as .npy (memory mapped) or as a compact .lzq file"""
+    if file_path.endswith(COMPACT_EXTENSION):
+        return read_compact(file_path)
+    return np.load(file_path, mmap_mode='r')
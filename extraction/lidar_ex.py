@@ -1,52 +1,96 @@
 import os
 import numpy as np
 from extraction.helper import extract_timestamp
+from extraction.manifest import load_manifest, save_manifest, scan_sources, make_entry
+from extraction.voxel import write_lod_levels
+from extraction.lidar_codec import write_compact, finite_points, COMPACT_EXTENSION
 from config import settings
 import time
 from config import get_logger
+from metrics import metrics
 from concurrent.futures import ThreadPoolExecutor
 logger = get_logger(__name__)
 
+LIDAR_OUTPUT_FORMATS = {'npy': '.npy', 'compact': COMPACT_EXTENSION}
+
 def read_lidar_file(file_path:str, out_file_path:str)->np.ndarray:
     points = np.fromfile(file_path, dtype=np.float32).reshape(-1, 4) 
     np.save(out_file_path, points)
     return points
 
-def process_file(filename, folder_path, lidar_parsed_path):
+def process_file(filename, folder_path, lidar_parsed_path, lod_voxel_sizes=(), lod_mode='centroid', output_format='npy', verify=False):
     """
     Processes a single LiDAR file and returns a tuple of (timestamp, out_file_path).
+    output_format 'compact' writes a quantized .lzq sweep (see extraction.lidar_codec) instead of .npy,
+    verify checks it against its error bound. With lod_voxel_sizes, the downsampled levels of detail
+    are written next to it.
     """
     if filename.endswith('.bin') and filename.startswith('lidar_'):
         file_path = os.path.join(folder_path, filename)
         timestamp = extract_timestamp(filename, 'lidar') 
-        out_file_path = os.path.join(lidar_parsed_path, filename.replace('.bin', '.npy'))
-        read_lidar_file(file_path, out_file_path)
+        out_file_path = os.path.join(lidar_parsed_path, filename.replace('.bin', LIDAR_OUTPUT_FORMATS[output_format]))
+        if output_format == 'compact':
+            points = np.fromfile(file_path, dtype=np.float32).reshape(-1, 4)
+            write_compact(points, out_file_path, verify=verify)
+            dropped = len(points) - len(finite_points(points))
+            if dropped:
+                logger.info(f"Dropped {dropped} non-finite points of {filename} from its compact sweep")
+        else:
+            points = read_lidar_file(file_path, out_file_path)
+        if lod_voxel_sizes:
+            write_lod_levels(points, out_file_path, lod_voxel_sizes, lod_mode)
         return timestamp, out_file_path
     return None
 
-def read_lidar_from_folder(folder_path: str, lidar_parsed_path: str) -> dict:
+def read_lidar_from_folder(
+        folder_path: str,
+        lidar_parsed_path: str,
+        lod_voxel_sizes:list = None,
+        lod_mode:str = 'centroid',
+        output_format:str = 'npy',
+        verify:bool = False
+    ) -> dict:
     """
-    Reads all LiDAR files in parallel, saves them as .npy files,
+    Reads new or changed LiDAR files in parallel, saves them as .npy files
+    (or compact quantized .lzq files with output_format='compact'),
     returns a dict mapping timestamps to file path.
+    Files already listed in the output manifest with the same size and mtime are not re-converted.
+    lod_voxel_sizes adds precomputed voxel grid levels of detail per sweep (see extraction.voxel),
+    sweeps converted with other levels or in the other format are converted again.
     """
+    if output_format not in LIDAR_OUTPUT_FORMATS:
+        raise ValueError(f"Unknown lidar output format: {output_format}, expected one of {tuple(LIDAR_OUTPUT_FORMATS)}")
     t = time.time()
     logger.info(f"Reading LiDAR data from folder: {folder_path}")
     
-    point_cloud_dict = {}
     os.makedirs(lidar_parsed_path, exist_ok=True)
+    lod = {'lod_voxel_sizes': list(lod_voxel_sizes or []), 'lod_mode': lod_mode}
 
     try:
+        manifest, pending = scan_sources(folder_path, 'lidar', lidar_parsed_path, load_manifest(lidar_parsed_path))
+        for filename, entry in list(manifest.items()):
+            if (
+                not entry['out_path'].endswith(LIDAR_OUTPUT_FORMATS[output_format])
+                or entry.get('lod_voxel_sizes', []) != lod['lod_voxel_sizes']
+                or (lod['lod_voxel_sizes'] and entry.get('lod_mode') != lod_mode)
+            ):
+                pending.append((filename, entry['size'], entry['mtime_ns']))
+                del manifest[filename]
+
         with ThreadPoolExecutor() as executor:
             futures = [
-                executor.submit(process_file, filename, folder_path, lidar_parsed_path) for filename in os.listdir(folder_path)
+                (executor.submit(process_file, filename, folder_path, lidar_parsed_path, lod['lod_voxel_sizes'], lod_mode, output_format, verify), filename, size, mtime_ns)
+                for filename, size, mtime_ns in pending
             ]
             
-            for future in futures:
-                result = future.result()
-                if result:
-                    timestamp, out_file_path = result
-                    point_cloud_dict[timestamp] = out_file_path
-        
+            for future, filename, size, mtime_ns in futures:
+                timestamp, out_file_path = future.result()
+                manifest[filename] = {**make_entry(size, mtime_ns, timestamp, out_file_path), **lod}
+                metrics.record_io('lidar_convert', bytes_read=size, bytes_written=os.path.getsize(out_file_path))
+        save_manifest(lidar_parsed_path, manifest)
+        metrics.record_frames('lidar_convert', len(pending), time.time() - t)
+
+        point_cloud_dict = dict(sorted((entry['timestamp'], entry['out_path']) for entry in manifest.values()))
         logger.info(f"processed lidar data in: {time.time() - t:.2f}")
         return point_cloud_dict
     except Exception as e:
@@ -0,0 +1,155 @@
+import os
+import numpy as np
+import time
+from concurrent.futures import ThreadPoolExecutor
+from extraction.helper import extract_timestamp, closest_index
+from extraction.manifest import load_manifest, save_manifest, scan_sources, make_entry
+from config import get_logger
+from metrics import metrics
+logger = get_logger(__name__)
+
+STORE_DATA_NAME = 'sweeps.f32'
+STORE_INDEX_NAME = 'sweeps_index.npz'
+STORE_MANIFEST_NAME = 'store_manifest.json'
+POINT_BYTES = 4 * np.dtype(np.float32).itemsize
+
+class LidarStore:
+    """
+    Read only view of a packed sweep store: all sweeps of a folder as one contiguous
+    (N, 4) float32 file, with sweep i spanning rows offsets[i]:offsets[i+1].
+    Frames are returned as np.memmap views, nothing is copied until the caller does.
+    """
+    def __init__(self, store_dir:str):
+        self.store_dir = store_dir
+        with np.load(os.path.join(store_dir, STORE_INDEX_NAME)) as index:
+            self.timestamps = index['timestamps']
+            self.offsets = index['offsets']
+        total_points = int(self.offsets[-1])
+        if total_points:
+            self._points = np.memmap(
+                os.path.join(store_dir, STORE_DATA_NAME), dtype=np.float32, mode='r', shape=(total_points, 4)
+            )
+        else:
+            self._points = np.empty((0, 4), dtype=np.float32)
+
+    def __len__(self)->int:
+        return len(self.timestamps)
+
+    def frame(self, frame_index:int)->np.ndarray:
+        """(N, 4) view of a single sweep"""
+        if not 0 <= frame_index < len(self):
+            raise IndexError(f"Frame {frame_index} out of range for store with {len(self)} sweeps")
+        return self._points[self.offsets[frame_index]:self.offsets[frame_index + 1]]
+
+    def frame_range(self, start:int, stop:int)->tuple:
+        """
+        Sweeps start..stop-1 as one contiguous (M, 4) view, plus their row offsets
+        relative to the start of that view (length stop-start+1).
+        """
+        start, stop, _ = slice(start, stop).indices(len(self))
+        stop = max(start, stop)
+        block = self._points[self.offsets[start]:self.offsets[stop]]
+        return block, self.offsets[start:stop + 1] - self.offsets[start]
+
+    def frames(self, start:int, stop:int)->list:
+        """Sweeps start..stop-1 as a list of per-sweep views"""
+        block, offsets = self.frame_range(start, stop)
+        return [block[offsets[i]:offsets[i + 1]] for i in range(len(offsets) - 1)]
+
+    def nearest(self, timestamp:float)->int:
+        """Index of the sweep closest in time"""
+        return int(closest_index(self.timestamps, np.array([timestamp], dtype=np.float64))[0])
+
+def _write_sweeps(folder_path:str, filenames:list, data_path:str, mode:str, start_row:int)->list:
+    """Appends the given sweeps in order to the data file, returns their point counts"""
+    counts = []
+    with open(data_path, mode) as out, ThreadPoolExecutor() as executor:
+        if mode == 'r+b':
+            #drop rows past the index left over by an interrupted append
+            out.truncate(start_row * POINT_BYTES)
+            out.seek(0, os.SEEK_END)
+        #reads run ahead in parallel, writes stay in timestamp order
+        reads = executor.map(
+            lambda filename: np.fromfile(os.path.join(folder_path, filename), dtype=np.float32).reshape(-1, 4),
+            filenames
+        )
+        for points in reads:
+            points.tofile(out)
+            counts.append(len(points))
+    return counts
+
+def write_lidar_store(folder_path:str, store_dir:str)->LidarStore:
+    """
+    Packs all LiDAR sweeps of a folder into a single float32 file plus an offsets/timestamps index.
+    Unchanged folders are reused as is, sweeps newer than the last stored one are appended,
+    anything else (changed or removed files, out of order arrivals) rebuilds the store.
+    """
+    t = time.time()
+    os.makedirs(store_dir, exist_ok=True)
+    data_path = os.path.join(store_dir, STORE_DATA_NAME)
+    index_path = os.path.join(store_dir, STORE_INDEX_NAME)
+
+    previous = load_manifest(store_dir, STORE_MANIFEST_NAME)
+    fresh, pending = scan_sources(folder_path, 'lidar', store_dir, previous)
+    if not pending and len(fresh) == len(previous) and os.path.exists(index_path):
+        logger.info(f"LiDAR store at {store_dir} is up to date")
+        return LidarStore(store_dir)
+
+    new_files = sorted(
+        ((extract_timestamp(filename, 'lidar'), filename, size, mtime_ns) for filename, size, mtime_ns in pending)
+    )
+    can_append = os.path.exists(index_path) and len(fresh) == len(previous)
+    if can_append:
+        store = LidarStore(store_dir)
+        can_append = len(store) == len(fresh) and (len(store) == 0 or new_files[0][0] > store.timestamps[-1])
+
+    if can_append:
+        timestamps, offsets = store.timestamps, store.offsets
+        manifest = fresh
+        del store
+        mode = 'r+b'
+    else:
+        #full rebuild in timestamp order
+        new_files = sorted(
+            new_files + [(entry['timestamp'], filename, entry['size'], entry['mtime_ns']) for filename, entry in fresh.items()]
+        )
+        timestamps, offsets = np.empty(0, dtype=np.float64), np.zeros(1, dtype=np.int64)
+        manifest = {}
+        mode = 'wb'
+
+    #rebuilds go through a temp file, truncating a file other readers have mapped would crash them
+    write_path = data_path if mode == 'r+b' else data_path + '.tmp'
+    counts = _write_sweeps(folder_path, [filename for _, filename, _, _ in new_files], write_path, mode, int(offsets[-1]))
+    if write_path != data_path:
+        os.replace(write_path, data_path)
+    timestamps = np.concatenate((timestamps, [timestamp for timestamp, _, _, _ in new_files]))
+    offsets = np.concatenate((offsets, offsets[-1] + np.cumsum(counts, dtype=np.int64)))
+
+    metrics.record_io('lidar_store', bytes_read=sum(size for _, _, size, _ in new_files), bytes_written=sum(counts) * POINT_BYTES)
+    metrics.record_frames('lidar_store', len(new_files), time.time() - t)
+
+    first_index = len(timestamps) - len(new_files)
+    for i, (timestamp, filename, size, mtime_ns) in enumerate(new_files):
+        entry = make_entry(size, mtime_ns, timestamp, data_path)
+        entry['frame_index'] = first_index + i
+        manifest[filename] = entry
+
+    #index goes through a temp file so readers never see a half written one
+    tmp_index_path = index_path + '.tmp.npz'
+    np.savez(tmp_index_path, timestamps=timestamps, offsets=offsets)
+    os.replace(tmp_index_path, index_path)
+    save_manifest(store_dir, manifest, STORE_MANIFEST_NAME)
+
+    logger.info(
+        f"{'Appended' if mode == 'r+b' else 'Packed'} {len(new_files)} sweeps into {data_path} "
+        f"({len(timestamps)} total) in: {time.time() - t:.2f}"
+    )
+    return LidarStore(store_dir)
+
+def read_lidar_store_from_folder(folder_path:str, lidar_parsed_path:str)->tuple:
+    """
+    Packed storage alternative to read_lidar_from_folder.
+    Returns (store_dir, dict mapping timestamps to frame index in the store).
+    """
+    store = write_lidar_store(folder_path, lidar_parsed_path)
+    return store.store_dir, {float(timestamp): i for i, timestamp in enumerate(store.timestamps)}
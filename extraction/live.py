@@ -0,0 +1,475 @@
+import os
+import sys
+import json
+import time
+import codecs
+import argparse
+import numpy as np
+from collections import deque
+from extraction.helper import extract_timestamp, closest_index
+from extraction.lidar_ex import process_file, LIDAR_OUTPUT_FORMATS
+from extraction.image_ex import process_image
+from extraction.imu_gps import flatten_imu, flatten_gps
+from extraction.sync import interp_extrapolate
+from extraction.output import dumps_record
+from config import settings, get_logger
+from metrics import metrics
+logger = get_logger(__name__)
+
+CAMERA_SENSORS = ("lidar", "image")
+
+class SensorRing:
+    """
+    Last `capacity` samples of one sensor in time order, as contiguous NumPy arrays.
+    Backed by arrays of twice the capacity, the live window is shifted to the front only when the
+    end is reached, so appends are amortized O(1) and views need no copy.
+    """
+    def __init__(self, capacity:int):
+        self.capacity = max(2, capacity)
+        self._timestamps = np.empty(2 * self.capacity, dtype=np.float64)
+        self._columns = None
+        self._start = 0
+        self._end = 0
+        self.dropped = 0
+
+    def __len__(self)->int:
+        return self._end - self._start
+
+    def append(self, timestamp:float, values:dict)->float:
+        """Appends a sample, returns the timestamp of the oldest one if it was evicted to make room, else None"""
+        if self._columns is None:
+            self._columns = {
+                name: np.empty(2 * self.capacity, dtype=np.float64 if _is_number(value) else object)
+                for name, value in values.items()
+            }
+        if self._end == len(self._timestamps):
+            live = slice(self._start, self._end)
+            count = len(self)
+            self._timestamps[:count] = self._timestamps[live]
+            for column in self._columns.values():
+                column[:count] = column[live]
+            self._start, self._end = 0, count
+        self._timestamps[self._end] = timestamp
+        for name, column in self._columns.items():
+            column[self._end] = values.get(name, np.nan if column.dtype != object else None)
+        self._end += 1
+        if len(self) > self.capacity:
+            evicted = float(self._timestamps[self._start])
+            self._start += 1
+            self.dropped += 1
+            return evicted
+        return None
+
+    @property
+    def timestamps(self)->np.ndarray:
+        return self._timestamps[self._start:self._end]
+
+    @property
+    def columns(self)->dict:
+        return {name: column[self._start:self._end] for name, column in (self._columns or {}).items()}
+
+    @property
+    def latest(self)->float:
+        return self._timestamps[self._end - 1] if len(self) else -np.inf
+
+def _is_number(value)->bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+class JsonArrayTail:
+    """
+    Reads the elements appended to a JSON array file that is still being written.
+    Only complete elements are returned, the unparsed remainder (at most one element) is kept, and so
+    are parsed elements past the limit of a poll.
+    """
+    def __init__(self, file_path:str, chunk_bytes:int = 1 << 20):
+        self.file_path = file_path
+        self.chunk_bytes = chunk_bytes
+        self.finished = False
+        self._position = 0
+        self._buffer = ""
+        self._pending = deque()
+        self._opened = False
+        self._utf8 = codecs.getincrementaldecoder("utf-8")()
+        self._decoder = json.JSONDecoder()
+
+    def poll(self, limit:int = None)->list:
+        """At most limit new elements (all of them when None), the file is read one chunk at a time only as far as needed"""
+        elements = []
+        while limit is None or len(elements) < limit:
+            if not self._pending and not self._read_chunk():
+                break
+            take = len(self._pending) if limit is None else min(len(self._pending), limit - len(elements))
+            elements.extend(self._pending.popleft() for _ in range(take))
+        return elements
+
+    def _read_chunk(self)->bool:
+        """Parses the next chunk of the file into the pending elements, False when nothing new was written"""
+        if self.finished or not os.path.exists(self.file_path):
+            return False
+        with open(self.file_path, "rb") as f:
+            f.seek(self._position)
+            data = f.read(self.chunk_bytes)
+        if not data:
+            return False
+        self._position += len(data)
+        self._buffer += self._utf8.decode(data)
+        self._pending.extend(self._parse())
+        return True
+
+    def _parse(self)->list:
+        elements = []
+        buffer, pos = self._buffer, 0
+        while True:
+            while pos < len(buffer) and buffer[pos] in " \t\r\n,":
+                pos += 1
+            if pos >= len(buffer):
+                break
+            if not self._opened:
+                if buffer[pos] != "[":
+                    raise ValueError(f"{self.file_path} does not contain a JSON array")
+                self._opened = True
+                pos += 1
+                continue
+            if buffer[pos] == "]":
+                self.finished = True
+                pos = len(buffer)
+                break
+            try:
+                element, pos = self._decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                break  #element is still being written
+            elements.append(element)
+        self._buffer = buffer[pos:]
+        return elements
+
+class LiveSynchronizer:
+    """
+    Online counterpart of synchronize_frame for a folder that is still being recorded.
+    Every poll converts lidar and image files that appeared since the last one, reads new IMU/GPS
+    samples, and returns the records whose reference timestamp every other sensor has moved past.
+    Each sensor keeps at most buffer_size samples, and the folder is tracked with the name of the last
+    ingested file per camera sensor, so only newer files are parsed and memory does not grow with the ride.
+    New samples are read in rounds of at most what each buffer can take without evicting a sample that
+    a record not emitted yet still needs, emitting in between, so a backlog longer than the buffers
+    (attaching to a ride in progress, catching up after a stall) is aligned like the batch sync.
+    Samples that are evicted anyway are logged and counted in the live_dropped_total metric, and in
+    records_dropped (reference samples) or samples_dropped (every other sensor).
+    The reference sensor and the interpolate/closest choice per sensor are fixed once warmup_samples
+    lidar and image samples exist, using the same average gap rule as the batch sync.
+    """
+    def __init__(
+            self,
+            folder_path:str,
+            buffer_size:int = 4096,
+            warmup_samples:int = 50,
+            settle_s:float = 0.2,
+            lidar_format:str = 'npy'
+        ):
+        if lidar_format not in LIDAR_OUTPUT_FORMATS:
+            raise ValueError(f"Live mode supports lidar storage {tuple(LIDAR_OUTPUT_FORMATS)}, got {lidar_format}")
+        self.folder_path = folder_path
+        self.lidar_path = folder_path + settings.LIDAR_DIR
+        self.lidar_parsed_path = folder_path + settings.LIDAR_OUT_DIR
+        self.image_path = folder_path + settings.IMAGE_DIR
+        self.image_parsed_path = folder_path + settings.IMAGES_OUT_DIR
+        os.makedirs(self.lidar_parsed_path, exist_ok=True)
+        os.makedirs(self.image_parsed_path, exist_ok=True)
+        #camera rings stop reading at buffer_size until a reference is chosen, so warmup cannot need more
+        self.warmup_samples = max(2, min(warmup_samples, buffer_size))
+        self.settle_s = settle_s
+        self.lidar_format = lidar_format
+
+        self.rings = {sensor: SensorRing(buffer_size) for sensor in ("lidar", "image", "imu", "gps")}
+        self.tails = {
+            "imu": (JsonArrayTail(folder_path + settings.IMU_PATH), flatten_imu),
+            "gps": (JsonArrayTail(folder_path + settings.GPS_PATH), flatten_gps),
+        }
+        #name of the last ingested file per camera sensor, the fixed-width names sort in time order
+        self.high_water = {sensor: "" for sensor in CAMERA_SENSORS}
+        #samples evicted while a record not emitted yet still needed them, since the last report
+        self.evicted = {sensor: 0 for sensor in self.rings}
+        self.reference = None
+        self.interpolate = {}
+        self.emitted_until = -np.inf
+        self.records_emitted = 0
+        self.records_dropped = 0
+        self.samples_dropped = 0
+
+    def _new_files(self, sensor:str, folder_path:str, now:float)->list:
+        """
+        (timestamp, filename) of files named past the sensor's high-water name, in time order, up to the
+        first one modified within settle_s (possibly still being written) so no file is skipped.
+        Only those names are parsed and stat'ed, so a poll costs one listing however long the ride is.
+        """
+        if not os.path.isdir(folder_path):
+            return []
+        high_water = self.high_water[sensor]
+        names = sorted(
+            name for name in os.listdir(folder_path)
+            if name > high_water and name.endswith('.bin') and name.startswith(sensor + '_')
+        )
+        settled = []
+        for name in names:
+            try:
+                if now - os.stat(os.path.join(folder_path, name)).st_mtime < self.settle_s:
+                    break
+            except FileNotFoundError:
+                continue
+            settled.append((extract_timestamp(name, sensor), name))
+        return settled
+
+    def _first_pending(self)->float:
+        """Lower bound of the reference timestamps whose records are not emitted yet"""
+        if self.reference is None:
+            #either camera may become the reference
+            return min(ring.timestamps[0] if len(ring) else -np.inf for ring in (self.rings[s] for s in CAMERA_SENSORS))
+        reference = self.rings[self.reference]
+        lo = int(np.searchsorted(reference.timestamps, self.emitted_until, side="right"))
+        if lo < len(reference):
+            return float(reference.timestamps[lo])
+        #every buffered reference sample is emitted, the next one comes after the latest
+        return max(reference.latest, self.emitted_until)
+
+    def _is_reference(self, sensor:str)->bool:
+        return sensor == self.reference or (self.reference is None and sensor in CAMERA_SENSORS)
+
+    def _room(self, sensor:str)->int:
+        """
+        How many samples the sensor's ring can take without evicting one that is still needed: the
+        reference keeps its samples that are not emitted yet, every other sensor the closest sample at
+        or before the first pending reference timestamp and everything after it.
+        """
+        ring = self.rings[sensor]
+        free = ring.capacity - len(ring)
+        if self._is_reference(sensor):
+            return free + int(np.searchsorted(ring.timestamps, self.emitted_until, side="right"))
+        return free + max(0, int(np.searchsorted(ring.timestamps, self._first_pending(), side="right")) - 1)
+
+    def _append(self, sensor:str, timestamp:float, values:dict):
+        ring = self.rings[sensor]
+        evicted = ring.append(timestamp, values)
+        if evicted is None:
+            return
+        if self._is_reference(sensor):
+            lost = evicted > self.emitted_until
+        else:
+            #the evicted sample was still needed unless the new oldest one is at or before the first pending record
+            lost = ring.timestamps[0] > self._first_pending()
+        if lost:
+            self.evicted[sensor] += 1
+
+    def _ingest_file(self, sensor:str, timestamp:float, filename:str):
+        if sensor == "lidar":
+            _, out_file_path = process_file(
+                filename, self.lidar_path, self.lidar_parsed_path,
+                settings.LIDAR_LOD_VOXEL_SIZES, settings.LIDAR_LOD_MODE, output_format=self.lidar_format,
+            )
+        else:
+            _, out_file_path, _ = process_image(filename, self.image_path, self.image_parsed_path)
+        self._append(sensor, timestamp, {sensor: out_file_path})
+        self.high_water[sensor] = filename
+
+    def _ingest_round(self, files:dict)->tuple:
+        """
+        Moves new samples into every ring, each at most as many as _room allows. files holds the settled
+        new camera files per sensor and is consumed. Returns the number of samples read and the sensors
+        that ran out of room, which may have more samples left.
+        """
+        ingested, full = 0, set()
+        for sensor in CAMERA_SENSORS:
+            queue, room = files[sensor], self._room(sensor)
+            for _ in range(min(room, len(queue))):
+                self._ingest_file(sensor, *queue.popleft())
+                ingested += 1
+            if queue:
+                full.add(sensor)
+        for sensor, (tail, flatten) in self.tails.items():
+            ring, room = self.rings[sensor], self._room(sensor)
+            entries = tail.poll(room)
+            for entry in entries:
+                flat = flatten(entry)
+                timestamp = flat.pop("timestamp")
+                if timestamp > ring.latest:
+                    self._append(sensor, timestamp, flat)
+            ingested += len(entries)
+            if len(entries) == room:
+                full.add(sensor)
+        return ingested, full
+
+    def _choose_reference(self, final:bool = False)->bool:
+        if self.reference is not None:
+            return True
+        #at the end of a recording pick it from whatever was recorded, however short
+        warmup = 2 if final else max(2, self.warmup_samples)
+        if any(len(self.rings[sensor]) < warmup for sensor in CAMERA_SENSORS):
+            return False
+        #IMU/GPS logs that stay (nearly) empty are aligned like align_sensor_columns does, so wait for them until the end
+        if not final and any(len(self.rings[sensor]) < 2 for sensor in ("imu", "gps")):
+            return False
+        #a sensor with fewer than 2 samples has no gap and is never interpolated
+        gaps = {
+            sensor: float(np.mean(np.diff(ring.timestamps[:200]))) if len(ring) > 1 else np.nan
+            for sensor, ring in self.rings.items()
+        }
+        self.reference = "lidar" if gaps["lidar"] > gaps["image"] else "image"
+        avg_gap_ref = gaps[self.reference]
+        self.interpolate = {sensor: gaps[sensor] > avg_gap_ref for sensor in self.rings if sensor != self.reference}
+        #evictions of the other camera were counted while it could still have been the reference
+        self.evicted["image" if self.reference == "lidar" else "lidar"] = 0
+        logger.info(f"Live sync of {self.folder_path}: reference {self.reference}, interpolating {[s for s, i in self.interpolate.items() if i]}")
+        return True
+
+    def _align(self, lo:int, hi:int)->dict:
+        """Same per sensor alignment as align_sensor_columns for reference samples lo..hi-1, on the buffered samples"""
+        reference = self.rings[self.reference]
+        ref_timestamps = reference.timestamps[lo:hi]
+        synchronized = {"timestamp": ref_timestamps, self.reference: reference.columns[self.reference][lo:hi]}
+        for sensor in ("image" if self.reference == "lidar" else "lidar", "imu", "gps"):
+            ring = self.rings[sensor]
+            if not len(ring):
+                #no samples, the fields seen so far (none for a log that stayed empty) are left empty
+                synchronized.update({name: np.full(len(ref_timestamps), np.nan) for name in ring.columns})
+                continue
+            idx = None
+            for name, values in ring.columns.items():
+                if self.interpolate[sensor] and values.dtype != object:
+                    synchronized[name] = interp_extrapolate(ref_timestamps, ring.timestamps, values)
+                else:
+                    if idx is None:
+                        idx = closest_index(ring.timestamps, ref_timestamps)
+                    synchronized[name] = values[idx]
+        return synchronized
+
+    def _count_dropped(self):
+        """Reports samples evicted since the last poll while a record that was not emitted yet still needed them"""
+        evicted, self.evicted = self.evicted, {sensor: 0 for sensor in self.rings}
+        for sensor, dropped in evicted.items():
+            if not dropped:
+                continue
+            metrics.inc('live_dropped_total', dropped, sensor=sensor)
+            capacity = self.rings[sensor].capacity
+            if sensor == self.reference:
+                self.records_dropped += dropped
+                logger.error(
+                    f"Live sync of {self.folder_path} dropped {dropped} {sensor} records ({self.records_dropped} in total): "
+                    f"they left the {capacity} sample buffer before every other sensor caught up, raise LIVE_BUFFER_SIZE"
+                )
+            else:
+                self.samples_dropped += dropped
+                logger.error(
+                    f"Live sync of {self.folder_path} dropped {dropped} {sensor} samples ({self.samples_dropped} in total) "
+                    f"that records not emitted yet needed, they left the {capacity} sample buffer and those records "
+                    f"are aligned to the samples left, raise LIVE_BUFFER_SIZE"
+                )
+
+    def _emit(self, final:bool = False, full:set = ())->list:
+        if not self._choose_reference(final):
+            return []
+        self._count_dropped()
+        reference = self.rings[self.reference].timestamps
+        others = [(sensor, ring.latest) for sensor, ring in self.rings.items() if sensor != self.reference]
+        if final:
+            #end of the recording: only sensors whose ring ran out of room can still have samples to read
+            horizon = min((latest for sensor, latest in others if sensor in full), default=np.inf)
+        else:
+            #a record is final once every other sensor has a sample after it
+            horizon = min(latest for _, latest in others)
+        lo = int(np.searchsorted(reference, self.emitted_until, side="right"))
+        hi = int(np.searchsorted(reference, horizon, side="left"))
+        if hi <= lo:
+            return []
+        synchronized = self._align(lo, hi)
+        self.emitted_until = float(reference[hi - 1])
+        columns = {name: values.tolist() for name, values in synchronized.items()}
+        records = [dict(zip(columns, row)) for row in zip(*columns.values())]
+        self.records_emitted += len(records)
+        return records
+
+    def _sync(self, final:bool)->list:
+        """
+        Alternates ingest rounds with emitting until neither makes progress. With final, records still
+        pending then are emitted up to the sensors that may have samples left, until none are pending.
+        """
+        now = time.time()
+        files = {
+            "lidar": deque(self._new_files("lidar", self.lidar_path, now)),
+            "image": deque(self._new_files("image", self.image_path, now)),
+        }
+        records = []
+        while True:
+            ingested, full = self._ingest_round(files)
+            emitted = self._emit()
+            if final and not (ingested or emitted):
+                emitted = self._emit(final=True, full=full)
+            if not (ingested or emitted):
+                return records
+            records.extend(emitted)
+
+    def poll(self)->list:
+        """Ingests whatever is new and returns the records that became final"""
+        return self._sync(final=False)
+
+    def flush(self)->list:
+        """Ingests the rest and returns every remaining record, for the end of a recording"""
+        return self._sync(final=True)
+
+def make_live_synchronizer(folder_path:str, lidar_format:str = None)->LiveSynchronizer:
+    """LiveSynchronizer configured from the LIVE_* settings"""
+    return LiveSynchronizer(
+        folder_path,
+        buffer_size=settings.LIVE_BUFFER_SIZE,
+        warmup_samples=settings.LIVE_WARMUP_SAMPLES,
+        settle_s=settings.LIVE_SETTLE_SECONDS,
+        lidar_format=lidar_format or settings.LIDAR_STORAGE,
+    )
+
+def tail_folder(
+        folder_path:str,
+        emit,
+        poll_interval:float = 0.5,
+        idle_timeout:float = 30.0,
+        lidar_format:str = None,
+        should_stop = None
+    )->int:
+    """
+    Polls a recording folder until no new records appear for idle_timeout seconds (or should_stop()
+    returns True), then flushes. emit(records) is called with every non-empty batch. Returns the record count.
+    """
+    synchronizer = make_live_synchronizer(folder_path, lidar_format)
+    last_data = time.time()
+    while not (should_stop and should_stop()):
+        records = synchronizer.poll()
+        if records:
+            emit(records)
+            last_data = time.time()
+        elif time.time() - last_data >= idle_timeout:
+            break
+        time.sleep(poll_interval)
+    records = synchronizer.flush()
+    if records:
+        emit(records)
+    return synchronizer.records_emitted
+
+def ndjson_writer(out):
+    """emit callback appending records as NDJSON lines to an open text file"""
+    def emit(records:list):
+        out.write(''.join(dumps_record(record) + '\n' for record in records))
+        out.flush()
+    return emit
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Synchronize a folder that is still being recorded, writing NDJSON records")
+    parser.add_argument('folder_path')
+    parser.add_argument('--ndjson', help="file to append records to, stdout when omitted")
+    parser.add_argument('--poll-interval', type=float, default=settings.LIVE_POLL_INTERVAL)
+    parser.add_argument('--idle-timeout', type=float, default=settings.LIVE_IDLE_TIMEOUT)
+    parser.add_argument('--lidar-storage', default=None, choices=tuple(LIDAR_OUTPUT_FORMATS))
+    args = parser.parse_args()
+
+    out = open(args.ndjson, 'a') if args.ndjson else sys.stdout
+    try:
+        count = tail_folder(args.folder_path, ndjson_writer(out), args.poll_interval, args.idle_timeout, args.lidar_storage)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    logger.info(f"Live sync of {args.folder_path} emitted {count} records")
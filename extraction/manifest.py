@@ -0,0 +1,56 @@
+import os
+import json
+from config import get_logger
+logger = get_logger(__name__)
+
+MANIFEST_NAME = 'manifest.json'
+
+def load_manifest(out_dir:str, manifest_name:str = MANIFEST_NAME)->dict:
+    """Loads the manifest of an output dir, maps source filename to its entry"""
+    manifest_path = os.path.join(out_dir, manifest_name)
+    if not os.path.exists(manifest_path):
+        return {}
+    try:
+        with open(manifest_path, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        logger.info(f"Ignoring unreadable manifest {manifest_path}: {e}")
+        return {}
+
+def save_manifest(out_dir:str, manifest:dict, manifest_name:str = MANIFEST_NAME):
+    """Writes the manifest atomically so an interrupted run never leaves a partial file"""
+    manifest_path = os.path.join(out_dir, manifest_name)
+    tmp_path = manifest_path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f)
+    os.replace(tmp_path, manifest_path)
+
+def make_entry(size:int, mtime_ns:int, timestamp:float, out_path:str)->dict:
+    return {'size': size, 'mtime_ns': mtime_ns, 'timestamp': timestamp, 'out_path': out_path}
+
+def scan_sources(folder_path:str, data_type:str, out_dir:str, manifest:dict)->tuple:
+    """
+    Compares the source folder against the manifest using a single directory scan.
+    Returns (fresh, pending): fresh maps filename to its still valid manifest entry,
+    pending lists (filename, size, mtime_ns) of new or changed sources to convert.
+    """
+    existing_outputs = {entry.name for entry in os.scandir(out_dir)}
+    fresh = {}
+    pending = []
+    for entry in os.scandir(folder_path):
+        name = entry.name
+        if not (name.endswith('.bin') and name.startswith(data_type + '_')):
+            continue
+        stat = entry.stat()
+        known = manifest.get(name)
+        if (
+            known is not None
+            and known['size'] == stat.st_size
+            and known['mtime_ns'] == stat.st_mtime_ns
+            and os.path.basename(known['out_path']) in existing_outputs
+        ):
+            fresh[name] = known
+        else:
+            pending.append((name, stat.st_size, stat.st_mtime_ns))
+    logger.info(f"{data_type} manifest scan: {len(fresh)} up to date, {len(pending)} to convert")
+    return fresh, pending
@@ -0,0 +1,76 @@
+import io
+import json
+import math
+import numpy as np
+from typing import TYPE_CHECKING
+if TYPE_CHECKING:
+    import pandas as pd
+
+def json_value(value):
+    """JSON has no NaN/inf, non-finite floats (e.g. missing IMU/GPS values) become null"""
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    return value
+
+def json_column(values:np.ndarray)->list:
+    """A column slice as plain Python values with non-finite floats as None"""
+    items = values.tolist()
+    if values.dtype.kind == 'f':
+        for i in np.flatnonzero(~np.isfinite(values)):
+            items[i] = None
+    elif values.dtype == object:
+        items = [json_value(value) for value in items]
+    return items
+
+def dumps_record(record:dict)->str:
+    """One record as strict JSON, non-finite floats as null"""
+    return json.dumps({name: json_value(value) for name, value in record.items()}, allow_nan=False)
+
+def iter_records(synchronized_df:'pd.DataFrame', chunk_size:int = 1000):
+    """
+    Yields the synchronized records as dicts of JSON safe values, built chunk by chunk
+    from the column arrays (no copy of numeric columns), so only one chunk is held as Python objects.
+    """
+    chunk_size = max(1, chunk_size)
+    columns = {name: synchronized_df[name].to_numpy() for name in synchronized_df.columns}
+    for start in range(0, len(synchronized_df), chunk_size):
+        chunk = {name: json_column(values[start:start + chunk_size]) for name, values in columns.items()}
+        for row in zip(*chunk.values()):
+            yield dict(zip(chunk, row))
+
+def iter_ndjson(synchronized_df:'pd.DataFrame', chunk_size:int = 1000):
+    """Yields the synchronized records as NDJSON bytes, one chunk of rows at a time, NaN/inf as null"""
+    lines = []
+    for record in iter_records(synchronized_df, chunk_size):
+        lines.append(json.dumps(record, allow_nan=False) + '\n')
+        if len(lines) >= chunk_size:
+            yield ''.join(lines).encode('utf-8')
+            lines = []
+    if lines:
+        yield ''.join(lines).encode('utf-8')
+
+def to_columns(synchronized_df:'pd.DataFrame')->dict:
+    """
+    One NumPy array per field. String columns (paths, store dirs) become
+    fixed width unicode arrays so saving and loading them needs no pickle.
+    """
+    import pandas as pd
+    columns = {}
+    for name in synchronized_df.columns:
+        values = synchronized_df[name].to_numpy()
+        if values.dtype == object or pd.api.types.is_string_dtype(synchronized_df[name]):
+            values = values.astype(str)
+        columns[name] = values
+    return columns
+
+def to_npz(synchronized_df:'pd.DataFrame')->bytes:
+    """Columnar export: one array per field in an uncompressed .npz"""
+    buffer = io.BytesIO()
+    np.savez(buffer, **to_columns(synchronized_df))
+    return buffer.getvalue()
+
+def to_npy(array:np.ndarray)->bytes:
+    """Single array as .npy bytes, loadable with np.load(io.BytesIO(content))"""
+    buffer = io.BytesIO()
+    np.save(buffer, array)
+    return buffer.getvalue()
@@ -0,0 +1,79 @@
+import pandas as pd
+from contextlib import contextmanager
+from extraction.lidar_ex import read_lidar_from_folder
+from extraction.lidar_store import read_lidar_store_from_folder
+from extraction.image_ex import read_images_from_folder
+from extraction.imu_gps import read_imu, read_gps
+from extraction.sync import synchronize_frame
+from extraction.sync_index import save_sync_index
+from extraction.geo_index import save_geo_index, remove_geo_index
+from config import settings, get_logger
+from metrics import metrics
+logger = get_logger(__name__)
+
+STAGES = ("lidar", "images", "imu_gps", "align")
+
+def synchronize_folder(folder_path:str, lidar_storage:str = None, progress = None)->pd.DataFrame:
+    """
+    Full synchronize-sensor pipeline for a data folder: parses lidar and images, reads IMU/GPS,
+    aligns everything and persists the sync index. progress(stage, status) is called as each
+    stage of STAGES starts ('running') and finishes ('done').
+    """
+    report = progress or (lambda stage, status: None)
+
+    @contextmanager
+    def stage(name:str):
+        report(name, "running")
+        with metrics.timer(name):
+            yield
+        report(name, "done")
+
+    lidar_storage = lidar_storage or settings.LIDAR_STORAGE
+    if lidar_storage not in ('npy', 'compact', 'packed'):
+        raise ValueError(f"Unknown lidar storage: {lidar_storage}, expected npy, compact or packed")
+    lidar_path = folder_path + settings.LIDAR_DIR
+    lidar_parsed_path = folder_path + settings.LIDAR_OUT_DIR
+    image_path = folder_path + settings.IMAGE_DIR
+    image_parsed_path = folder_path + settings.IMAGES_OUT_DIR
+    imu_path = folder_path + settings.IMU_PATH
+    gps_path = folder_path + settings.GPS_PATH
+
+    logger.info(f'Synchronizing folder: {folder_path} \nCreating Lidar parsed output')
+    lidar_store = None
+    with stage("lidar"):
+        if lidar_storage == 'packed':
+            lidar_store, lidar_dict = read_lidar_store_from_folder(lidar_path, lidar_parsed_path)
+        else:
+            lidar_dict = read_lidar_from_folder(
+                lidar_path,
+                lidar_parsed_path,
+                lod_voxel_sizes=settings.LIDAR_LOD_VOXEL_SIZES,
+                lod_mode=settings.LIDAR_LOD_MODE,
+                output_format=lidar_storage,
+                verify=settings.LIDAR_COMPACT_VERIFY,
+            )
+
+    logger.info('Creating Image parsed output')
+    with stage("images"):
+        image_dict = read_images_from_folder(
+            image_path,
+            image_parsed_path,
+            executor=settings.IMAGE_EXECUTOR,
+            max_workers=settings.IMAGE_WORKERS or None,
+            chunk_size=settings.IMAGE_CHUNK_SIZE,
+            output_format=settings.IMAGE_OUTPUT_FORMAT,
+        )
+
+    with stage("imu_gps"):
+        imu_data = read_imu(imu_path, cache_dir=folder_path + settings.IMU_GPS_CACHE_DIR)
+        gps_data = read_gps(gps_path, cache_dir=folder_path + settings.IMU_GPS_CACHE_DIR)
+
+    logger.info('Synchronizing data')
+    with stage("align"):
+        synchronized_df = synchronize_frame(lidar_dict,image_dict, imu_data, gps_data, lidar_store=lidar_store)
+        columns = save_sync_index(folder_path + settings.SYNC_INDEX_PATH, synchronized_df)
+        if "latitude" in columns and "longitude" in columns:
+            save_geo_index(folder_path + settings.GEO_INDEX_PATH, columns["latitude"], columns["longitude"], settings.GEO_CELL_METERS)
+        else:
+            remove_geo_index(folder_path + settings.GEO_INDEX_PATH)
+    return synchronized_df
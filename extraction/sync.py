@@ -1,8 +1,8 @@
 import numpy as np
 import pandas as pd
-from scipy.interpolate import interp1d
-pd.set_option('display.precision', 13)
-from config import get_logger
+from extraction.helper import closest_index
+from config import get_logger, settings
+from metrics import metrics
 import time
 logger = get_logger(__name__)
 
@@ -35,9 +35,15 @@ def align_sensor_data(
         sensor_type:str
     )->pd.DataFrame:
     
+    if len(sensor_df) == 0:
+        #a sensor without samples (e.g. an empty IMU log) leaves its fields empty in every record
+        logger.info(f"No {sensor_type} data")
+        return pd.DataFrame({"timestamp": ref_timestamps, **{name: np.nan for name in sensor_df.columns if name != "timestamp"}})
+
     avg_gap_sensor = np.mean(np.diff(sensor_df["timestamp"].values[:min(200, len(sensor_df))]))
 
     if avg_gap_sensor > avg_gap_ref:  # Interpolate if too sparse, mostly for GPS
+        from scipy.interpolate import interp1d  #only the pandas engine needs scipy, keep it off the import path
         logger.info(f"Interpolating {sensor_type} data")
         interp_func = interp1d(
             sensor_df["timestamp"], 
@@ -61,20 +67,134 @@ def align_sensor_data(
         return aligned_sensor_df
         
 
-def synchronize_data(
+def interp_extrapolate(ref_timestamps:np.ndarray, timestamps:np.ndarray, values:np.ndarray) -> np.ndarray:
+    """ np.interp with linear extrapolation past both ends, same as interp1d(fill_value="extrapolate") """
+    interpolated = np.interp(ref_timestamps, timestamps, values)
+    if len(timestamps) > 1:
+        before = ref_timestamps < timestamps[0]
+        after = ref_timestamps > timestamps[-1]
+        slope_first = (values[1] - values[0]) / (timestamps[1] - timestamps[0])
+        slope_last = (values[-1] - values[-2]) / (timestamps[-1] - timestamps[-2])
+        interpolated[before] = values[0] + (ref_timestamps[before] - timestamps[0]) * slope_first
+        interpolated[after] = values[-1] + (ref_timestamps[after] - timestamps[-1]) * slope_last
+    return interpolated
+
+def align_sensor_columns(
+        avg_gap_ref:float,
+        timestamps:np.ndarray,
+        columns:dict,
+        ref_timestamps:np.ndarray,
+        sensor_type:str
+    ) -> dict:
+    """ Index based counterpart of align_sensor_data, works on a dict of column arrays.
+    Numeric columns are interpolated when the sensor is sparser than the reference,
+    otherwise every column is gathered with one closest-index array. """
+    if len(timestamps) == 0:
+        #a sensor without samples (e.g. an empty IMU log) leaves its fields empty in every record
+        logger.info(f"No {sensor_type} data")
+        return {name: np.full(len(ref_timestamps), np.nan) for name in columns}
+
+    if not np.all(timestamps[1:] >= timestamps[:-1]):
+        order = np.argsort(timestamps, kind="stable")
+        timestamps = timestamps[order]
+        columns = {name: values[order] for name, values in columns.items()}
+
+    avg_gap_sensor = np.mean(np.diff(timestamps[:min(200, len(timestamps))]))
+    interpolate = avg_gap_sensor > avg_gap_ref
+    logger.info(f"{'Interpolating' if interpolate else 'Using original'} {sensor_type} data")
+
+    idx = None
+    aligned = {}
+    for name, values in columns.items():
+        if interpolate and np.issubdtype(values.dtype, np.number):
+            aligned[name] = interp_extrapolate(ref_timestamps, timestamps, values.astype(np.float64, copy=False))
+        else:
+            if idx is None:
+                idx = closest_index(timestamps, ref_timestamps)
+            aligned[name] = values[idx]
+    return aligned
+
+def _frame_columns(df:pd.DataFrame) -> tuple:
+    """ (timestamps, dict of the other columns) as NumPy arrays, without copying where possible """
+    if "timestamp" not in df:
+        return np.empty(0, dtype=np.float64), {}
+    return df["timestamp"].to_numpy(), {name: df[name].to_numpy() for name in df.columns if name != "timestamp"}
+
+def synchronize_columns(
+        lidar_data:dict,
+        image_data:dict,
+        imu_df:pd.DataFrame,
+        gps_df:pd.DataFrame
+    ) -> dict:
+    """ Pure NumPy synchronization: one index array per sensor, columns gathered by index,
+    no joins on float timestamps. Returns the synchronized table as a dict of column arrays. """
+    t = time.time()
+    sensor_timestamps = {
+        "lidar": np.fromiter(lidar_data.keys(), dtype=np.float64, count=len(lidar_data)),
+        "image": np.fromiter(image_data.keys(), dtype=np.float64, count=len(image_data)),
+    }
+    reference_sensor, reference_timestamps, avg_gap_ref = find_reference(sensor_timestamps)
+    other_sensor = "image" if reference_sensor == "lidar" else "lidar"
+    sensor_values = {
+        "lidar": np.array(list(lidar_data.values())),
+        "image": np.array(list(image_data.values())),
+    }
+
+    synchronized = {"timestamp": reference_timestamps, reference_sensor: sensor_values[reference_sensor]}
+    synchronized.update(align_sensor_columns(
+        avg_gap_ref,
+        sensor_timestamps[other_sensor],
+        {other_sensor: sensor_values[other_sensor]},
+        reference_timestamps,
+        other_sensor
+    ))
+    for sensor_type, sensor_df in (("imu", imu_df), ("gps", gps_df)):
+        timestamps, columns = _frame_columns(sensor_df)
+        synchronized.update(align_sensor_columns(avg_gap_ref, timestamps, columns, reference_timestamps, sensor_type))
+    logger.info("Index based synchronization completed in %s", time.time() - t)
+    return synchronized
+
+def synchronize_frame(
+        lidar_data:dict,
+        image_data:dict, 
+        imu_df:pd.DataFrame, 
+        gps_df:pd.DataFrame,
+        lidar_store:str = None,
+        engine:str = None
+    ) -> pd.DataFrame:
+
+    """ Synchronizes all sensor data based on the slowest frame rate, one row per reference timestamp.
+    engine is 'numpy' (index based, default from SYNC_ENGINE) or 'pandas' (merge based).
+    With lidar_store set, lidar_data maps timestamps to frame indices of that packed store
+    and records reference the sweep as (lidar_store, lidar_frame) instead of a path. """
+    engine = engine or settings.SYNC_ENGINE
+    #checked before the timer so an unknown engine never becomes a stage_seconds label
+    if engine not in ("numpy", "pandas"):
+        raise ValueError(f"Unknown sync engine: {engine}, expected numpy or pandas")
+    with metrics.timer("sync_" + engine) as timing:
+        if engine == "numpy":
+            synchronized_df = pd.DataFrame(synchronize_columns(lidar_data, image_data, imu_df, gps_df), copy=False)
+        else:
+            synchronized_df = synchronize_frame_pandas(lidar_data, image_data, imu_df, gps_df)
+        timing['frames'] = len(synchronized_df)
+
+    if lidar_store is not None:
+        synchronized_df = synchronized_df.rename(columns={"lidar": "lidar_frame"})
+        synchronized_df.insert(synchronized_df.columns.get_loc("lidar_frame"), "lidar_store", lidar_store)
+    return synchronized_df
+
+def synchronize_frame_pandas(
         lidar_data:dict,
         image_data:dict, 
         imu_df:pd.DataFrame, 
         gps_df:pd.DataFrame
-    ) -> list:
+    ) -> pd.DataFrame:
 
-    """ Synchronizes all sensor data based on the slowest frame rate. """
+    """ Merge based synchronization, kept as the reference for synchronize_columns. """
     t = time.time()
     sensor_timestamps = {
         "lidar": np.array(list(lidar_data.keys())),
         "image": np.array(list(image_data.keys())),
-        "imu": imu_df["timestamp"].values,
-        "gps": gps_df["timestamp"].values
     }
     reference_sensor, reference_timestamps, avg_gap_ref = find_reference(sensor_timestamps)
 
@@ -117,7 +237,18 @@ def synchronize_data(
         .merge(imu_df, on="timestamp", how="left")
         .merge(gps_df, on="timestamp", how="left")
     )
-    synchronized_data = synchronized_df.to_dict(orient="records")
     logger.info("Synchronization completed in %s", time.time() - t)
-    return synchronized_data
+    return synchronized_df
+
+def synchronize_data(
+        lidar_data:dict,
+        image_data:dict, 
+        imu_df:pd.DataFrame, 
+        gps_df:pd.DataFrame,
+        lidar_store:str = None,
+        engine:str = None
+    ) -> list:
+
+    """ Synchronizes all sensor data based on the slowest frame rate, returns a list of records. """
+    return synchronize_frame(lidar_data, image_data, imu_df, gps_df, lidar_store=lidar_store, engine=engine).to_dict(orient="records")
 
@@ -0,0 +1,55 @@
+import os
+import numpy as np
+from typing import TYPE_CHECKING
+from functools import lru_cache
+from extraction.output import to_columns, json_column
+from extraction.helper import closest_index
+from config import get_logger
+if TYPE_CHECKING:
+    import pandas as pd
+logger = get_logger(__name__)
+
+def save_sync_index(index_path:str, synchronized_df:'pd.DataFrame')->dict:
+    """Persists the synchronized table sorted by timestamp as one array per field, returns the saved columns"""
+    columns = to_columns(synchronized_df)
+    order = np.argsort(columns["timestamp"], kind="stable")
+    if not np.array_equal(order, np.arange(len(order))):
+        columns = {name: values[order] for name, values in columns.items()}
+    tmp_path = index_path + ".tmp.npz"
+    np.savez(tmp_path, **columns)
+    os.replace(tmp_path, index_path)
+    logger.info(f"Saved sync index with {len(order)} records to {index_path}")
+    return columns
+
+@lru_cache(maxsize=16)
+def _cached_index(index_path:str, mtime_ns:int)->dict:
+    """Index columns kept in memory per (path, mtime), a rewritten index is reloaded on next use"""
+    with np.load(index_path) as index:
+        return {name: index[name] for name in index.files}
+
+def load_sync_index(index_path:str)->dict:
+    if not os.path.exists(index_path):
+        raise FileNotFoundError(f"No sync index at {index_path}, run /synchronize-sensor on the folder first")
+    return _cached_index(index_path, os.stat(index_path).st_mtime_ns)
+
+def index_records(index:dict, start:int, stop:int)->list:
+    """Rows start..stop-1 of the index as records with plain Python values, NaN/inf as None"""
+    columns = {name: json_column(values[start:stop]) for name, values in index.items()}
+    return [dict(zip(columns, row)) for row in zip(*columns.values())]
+
+def query_range(index:dict, start:float = None, end:float = None, limit:int = None)->list:
+    """Records with start <= timestamp <= end, in time order, at most limit of them"""
+    timestamps = index["timestamp"]
+    lo = 0 if start is None else int(np.searchsorted(timestamps, start, side="left"))
+    hi = len(timestamps) if end is None else int(np.searchsorted(timestamps, end, side="right"))
+    if limit is not None:
+        hi = min(hi, lo + max(0, limit))
+    return index_records(index, lo, max(lo, hi))
+
+def query_nearest(index:dict, timestamp:float)->dict:
+    """Record closest in time, ties go to the earlier one"""
+    timestamps = index["timestamp"]
+    if len(timestamps) == 0:
+        return None
+    nearest = int(closest_index(timestamps, np.array([timestamp], dtype=np.float64))[0])
+    return index_records(index, nearest, nearest + 1)[0]
@@ -0,0 +1,94 @@
+import os
+import numpy as np
+from extraction.lidar_store import LidarStore
+from extraction.lidar_codec import load_sweep
+from config import get_logger
+logger = get_logger(__name__)
+
+VOXEL_MODES = ('centroid', 'first')
+
+#bits per axis when packing integer voxel coordinates into one int64 key
+KEY_BITS = 21
+
+def voxel_keys(xyz:np.ndarray, voxel_size:float)->np.ndarray:
+    """
+    One int64 key per point from its integer voxel coordinates floor(xyz / voxel_size).
+    Coordinates are shifted to start at 0 and packed 21 bits per axis, which is exact for
+    clouds spanning up to 2**21 voxels per axis, larger clouds fall back to np.unique on the rows.
+    """
+    cells = np.floor(xyz / voxel_size).astype(np.int64)
+    cells -= cells.min(axis=0)
+    if cells.max(initial=0) >= 1 << KEY_BITS:
+        _, keys = np.unique(cells, axis=0, return_inverse=True)
+        return keys.reshape(-1)
+    return (cells[:, 0] << (2 * KEY_BITS)) | (cells[:, 1] << KEY_BITS) | cells[:, 2]
+
+def voxel_downsample(points:np.ndarray, voxel_size:float, mode:str = 'centroid')->np.ndarray:
+    """
+    Keeps one point per occupied voxel of an (N, 4) x, y, z, reflectance sweep.
+    'centroid' averages all four channels of the points in a voxel, 'first' keeps the first point
+    that fell into it. Output rows follow the order in which voxels are first hit, as float32.
+    """
+    if mode not in VOXEL_MODES:
+        raise ValueError(f"Unknown voxel mode: {mode}, expected one of {VOXEL_MODES}")
+    if voxel_size <= 0:
+        raise ValueError(f"Voxel size must be positive, got {voxel_size}")
+    if len(points) == 0:
+        return np.empty((0, 4), dtype=np.float32)
+
+    _, first, inverse = np.unique(voxel_keys(points[:, :3], voxel_size), return_index=True, return_inverse=True)
+    order = np.argsort(first, kind='stable')
+    if mode == 'first':
+        return np.ascontiguousarray(points[first[order]], dtype=np.float32)
+
+    inverse = inverse.reshape(-1)
+    counts = np.bincount(inverse, minlength=len(first))
+    centroids = np.empty((len(first), points.shape[1]), dtype=np.float64)
+    for channel in range(points.shape[1]):
+        centroids[:, channel] = np.bincount(inverse, weights=points[:, channel], minlength=len(first))
+    centroids /= counts[:, np.newaxis]
+    return centroids[order].astype(np.float32)
+
+def lod_path(out_file_path:str, level:int)->str:
+    """Path of a precomputed level of detail next to the full sweep: lidar_<ts>.lod<level>.npy"""
+    root, _ = os.path.splitext(out_file_path)
+    return f"{root}.lod{level}.npy"
+
+def write_lod_levels(points:np.ndarray, out_file_path:str, voxel_sizes:list, mode:str = 'centroid')->list:
+    """
+    Writes one downsampled copy per voxel size, level i uses voxel_sizes[i-1] (level 0 is the
+    full sweep). Returns the written paths in level order.
+    """
+    paths = []
+    for level, voxel_size in enumerate(voxel_sizes, start=1):
+        path = lod_path(out_file_path, level)
+        np.save(path, voxel_downsample(points, voxel_size, mode))
+        paths.append(path)
+    return paths
+
+def load_lod(points_path:str, level:int, voxel_sizes:list, mode:str = 'centroid')->np.ndarray:
+    """
+    Loads a sweep at the given level of detail, using the precomputed file when it exists
+    and downsampling the full sweep otherwise.
+    """
+    if not 0 <= level <= len(voxel_sizes):
+        raise ValueError(f"Unknown LOD level {level}, expected 0..{len(voxel_sizes)} (levels come from LIDAR_LOD_VOXEL_SIZES)")
+    if level == 0:
+        return load_sweep(points_path)
+    path = lod_path(points_path, level)
+    if os.path.exists(path):
+        return np.load(path, mmap_mode='r')
+    logger.info(f"No precomputed LOD {level} for {points_path}, downsampling on request")
+    return voxel_downsample(load_sweep(points_path), voxel_sizes[level - 1], mode)
+
+def load_record_lod(record:dict, level:int, voxel_sizes:list, mode:str = 'centroid')->np.ndarray:
+    """
+    Sweep of a synchronized record at the given level of detail, from its .npy path ('lidar')
+    or from its packed store ('lidar_store', 'lidar_frame'), which has no precomputed levels.
+    """
+    if 'lidar_store' in record:
+        if not 0 <= level <= len(voxel_sizes):
+            raise ValueError(f"Unknown LOD level {level}, expected 0..{len(voxel_sizes)} (levels come from LIDAR_LOD_VOXEL_SIZES)")
+        points = LidarStore(record['lidar_store']).frame(int(record['lidar_frame']))
+        return points if level == 0 else voxel_downsample(points, voxel_sizes[level - 1], mode)
+    return load_lod(record['lidar'], level, voxel_sizes, mode)
@@ -0,0 +1,176 @@
+import os
+import time
+import uuid
+import threading
+import functools
+import contextvars
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, Future
+from extraction.pipeline import synchronize_folder, STAGES
+from extraction.sync_index import load_sync_index, index_records
+from config import settings, get_logger
+from metrics import metrics
+logger = get_logger(__name__)
+
+class SyncJob:
+    """State of one background synchronize-sensor run"""
+    def __init__(self, folder_path:str, lidar_storage:str):
+        self.job_id = uuid.uuid4().hex
+        self.folder_path = folder_path
+        self.lidar_storage = lidar_storage
+        self.state = "queued"
+        self.stages = {stage: {"status": "pending", "started": None, "finished": None} for stage in STAGES}
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.error = None
+        #summary of the result, the records themselves are in the folder's sync index
+        self.result = None
+
+    def progress(self, stage:str, status:str):
+        """Stage callback handed to synchronize_folder"""
+        entry = self.stages[stage]
+        entry["status"] = status
+        entry["started" if status == "running" else "finished"] = time.time()
+
+    def status(self, include_data:bool = False)->dict:
+        data = {
+            "job_id": self.job_id,
+            "folder_path": self.folder_path,
+            "lidar_storage": self.lidar_storage,
+            "state": self.state,
+            "stages": {stage: dict(entry) for stage, entry in self.stages.items()},
+            "created": self.created,
+            "started": self.started,
+            "finished": self.finished,
+            "error": self.error,
+        }
+        if self.result is not None:
+            data.update(self.result)
+            if include_data:
+                index = load_sync_index(self.result["sync_index"])
+                data["data"] = index_records(index, 0, len(index["timestamp"]))
+        return data
+
+class JobManager:
+    """
+    Runs sync jobs on a bounded thread pool. At most max_workers run at once and at most
+    max_pending wait behind them. A folder has at most one queued or running sync, background
+    or inline: a second request with the same lidar_storage gets that job back, one with a
+    different storage is rejected. Only the last `history` finished jobs are kept.
+    """
+    def __init__(self, max_workers:int, max_pending:int, history:int):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.history = history
+        self._executor = None
+        self._lock = threading.Lock()
+        self._jobs = OrderedDict()
+        self._active = {}
+
+    def _pool(self)->ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="sync-job")
+        return self._executor
+
+    def _check_active(self, key:str, lidar_storage:str)->SyncJob:
+        """Active job of the folder, if any, caller holds the lock"""
+        active = self._active.get(key)
+        if active is not None and active.lidar_storage != lidar_storage:
+            raise RuntimeError(
+                f"Sync job {active.job_id} is {active.state} for {active.folder_path} with lidar_storage={active.lidar_storage}, "
+                f"wait for it to finish before syncing the folder with lidar_storage={lidar_storage}"
+            )
+        return active
+
+    def _enqueue(self, job:SyncJob, key:str, raise_errors:bool, context:contextvars.Context = None)->Future:
+        """
+        Registers and queues a job, caller holds the lock and has checked the folder is free.
+        With context the job runs in it, e.g. to report its stages in the caller's Server-Timing.
+        """
+        queued = sum(1 for active in self._active.values() if active.state == "queued")
+        if queued >= self.max_pending:
+            raise RuntimeError(f"Too many queued sync jobs ({queued}), try again later")
+        self._jobs[job.job_id] = job
+        self._active[key] = job
+        run = self._run if context is None else functools.partial(context.run, self._run)
+        future = self._pool().submit(run, job, key, raise_errors)
+        self._update_queue_depth()
+        logger.info(f"Queued sync job {job.job_id} for {job.folder_path}")
+        return future
+
+    def submit(self, folder_path:str, lidar_storage:str = None)->tuple:
+        """Returns (job, created)"""
+        lidar_storage = lidar_storage or settings.LIDAR_STORAGE
+        key = os.path.abspath(folder_path)
+        with self._lock:
+            active = self._check_active(key, lidar_storage)
+            if active is not None:
+                return active, False
+            job = SyncJob(folder_path, lidar_storage)
+            self._enqueue(job, key, raise_errors=False)
+        return job, True
+
+    def submit_inline(self, folder_path:str, lidar_storage:str = None)->Future:
+        """
+        Queues a sync whose caller waits for the result, on the same bounded pool and queue as
+        background jobs, so it never overlaps a job for the same folder and inline syncs can't
+        pile up on the server's threads. The future resolves to the synchronized DataFrame.
+        """
+        lidar_storage = lidar_storage or settings.LIDAR_STORAGE
+        key = os.path.abspath(folder_path)
+        with self._lock:
+            active = self._check_active(key, lidar_storage)
+            if active is not None:
+                raise RuntimeError(f"Sync job {active.job_id} is already {active.state} for {folder_path}, poll it at /synchronize-sensor/jobs/{active.job_id}")
+            return self._enqueue(SyncJob(folder_path, lidar_storage), key, raise_errors=True, context=contextvars.copy_context())
+
+    def get(self, job_id:str)->SyncJob:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _update_queue_depth(self):
+        """Queued and running job gauges, caller holds the lock"""
+        states = [job.state for job in self._active.values()]
+        metrics.set('queue_depth', states.count("queued"), queue='sync_jobs_queued')
+        metrics.set('queue_depth', states.count("running"), queue='sync_jobs_running')
+
+    def _run(self, job:SyncJob, key:str, raise_errors:bool = False):
+        with self._lock:
+            job.state = "running"
+            job.started = time.time()
+            self._update_queue_depth()
+        synchronized_df = None
+        try:
+            synchronized_df = synchronize_folder(job.folder_path, job.lidar_storage, progress=job.progress)
+            job.result = {"records": len(synchronized_df), "sync_index": job.folder_path + settings.SYNC_INDEX_PATH}
+            job.state = "done"
+        except Exception as e:
+            logger.error(f"Sync job {job.job_id} failed: {e}")
+            job.error = str(e)
+            job.state = "failed"
+            for entry in job.stages.values():
+                if entry["status"] == "running":
+                    entry["status"] = "failed"
+            if raise_errors:
+                raise
+        finally:
+            job.finished = time.time()
+            with self._lock:
+                self._active.pop(key, None)
+                self._prune()
+                self._update_queue_depth()
+            logger.info(f"Sync job {job.job_id} {job.state} in: {job.finished - job.started:.2f}")
+        return synchronized_df
+
+    def _prune(self):
+        """Drops the oldest finished jobs past the history limit, caller holds the lock"""
+        finished = [job_id for job_id, job in self._jobs.items() if job.state in ("done", "failed")]
+        for job_id in finished[:max(0, len(finished) - self.history)]:
+            del self._jobs[job_id]
+
+job_manager = JobManager(
+    max_workers=settings.SYNC_JOB_WORKERS,
+    max_pending=settings.SYNC_JOB_MAX_PENDING,
+    history=settings.SYNC_JOB_HISTORY,
+)
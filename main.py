@@ -1,9 +1,29 @@
-from fastapi import FastAPI
+import time
+from fastapi import FastAPI, Request
 from api import router
+from config import settings
+from metrics import metrics, server_timing_header
 
 
 app = FastAPI(
     title='Sensor Data', description="Server for GRA assessment, LIDAR Bike", docs_url='/docs'
 )
 
-app.include_router(router)
\ No newline at end of file
+app.include_router(router)
+
+@app.middleware("http")
+async def record_request_timing(request: Request, call_next):
+    """ Times every request per route and optionally reports stage timings in a Server-Timing header """
+    timings, token = metrics.begin_request()
+    t = time.perf_counter()
+    try:
+        response = await call_next(request)
+    finally:
+        metrics.end_request(token)
+    elapsed = time.perf_counter() - t
+    route = request.scope.get('route')
+    metrics.observe('http_request_seconds', elapsed, path=getattr(route, 'path', 'unmatched'))
+    if settings.SERVER_TIMING:
+        timings.append(('total', elapsed))
+        response.headers['Server-Timing'] = server_timing_header(timings)
+    return response
\ No newline at end of file
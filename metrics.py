@@ -0,0 +1,144 @@
+import time
+import threading
+import functools
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+PREFIX = 'bike_'
+
+HELP = {
+    'stage_seconds': ('summary', 'Time spent per pipeline stage'),
+    'http_request_seconds': ('summary', 'Time spent per HTTP route'),
+    'bytes_read_total': ('counter', 'Bytes read from disk per stage'),
+    'bytes_written_total': ('counter', 'Bytes written per stage'),
+    'frames_total': ('counter', 'Frames/files/samples processed per stage'),
+    'frames_per_second': ('gauge', 'Throughput of the last run of a stage'),
+    'queue_depth': ('gauge', 'Items waiting in a queue'),
+    'live_dropped_total': ('counter', 'Live sync samples evicted from the buffer while a record not emitted yet still needed them'),
+}
+
+#per request stage timings for the Server-Timing header, None outside a request
+_request_timings = ContextVar('request_timings', default=None)
+
+def _label_key(labels:dict)->tuple:
+    return tuple(sorted(labels.items()))
+
+def _escape_label(value)->str:
+    """Label value escaping of the text format: backslash, double quote and newline"""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_labels(key:tuple)->str:
+    if not key:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape_label(value)}"' for name, value in key) + '}'
+
+class Metrics:
+    """
+    In-process counters, gauges and timing summaries, rendered in the Prometheus text format.
+    Timers also feed the Server-Timing entries of the request they run in.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._gauges = {}
+        self._summaries = {}
+
+    def inc(self, name:str, value:float = 1.0, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0.0) + value
+
+    def set(self, name:str, value:float, **labels):
+        with self._lock:
+            self._gauges[(name, _label_key(labels))] = value
+
+    def observe(self, name:str, seconds:float, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            count, total = self._summaries.get(key, (0, 0.0))
+            self._summaries[key] = (count + 1, total + seconds)
+
+    @contextmanager
+    def timer(self, stage:str, frames:int = None):
+        """
+        Times a block as stage_seconds{stage=...}. Frames and throughput are recorded when
+        frames is given, or set on the yielded dict (timing['frames'] = n) once known.
+        """
+        timing = {'frames': frames}
+        t = time.perf_counter()
+        try:
+            yield timing
+        finally:
+            elapsed = time.perf_counter() - t
+            self.observe('stage_seconds', elapsed, stage=stage)
+            if timing['frames'] is not None:
+                self.record_frames(stage, timing['frames'], elapsed)
+            timings = _request_timings.get()
+            if timings is not None:
+                timings.append((stage, elapsed))
+
+    def timed(self, stage:str):
+        """Decorator form of timer"""
+        def decorator(fn):
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                with self.timer(stage):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def record_frames(self, stage:str, frames:int, seconds:float):
+        """A run with no frames (e.g. nothing new to convert) is skipped, keeping the last real throughput"""
+        if not frames:
+            return
+        self.inc('frames_total', frames, stage=stage)
+        if seconds > 0:
+            self.set('frames_per_second', frames / seconds, stage=stage)
+
+    def record_io(self, stage:str, bytes_read:int = 0, bytes_written:int = 0):
+        if bytes_read:
+            self.inc('bytes_read_total', bytes_read, stage=stage)
+        if bytes_written:
+            self.inc('bytes_written_total', bytes_written, stage=stage)
+
+    def render(self)->str:
+        """Prometheus text exposition format"""
+        with self._lock:
+            counters = dict(self._counters)
+            gauges = dict(self._gauges)
+            summaries = dict(self._summaries)
+        lines = []
+        names = sorted({name for name, _ in counters} | {name for name, _ in gauges} | {name for name, _ in summaries})
+        for name in names:
+            kind, description = HELP.get(name, ('untyped', name))
+            full_name = PREFIX + name
+            lines.append(f'# HELP {full_name} {description}')
+            lines.append(f'# TYPE {full_name} {kind}')
+            for (metric, key), value in sorted(counters.items()):
+                if metric == name:
+                    lines.append(f'{full_name}{_format_labels(key)} {value}')
+            for (metric, key), value in sorted(gauges.items()):
+                if metric == name:
+                    lines.append(f'{full_name}{_format_labels(key)} {value}')
+            for (metric, key), (count, total) in sorted(summaries.items()):
+                if metric == name:
+                    lines.append(f'{full_name}_count{_format_labels(key)} {count}')
+                    lines.append(f'{full_name}_sum{_format_labels(key)} {total}')
+        return '\n'.join(lines) + '\n'
+
+    def begin_request(self)->tuple:
+        """Starts collecting Server-Timing entries for the current request, returns (timings, token)"""
+        timings = []
+        return timings, _request_timings.set(timings)
+
+    def end_request(self, token):
+        _request_timings.reset(token)
+
+def server_timing_header(timings:list)->str:
+    """Server-Timing value, repeated stages are summed: lidar;dur=12.3, images;dur=4.5"""
+    totals = {}
+    for stage, seconds in timings:
+        totals[stage] = totals.get(stage, 0.0) + seconds
+    return ', '.join(f'{stage};dur={seconds * 1000:.1f}' for stage, seconds in totals.items())
+
+metrics = Metrics()
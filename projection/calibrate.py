@@ -1,8 +1,11 @@
 import numpy as np
 import os
 import cv2
+from functools import lru_cache
 from config import get_logger
 from config import settings
+from metrics import metrics
+from projection.raster import rasterize_points, reflectance_to_bgr
 
 logger = get_logger(__name__)
 
@@ -32,48 +35,138 @@ def project_lidar_to_image(points, R_vc, T_vc, R02, T02, R_rect, P2)->np.ndarray
 
     return points_2d
 
+def compose_projection(calib_velo_to_cam:dict, calib_cam_to_cam:dict)->tuple:
+    """Compose the velodyne->cam2 (3x4) and velodyne->image (3x4) matrices"""
+    R_velo_to_cam = calib_velo_to_cam['R'].reshape(3, 3)
+    T_velo_to_cam = calib_velo_to_cam['T']
+    R02 = calib_cam_to_cam['R_02'].reshape(3, 3)
+    T02 = calib_cam_to_cam['T_02']
+    R_rect = calib_cam_to_cam['R_rect_02'].reshape(3, 3)
+    P2 = calib_cam_to_cam['P_rect_02'].reshape(3, 4)
 
-def visualize_lidar_on_image(frame_number:str)->str:
-    """Visualize LiDAR points projected onto the corresponding Camera 2 image."""
-    
+    velo_to_cam2 = np.hstack((R02 @ R_velo_to_cam, (R02 @ T_velo_to_cam + T02)[:, np.newaxis]))
+    velo_to_image = P2[:, :3] @ R_rect @ velo_to_cam2
+    velo_to_image[:, 3] += P2[:, 3]
+    return velo_to_cam2, velo_to_image
+
+@lru_cache(maxsize=8)
+def _cached_projection(velo_path:str, velo_mtime:float, cam_path:str, cam_mtime:float)->tuple:
+    """Parses and composes calibration once per (path, mtime) pair"""
+    velo_to_cam2, velo_to_image = compose_projection(load_calibration(velo_path), load_calibration(cam_path))
+    velo_to_cam2.setflags(write=False)
+    velo_to_image.setflags(write=False)
+    return velo_to_cam2, velo_to_image
+
+def calibration_mtimes()->tuple:
+    """Modification times of the calibration files, used to invalidate cached results"""
+    return os.path.getmtime(settings.CALIB_VELO_TO_CAM), os.path.getmtime(settings.CALIB_CAM_TO_CAM)
+
+def get_projection_matrices()->tuple:
+    """Returns cached (velo_to_cam2, velo_to_image), re-parsed only when a calibration file changes"""
+    velo_mtime, cam_mtime = calibration_mtimes()
+    return _cached_projection(settings.CALIB_VELO_TO_CAM, velo_mtime, settings.CALIB_CAM_TO_CAM, cam_mtime)
+
+def project_lidar_with_matrices(points:np.ndarray, velo_to_cam2:np.ndarray, velo_to_image:np.ndarray)->np.ndarray:
+    """Project 3D Lidar points to 2D image with the composed matrices"""
+    xyz = points[:, :3]
+    in_front = xyz @ velo_to_cam2[2, :3] + velo_to_cam2[2, 3] > 0  #filter out points behind camera where z<0
+    points_2d_hom = xyz[in_front] @ velo_to_image[:, :3].T + velo_to_image[:, 3]  #(N, 3) Project to 2D
+    return points_2d_hom[:, :2] / points_2d_hom[:, 2][:, np.newaxis]  #Normalize
+
+def frame_paths(frame_number:str)->tuple:
+    """Image and LiDAR paths of a KITTI frame"""
     image_path = os.path.join(settings.BONUS_IMAGE_DIR, f"{frame_number.zfill(10)}.png")
     lidar_path = os.path.join(settings.BONUS_LIDAR_DIR, f"{frame_number.zfill(10)}.bin")
     if not os.path.exists(image_path) or not os.path.exists(lidar_path):
         raise FileNotFoundError(f"Image or LiDAR file not found: {frame_number}")
+    return image_path, lidar_path
 
-    image = cv2.imread(image_path)
-    points = np.fromfile(lidar_path, dtype=np.float32).reshape(-1, 4)  #(N, 4)
-    reflectance = points[:, 3] 
-
-    calib_velo_to_cam = load_calibration(settings.CALIB_VELO_TO_CAM)
-    calib_cam_to_cam = load_calibration(settings.CALIB_CAM_TO_CAM)
-
-    #extract matrices for calibration
-    R_velo_to_cam = calib_velo_to_cam['R'].reshape(3, 3) 
-    T_velo_to_cam = calib_velo_to_cam['T'] 
-    R02 = calib_cam_to_cam['R_02'].reshape(3, 3) 
-    T02 = calib_cam_to_cam['T_02'] 
-    R_rect = calib_cam_to_cam['R_rect_02'].reshape(3, 3)
-    P2 = calib_cam_to_cam['P_rect_02'].reshape(3, 4)
-
-    points_2d = project_lidar_to_image(points, R_velo_to_cam, T_velo_to_cam, R02, T02, R_rect, P2)
+def draw_overlay(image:np.ndarray, points:np.ndarray, velo_to_cam2:np.ndarray, velo_to_image:np.ndarray, radius:int = 0, blend:str = 'overwrite')->np.ndarray:
+    """Projects an (N, 4) sweep with the composed matrices and draws it onto the image in place"""
+    reflectance = points[:, 3]
+    points_2d = project_lidar_with_matrices(points, velo_to_cam2, velo_to_image)
 
     #reflectance_normalized = (reflectance - np.min(reflectance)) / (np.max(reflectance) - np.min(reflectance))
-    colors = (reflectance * 255).astype(np.uint8)
-
-    #Overlay on image
+    #Overlay on image, colors are paired with the projected points in order as the per-point loop did
+    bgr = reflectance_to_bgr(reflectance[:len(points_2d)])
+    rasterize_points(image, points_2d, bgr, radius=radius, mode=blend)
+    return image
+
+def render_overlay(frame_number:str, radius:int = 0, blend:str = 'overwrite')->np.ndarray:
+    """Renders LiDAR points projected onto the Camera 2 image, returns the BGR image"""
+    image_path, lidar_path = frame_paths(frame_number)
+
+    with metrics.timer('projection', frames=1):
+        image = cv2.imread(image_path)
+        points = np.fromfile(lidar_path, dtype=np.float32).reshape(-1, 4)  #(N, 4)
+        metrics.record_io('projection', bytes_read=os.path.getsize(image_path) + points.nbytes)
+
+        velo_to_cam2, velo_to_image = get_projection_matrices()
+        draw_overlay(image, points, velo_to_cam2, velo_to_image, radius=radius, blend=blend)
+    return image
+
+@lru_cache(maxsize=settings.OVERLAY_CACHE_SIZE)
+def _cached_overlay(frame_key:str, file_mtimes:tuple, radius:int, blend:str, image_format:str)->bytes:
+    """Rendered and encoded overlays, keyed by frame, source/calibration mtimes and render options"""
+    image = render_overlay(frame_key, radius=radius, blend=blend)
+    with metrics.timer('encode', frames=1):
+        ok, encoded = cv2.imencode(f".{image_format}", image)
+    if not ok:
+        raise ValueError(f"Could not encode overlay for frame {frame_key} as {image_format}")
+    metrics.record_io('encode', bytes_written=encoded.nbytes)
+    return encoded.tobytes()
+
+def encode_overlay(frame_number:str, image_format:str = 'png', radius:int = 0, blend:str = 'overwrite')->bytes:
+    """Returns the encoded overlay image bytes, served from the LRU cache when nothing changed"""
+    image_format = image_format.lower().replace('jpg', 'jpeg')
+    if image_format not in ('png', 'jpeg'):
+        raise ValueError(f"Unsupported image format: {image_format}, expected png or jpeg")
+    image_path, lidar_path = frame_paths(frame_number)
+    file_mtimes = (os.path.getmtime(image_path), os.path.getmtime(lidar_path)) + calibration_mtimes()
+    return _cached_overlay(frame_number.zfill(10), file_mtimes, radius, blend, image_format)
+
+
+def overlay_points_sequential(image:np.ndarray, points_2d:np.ndarray, colors:np.ndarray)->np.ndarray:
+    """Per-point cv2.line overlay, kept as the reference for rasterize_points"""
     for (u, v), color in zip(points_2d, colors):
         if 0 <= u < image.shape[1] and 0 <= v < image.shape[0]:
             #cv2.circle(image, (int(u), int(v)), 1, (255, 255, 255-int(color)), 1)  #Color based on reflectance
             cv2.line(image, (int(u), int(v)), (int(u), int(v)), (255, 255, 255 - int(color)), 1)
-    
+    return image
+
+def visualize_lidar_on_image(frame_number:str, radius:int = 0, blend:str = 'overwrite')->str:
+    """Visualize LiDAR points projected onto the corresponding Camera 2 image."""
+    encoded = encode_overlay(frame_number, 'png', radius=radius, blend=blend)
+
     os.makedirs(settings.BONUS_OUT_DIR, exist_ok=True)
     output_path =settings.BONUS_OUT_DIR + f"/output_{frame_number}.png"
-    cv2.imwrite(output_path, image)
+    with open(output_path, 'wb') as f:
+        f.write(encoded)
 
     logger.info(f"Visualization saved to {output_path}")
     return os.path.abspath(output_path)
 
 if __name__ == '__main__':
-    frame_number = "4" 
-    visualize_lidar_on_image(frame_number)
\ No newline at end of file
+    import argparse
+    from projection.sequence import render_sequence, SEQUENCE_FORMATS
+
+    parser = argparse.ArgumentParser(description="Project LiDAR onto camera 2 for one frame or a frame range")
+    parser.add_argument('--frame', default="4", help="single frame to render into BONUS_OUT_DIR")
+    parser.add_argument('--start', type=int, help="first frame of a range, renders a sequence")
+    parser.add_argument('--end', type=int, help="last frame of the range (inclusive)")
+    parser.add_argument('--output', help="mp4 path or image directory, default in BONUS_OUT_DIR")
+    parser.add_argument('--format', choices=SEQUENCE_FORMATS, default='mp4')
+    parser.add_argument('--fps', type=float, default=settings.SEQUENCE_FPS)
+    parser.add_argument('--workers', type=int, default=settings.SEQUENCE_WORKERS or None)
+    parser.add_argument('--radius', type=int, default=0)
+    parser.add_argument('--blend', default='overwrite')
+    args = parser.parse_args()
+
+    if args.start is None:
+        visualize_lidar_on_image(args.frame, radius=args.radius, blend=args.blend)
+    else:
+        end = args.start if args.end is None else args.end
+        print(render_sequence(
+            args.start, end, output_path=args.output, output_format=args.format, fps=args.fps,
+            radius=args.radius, blend=args.blend, max_workers=args.workers,
+        ))
\ No newline at end of file
@@ -0,0 +1,130 @@
+import os
+import numpy as np
+import cv2
+from functools import lru_cache
+from config import settings, get_logger
+from metrics import metrics
+from extraction.output import to_npy
+from projection.calibrate import frame_paths, calibration_mtimes, get_projection_matrices
+
+logger = get_logger(__name__)
+
+#uint16 PNG depth is meters * 256 with 0 for pixels without a return, as in the KITTI depth benchmark
+DEPTH_PNG_SCALE = 256.0
+DEPTH_FORMATS = ('png', 'npy', 'colormap')
+COLOR_BY = ('depth', 'reflectance')
+COLORMAPS = {
+    'jet': cv2.COLORMAP_JET,
+    'turbo': cv2.COLORMAP_TURBO,
+    'viridis': cv2.COLORMAP_VIRIDIS,
+    'inferno': cv2.COLORMAP_INFERNO,
+    'magma': cv2.COLORMAP_MAGMA,
+    'plasma': cv2.COLORMAP_PLASMA,
+}
+
+def zbuffer_indices(points:np.ndarray, velo_to_cam2:np.ndarray, velo_to_image:np.ndarray, width:int, height:int)->tuple:
+    """
+    Projects an (N, 4) sweep into a width x height image and keeps the nearest point per pixel.
+    Returns (pixel_index, point_index, depth): flat pixel indices y * width + x in increasing order,
+    the index of the winning point in the sweep and its camera 2 depth in meters.
+    Pixels are the truncated projections, as drawn by rasterize_points.
+    """
+    xyz = points[:, :3]
+    depth = xyz @ velo_to_cam2[2, :3] + velo_to_cam2[2, 3]
+    point_index = np.flatnonzero(depth > 0)  #filter out points behind camera where z<0
+    points_2d_hom = xyz[point_index] @ velo_to_image[:, :3].T + velo_to_image[:, 3]
+    u = points_2d_hom[:, 0] / points_2d_hom[:, 2]
+    v = points_2d_hom[:, 1] / points_2d_hom[:, 2]
+    in_image = (u >= 0) & (u < width) & (v >= 0) & (v < height)
+    point_index = point_index[in_image]
+    pixel_index = v[in_image].astype(np.int64) * width + u[in_image].astype(np.int64)
+
+    #sort by pixel then depth, the first entry of every pixel is the nearest point
+    order = np.lexsort((depth[point_index], pixel_index))
+    pixel_index, first = np.unique(pixel_index[order], return_index=True)
+    point_index = point_index[order[first]]
+    return pixel_index, point_index, depth[point_index].astype(np.float32)
+
+@lru_cache(maxsize=settings.DEPTH_CACHE_SIZE)
+def _cached_indices(frame_key:str, file_mtimes:tuple)->tuple:
+    """Z-buffered pixel/point indices and depths of a frame, keyed by frame and source/calibration mtimes"""
+    image_path, lidar_path = frame_paths(frame_key)
+    with metrics.timer('depth_projection', frames=1):
+        height, width = cv2.imread(image_path).shape[:2]
+        points = np.fromfile(lidar_path, dtype=np.float32).reshape(-1, 4)  #(N, 4)
+        velo_to_cam2, velo_to_image = get_projection_matrices()
+        indices = zbuffer_indices(points, velo_to_cam2, velo_to_image, width, height)
+    for array in indices:
+        array.setflags(write=False)
+    return indices + ((height, width),)
+
+def frame_indices(frame_number:str)->tuple:
+    """
+    Returns (pixel_index, point_index, depth, (height, width)) for a KITTI frame, projected once
+    and served from the LRU cache until the frame or calibration files change.
+    """
+    image_path, lidar_path = frame_paths(frame_number)
+    file_mtimes = (os.path.getmtime(image_path), os.path.getmtime(lidar_path)) + calibration_mtimes()
+    return _cached_indices(frame_number.zfill(10), file_mtimes)
+
+def depth_map(frame_number:str)->np.ndarray:
+    """Sparse (height, width) float32 depth in meters of the nearest LiDAR return per pixel, 0 where there is none"""
+    pixel_index, _, depth, shape = frame_indices(frame_number)
+    depth_image = np.zeros(shape, dtype=np.float32)
+    depth_image.reshape(-1)[pixel_index] = depth
+    return depth_image
+
+def render_depth_colormap(frame_number:str, colormap:str = 'jet', color_by:str = 'depth')->np.ndarray:
+    """
+    Draws the z-buffered points onto the camera image colored by depth or reflectance, scaled to the
+    frame's min..max. Uses the cached indices, so changing colormap or color_by does not project again.
+    """
+    if colormap not in COLORMAPS:
+        raise ValueError(f"Unknown colormap: {colormap}, expected one of {tuple(COLORMAPS)}")
+    if color_by not in COLOR_BY:
+        raise ValueError(f"Unknown color_by: {color_by}, expected one of {COLOR_BY}")
+    image_path, lidar_path = frame_paths(frame_number)
+    pixel_index, point_index, depth, _ = frame_indices(frame_number)
+    if color_by == 'depth':
+        values = depth
+    else:
+        values = np.fromfile(lidar_path, dtype=np.float32).reshape(-1, 4)[point_index, 3]
+
+    image = cv2.imread(image_path)
+    if len(values):
+        lo, hi = float(values.min()), float(values.max())
+        scaled = np.rint((values - lo) * (255.0 / (hi - lo) if hi > lo else 0.0)).astype(np.uint8)
+        colors = cv2.applyColorMap(scaled[:, np.newaxis], COLORMAPS[colormap]).reshape(-1, 3)
+        image.reshape(-1, 3)[pixel_index] = colors
+    return image
+
+def encode_depth(depth_image:np.ndarray, output_format:str = 'png')->bytes:
+    """uint16 PNG (meters * DEPTH_PNG_SCALE, clipped to 65535) or float32 .npy bytes"""
+    if output_format == 'npy':
+        return to_npy(depth_image)
+    if output_format != 'png':
+        raise ValueError(f"Unknown depth format: {output_format}, expected png or npy")
+    scaled = np.clip(np.rint(depth_image * DEPTH_PNG_SCALE), 0, np.iinfo(np.uint16).max).astype(np.uint16)
+    ok, encoded = cv2.imencode('.png', scaled)
+    if not ok:
+        raise ValueError("Could not encode depth map as png")
+    return encoded.tobytes()
+
+def export_depth(frame_number:str, output_format:str = 'png', colormap:str = 'jet', color_by:str = 'depth')->bytes:
+    """Depth map of a frame as png/npy bytes, or with output_format='colormap' the colored overlay as png bytes"""
+    if output_format not in DEPTH_FORMATS:
+        raise ValueError(f"Unknown depth format: {output_format}, expected one of {DEPTH_FORMATS}")
+    if output_format == 'colormap':
+        ok, encoded = cv2.imencode('.png', render_depth_colormap(frame_number, colormap, color_by))
+        if not ok:
+            raise ValueError(f"Could not encode depth overlay for frame {frame_number}")
+        return encoded.tobytes()
+    return encode_depth(depth_map(frame_number), output_format)
+
+def write_depth_map(frame_number:str, output_path:str)->str:
+    """Writes the depth map as a uint16 .png or float32 .npy, picked by the output extension"""
+    output_format = 'npy' if output_path.endswith('.npy') else 'png'
+    with open(output_path, 'wb') as f:
+        f.write(encode_depth(depth_map(frame_number), output_format))
+    logger.info(f"Depth map saved to {output_path}")
+    return os.path.abspath(output_path)
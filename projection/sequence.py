@@ -0,0 +1,151 @@
+import os
+import time
+import threading
+import numpy as np
+import cv2
+from collections import deque
+from concurrent.futures.process import BrokenProcessPool
+from config import settings, get_logger
+from metrics import metrics
+from extraction.image_ex import EXECUTORS, make_executor, process_context
+from projection.calibrate import draw_overlay, frame_paths, get_projection_matrices
+
+logger = get_logger(__name__)
+
+SEQUENCE_FORMATS = ('mp4', 'png', 'jpeg')
+
+#one render process pool shared by every sequence, created on first use
+_pool = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+
+def sequence_pool(max_workers:int = None)->tuple:
+    """
+    (pool, workers) of the shared render process pool. max_workers (default SEQUENCE_WORKERS,
+    else the CPU count) only applies when the pool is created, concurrent sequences share its workers.
+    The workers hold no calibration, each sequence sends its own, so they never go stale.
+    """
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is None:
+            _pool_workers = max_workers or settings.SEQUENCE_WORKERS or os.cpu_count() or 1
+            _pool = make_executor('process', _pool_workers)
+            logger.info(f"Started {_pool_workers} sequence render processes ({process_context().get_start_method()})")
+        return _pool, _pool_workers
+
+def _discard_pool(pool):
+    """Drops a broken shared pool so the next sequence starts a new one"""
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+def sequence_frame_name(frame_number:int, image_format:str)->str:
+    return f"frame_{frame_number:010d}.{'jpg' if image_format == 'jpeg' else image_format}"
+
+def render_sequence_frame(frame_number:int, options:tuple):
+    """
+    Renders one frame, options is (velo_to_cam2, velo_to_image, radius, blend, output_format, output_dir)
+    of its sequence. Image sets are encoded and written by the worker and the path is returned, for video
+    the BGR image is returned to the writer.
+    """
+    velo_to_cam2, velo_to_image, radius, blend, output_format, output_dir = options
+    image_path, lidar_path = frame_paths(str(frame_number))
+    image = cv2.imread(image_path)
+    points = np.fromfile(lidar_path, dtype=np.float32).reshape(-1, 4)  #(N, 4)
+    draw_overlay(image, points, velo_to_cam2, velo_to_image, radius=radius, blend=blend)
+    if output_format == 'mp4':
+        return image
+    out_path = os.path.join(output_dir, sequence_frame_name(frame_number, output_format))
+    if not cv2.imwrite(out_path, image):
+        raise ValueError(f"Could not write {out_path}")
+    return out_path
+
+def render_sequence(
+        start:int,
+        end:int,
+        output_path:str = None,
+        output_format:str = 'mp4',
+        fps:float = 10.0,
+        radius:int = 0,
+        blend:str = 'overwrite',
+        max_workers:int = None,
+        prefetch:int = 2,
+        executor:str = 'process'
+    )->dict:
+    """
+    Renders frames start..end (inclusive) into an MP4 (output_format='mp4') or a numbered png/jpeg
+    image set in the output_path directory. Calibration is loaded once per sequence and sent with its
+    frames (two small matrices), so a changed calibration applies from the next sequence on.
+    executor='process' renders on the shared pool of sequence_pool, 'thread' on a pool of its own.
+    At most workers * prefetch frames are in flight, so workers read and render the next frames
+    while earlier ones are written. Results are consumed in submission order, keeping frame order
+    even when workers finish out of order.
+    """
+    if output_format not in SEQUENCE_FORMATS:
+        raise ValueError(f"Unknown sequence format: {output_format}, expected one of {SEQUENCE_FORMATS}")
+    if executor not in EXECUTORS:
+        raise ValueError(f"Unknown executor: {executor}, expected one of {tuple(EXECUTORS)}")
+    if end < start:
+        raise ValueError(f"Empty frame range {start}..{end}")
+    frames = list(range(start, end + 1))
+    for frame_number in frames:
+        frame_paths(str(frame_number))  #fail before starting workers if a frame is missing
+
+    if output_path is None:
+        name = f"sequence_{start}_{end}" + ('.mp4' if output_format == 'mp4' else '')
+        output_path = os.path.join(settings.BONUS_OUT_DIR, name)
+    output_dir = os.path.dirname(output_path) if output_format == 'mp4' else output_path
+    os.makedirs(output_dir or '.', exist_ok=True)
+
+    velo_to_cam2, velo_to_image = get_projection_matrices()
+    options = (np.array(velo_to_cam2), np.array(velo_to_image), radius, blend, output_format, output_dir)
+    t = time.time()
+    if executor == 'process':
+        pool, workers = sequence_pool(max_workers)
+        own_pool = None
+    else:
+        workers = max_workers or os.cpu_count() or 1
+        pool = own_pool = make_executor(executor, workers)
+    window = max(1, workers * max(1, prefetch))
+    writer = None
+    pending = deque()
+    try:
+        remaining = iter(frames)
+
+        def submit_next():
+            frame_number = next(remaining, None)
+            if frame_number is not None:
+                pending.append(pool.submit(render_sequence_frame, frame_number, options))
+
+        for _ in range(window):
+            submit_next()
+        while pending:
+            result = pending.popleft().result()
+            submit_next()
+            if output_format == 'mp4':
+                if writer is None:
+                    height, width = result.shape[:2]
+                    writer = cv2.VideoWriter(output_path, cv2.VideoWriter_fourcc(*'mp4v'), fps, (width, height))
+                    if not writer.isOpened():
+                        raise ValueError(f"Could not open video writer for {output_path}")
+                if result.shape[:2] != (height, width):
+                    result = cv2.resize(result, (width, height))
+                writer.write(result)
+    except BrokenProcessPool:
+        _discard_pool(pool)
+        raise
+    finally:
+        #frames of a failed sequence still queued on the shared pool are dropped
+        for future in pending:
+            future.cancel()
+        if own_pool is not None:
+            own_pool.shutdown()
+        if writer is not None:
+            writer.release()
+
+    elapsed = time.time() - t
+    metrics.record_frames('sequence', len(frames), elapsed)
+    logger.info(f"Rendered {len(frames)} frames to {output_path} in: {elapsed:.2f} ({len(frames) / elapsed if elapsed else 0:.1f} frames/s)")
+    return {'output': os.path.abspath(output_path), 'format': output_format, 'frames': len(frames), 'seconds': elapsed}
@@ -0,0 +1,126 @@
+import io
+import os
+import cv2
+import numpy as np
+import pytest
+from config import settings
+from projection import depth
+from projection.calibrate import get_projection_matrices
+from projection.depth import zbuffer_indices, depth_map, frame_indices, encode_depth, render_depth_colormap, export_depth
+
+KITTI_FRAMES = ['0', '1', '2', '3', '4', '5']
+kitti = pytest.mark.skipif(not os.path.isdir(settings.BONUS_LIDAR_DIR), reason="KITTI bonus data not available")
+
+#depth is the camera z, pixels are 10 px per unit of x/z and y/z around the center of a 64 x 48 image
+VELO_TO_CAM2 = np.eye(4)[:3]
+VELO_TO_IMAGE = np.array([[10.0, 0.0, 32.0], [0.0, 10.0, 24.0], [0.0, 0.0, 1.0]]) @ VELO_TO_CAM2
+
+def reference_depth(points:np.ndarray, velo_to_cam2:np.ndarray, velo_to_image:np.ndarray, width:int, height:int)->np.ndarray:
+    """Unsorted z-buffer: the minimum depth per pixel with np.minimum.at, 0 where no point lands"""
+    xyz = np.c_[points[:, :3].astype(np.float64), np.ones(len(points))]
+    z = xyz @ velo_to_cam2[2]
+    uvw = xyz @ velo_to_image.T
+    with np.errstate(divide='ignore', invalid='ignore'):
+        u, v = uvw[:, 0] / uvw[:, 2], uvw[:, 1] / uvw[:, 2]
+    keep = (z > 0) & (u >= 0) & (u < width) & (v >= 0) & (v < height)
+    depth_image = np.full(height * width, np.inf)
+    np.minimum.at(depth_image, v[keep].astype(np.int64) * width + u[keep].astype(np.int64), z[keep])
+    depth_image[np.isinf(depth_image)] = 0
+    return depth_image.reshape(height, width).astype(np.float32)
+
+def sparse_to_image(pixel_index:np.ndarray, depths:np.ndarray, width:int, height:int)->np.ndarray:
+    depth_image = np.zeros(height * width, dtype=np.float32)
+    depth_image[pixel_index] = depths
+    return depth_image.reshape(height, width)
+
+def test_matches_reference_on_random_points():
+    rng = np.random.default_rng(0)
+    points = np.c_[rng.uniform(-4, 4, (5000, 2)), rng.uniform(-2, 8, 5000), rng.random(5000)].astype(np.float32)
+    pixel_index, point_index, depths = zbuffer_indices(points, VELO_TO_CAM2, VELO_TO_IMAGE, 64, 48)
+    assert np.all(np.diff(pixel_index) > 0)
+    assert np.allclose(depths, points[point_index, 2])
+    expected = reference_depth(points, VELO_TO_CAM2, VELO_TO_IMAGE, 64, 48)
+    assert np.allclose(sparse_to_image(pixel_index, depths, 64, 48), expected, atol=1e-6)
+
+def test_nearest_point_wins_and_culled_points_are_dropped():
+    points = np.array([
+        [0.0, 0.0, 4.0, 0.1],     #pixel (32, 24), occluded by the next one
+        [0.0, 0.0, 2.0, 0.2],     #pixel (32, 24), nearest
+        [0.0, 0.0, 2.0, 0.3],     #same depth, the earlier point wins the tie
+        [0.0, 0.0, -2.0, 0.4],    #behind the camera
+        [10.0, 0.0, 2.0, 0.5],    #right of the image
+        [-3.125, -2.375, 1.0, 0.6],  #pixel (0, 0)
+        [3.19, 2.39, 1.0, 0.7],   #pixel (63, 47)
+    ], dtype=np.float32)
+    pixel_index, point_index, depths = zbuffer_indices(points, VELO_TO_CAM2, VELO_TO_IMAGE, 64, 48)
+    assert pixel_index.tolist() == [0, 24 * 64 + 32, 47 * 64 + 63]
+    assert point_index.tolist() == [5, 1, 6]
+    assert depths.dtype == np.float32
+    assert depths.tolist() == [1.0, 2.0, 1.0]
+
+def test_no_point_in_view():
+    points = np.array([[0.0, 0.0, -1.0, 0.5]], dtype=np.float32)
+    pixel_index, point_index, depths = zbuffer_indices(points, VELO_TO_CAM2, VELO_TO_IMAGE, 64, 48)
+    assert len(pixel_index) == len(point_index) == len(depths) == 0
+
+def test_encode_depth_png_and_npy():
+    depth_image = np.array([[0.0, 1.5], [10.123, 300.0]], dtype=np.float32)
+    decoded = cv2.imdecode(np.frombuffer(encode_depth(depth_image, 'png'), np.uint8), cv2.IMREAD_UNCHANGED)
+    assert decoded.dtype == np.uint16
+    #meters * 256, 0 without a return, clipped at the uint16 maximum
+    assert decoded.tolist() == [[0, 384], [2591, 65535]]
+    assert np.array_equal(np.load(io.BytesIO(encode_depth(depth_image, 'npy'))), depth_image)
+    with pytest.raises(ValueError):
+        encode_depth(depth_image, 'jpg')
+
+def test_unknown_options():
+    with pytest.raises(ValueError):
+        render_depth_colormap('0', colormap='rainbow')
+    with pytest.raises(ValueError):
+        render_depth_colormap('0', color_by='height')
+    with pytest.raises(ValueError):
+        export_depth('0', output_format='tiff')
+
+@kitti
+@pytest.mark.parametrize("frame_number", KITTI_FRAMES)
+def test_depth_map_matches_reference_on_kitti(frame_number):
+    points = np.fromfile(os.path.join(settings.BONUS_LIDAR_DIR, f"{frame_number.zfill(10)}.bin"), dtype=np.float32).reshape(-1, 4)
+    height, width = cv2.imread(os.path.join(settings.BONUS_IMAGE_DIR, f"{frame_number.zfill(10)}.png")).shape[:2]
+    expected = reference_depth(points, *get_projection_matrices(), width, height)
+    actual = depth_map(frame_number)
+    assert actual.shape == (height, width)
+    assert np.array_equal(actual > 0, expected > 0)
+    assert np.allclose(actual, expected, atol=1e-5)
+
+@kitti
+def test_indices_are_cached_until_calibration_changes(tmp_path, monkeypatch):
+    calib_path = tmp_path / "calib_velo_to_cam.txt"
+    original = open(settings.CALIB_VELO_TO_CAM).read()
+    calib_path.write_text(original)
+    monkeypatch.setattr(settings, "CALIB_VELO_TO_CAM", str(calib_path))
+
+    before = frame_indices('0')
+    assert frame_indices('0') is before
+    assert all(not array.flags.writeable for array in before[:3])
+    calib_path.write_text(original.replace("T: -1.377769e-02", "T: 4.862231e-01"))
+    stat = os.stat(calib_path)
+    os.utime(calib_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    after = frame_indices('0')
+    assert after is not before
+    assert not np.array_equal(after[0], before[0])
+
+@kitti
+def test_colormap_only_recolors_projected_pixels(monkeypatch):
+    pixel_index, point_index, depths, (height, width) = frame_indices('0')
+    #re-coloring a frame reuses the cached projection
+    monkeypatch.setattr(depth, "zbuffer_indices", None)
+    image = cv2.imread(os.path.join(settings.BONUS_IMAGE_DIR, "0000000000.png")).reshape(-1, 3)
+    by_depth = render_depth_colormap('0', 'jet', 'depth').reshape(-1, 3)
+    by_reflectance = render_depth_colormap('0', 'jet', 'reflectance').reshape(-1, 3)
+    untouched = np.ones(height * width, dtype=bool)
+    untouched[pixel_index] = False
+    assert np.array_equal(by_depth[untouched], image[untouched])
+    assert np.array_equal(by_reflectance[untouched], image[untouched])
+    assert not np.array_equal(by_depth[pixel_index], by_reflectance[pixel_index])
+    decoded = cv2.imdecode(np.frombuffer(export_depth('0', 'colormap', 'jet', 'depth'), np.uint8), cv2.IMREAD_COLOR)
+    assert np.array_equal(decoded.reshape(-1, 3), by_depth)
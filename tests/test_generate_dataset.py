@@ -0,0 +1,9 @@
+import numpy as np
+from benchmarks.generate_dataset import sensor_timestamps, timestamp_filename
+
+def test_large_jitter_keeps_timestamps_distinct():
+    rng = np.random.default_rng(0)
+    timestamps = sensor_timestamps(rng, 1701985839.0, 60, 10, 60)
+    assert len(timestamps) == 600
+    assert np.diff(timestamps).min() >= 0.1 / 10 - 1e-6
+    assert len({timestamp_filename("lidar", t) for t in timestamps}) == len(timestamps)
@@ -0,0 +1,30 @@
+import os
+import json
+import numpy as np
+from config import settings
+from extraction.pipeline import synchronize_folder
+from extraction.geo_index import build_geo_index, query_radius, query_bbox
+from benchmarks.generate_dataset import generate_dataset
+
+def test_records_are_json_safe():
+    latitude = np.array([33.7756, 33.7757, np.nan, 33.7758])
+    longitude = np.array([-84.3963, -84.3963, np.nan, -84.3963])
+    index = {"timestamp": np.arange(4.0), "latitude": latitude, "longitude": longitude, "speed": np.array([1.0, np.nan, 2.0, np.inf])}
+    geo = build_geo_index(latitude, longitude, 25.0)
+    records = query_radius(index, geo, 33.7756, -84.3963, 100)
+    assert [record["frame_index"] for record in records] == [0, 1, 3]
+    assert [record["speed"] for record in records] == [1.0, None, None]
+    json.dumps(records, allow_nan=False)
+    assert [record["frame_index"] for record in query_bbox(index, geo, 33.7, -84.4, 33.8, -84.3)] == [0, 1, 3]
+
+def test_resync_without_gps_removes_the_geo_index(tmp_path):
+    folder = str(tmp_path / "ride")
+    generate_dataset(folder, duration_s=2, points=200, width=16, height=12)
+    geo_path = folder + settings.GEO_INDEX_PATH
+    synchronize_folder(folder)
+    assert os.path.exists(geo_path)
+    with open(folder + settings.GPS_PATH, "w") as f:
+        f.write("[]")
+    synchronized_df = synchronize_folder(folder)
+    assert "latitude" not in synchronized_df.columns
+    assert not os.path.exists(geo_path)
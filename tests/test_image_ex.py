@@ -0,0 +1,39 @@
+import os
+import numpy as np
+from extraction.image_ex import read_images_from_folder, open_parsed_image, process_image, process_context
+from benchmarks.generate_dataset import write_image, timestamp_filename
+
+def test_switching_output_format_removes_old_files(tmp_path):
+    source, parsed = str(tmp_path / 'images'), str(tmp_path / 'imagesout')
+    os.makedirs(source)
+    rng = np.random.default_rng(0)
+    frames = {}
+    for i in range(3):
+        frame = rng.integers(0, 256, (6, 8, 3), dtype=np.uint8)
+        timestamp = 1701985839.0 + i * 0.1
+        write_image(os.path.join(source, timestamp_filename('image', timestamp)), frame)
+        frames[round(timestamp, 6)] = frame
+
+    for output_format, extension in (('npy', '.npy'), ('raw', '.rgb'), ('npy', '.npy')):
+        image_dict = read_images_from_folder(source, parsed, output_format=output_format)
+        outputs = sorted(name for name in os.listdir(parsed) if name.startswith('image_'))
+        assert len(outputs) == 3 and all(name.endswith(extension) for name in outputs)
+        for timestamp, out_path in image_dict.items():
+            assert np.array_equal(open_parsed_image(out_path), frames[round(timestamp, 6)])
+
+def test_process_executor_does_not_fork(tmp_path):
+    source, parsed = str(tmp_path / 'images'), str(tmp_path / 'imagesout')
+    os.makedirs(source)
+    frame = np.arange(6 * 8 * 3, dtype=np.uint8).reshape(6, 8, 3)
+    write_image(os.path.join(source, timestamp_filename('image', 1701985839.0)), frame)
+    assert process_context().get_start_method() in ('forkserver', 'spawn')
+    image_dict = read_images_from_folder(source, parsed, executor='process', max_workers=1)
+    assert np.array_equal(open_parsed_image(image_dict[1701985839.0]), frame)
+
+def test_stats_time_read_and_write(tmp_path):
+    source = str(tmp_path)
+    frame = np.zeros((64, 64, 3), dtype=np.uint8)
+    filename = timestamp_filename('image', 1701985839.0)
+    write_image(os.path.join(source, filename), frame)
+    _, _, stats = process_image(filename, source, source)
+    assert stats['bytes'] == frame.nbytes and stats['read_s'] > 0 and stats['write_s'] > 0
@@ -0,0 +1,57 @@
+import os
+import json
+import numpy as np
+import pandas as pd
+from extraction.imu_gps import read_gps, read_json_columns, flatten_gps, cache_path_for, load_columns_cache
+
+def write_json(path:str, entries:list):
+    with open(path, 'w') as f:
+        json.dump(entries, f)
+
+def test_union_of_fields_and_integer_dtypes(tmp_path):
+    path = str(tmp_path / 'gps.json')
+    write_json(path, [
+        {"timestamp": 1.0, "latitude": 33.7, "satellites": 7, "fix": "3d"},
+        {"timestamp": 2.0, "latitude": 33.8, "satellites": 8, "fix": "3d", "hdop": 0.9, "status": "ok", "mode": 2},
+        {"timestamp": 3.0, "latitude": 33.9, "satellites": 9, "hdop": 1.1, "mode": 3},
+    ])
+    df = read_json_columns(path, flatten_gps, block_rows=2)
+    assert list(df.columns) == ["timestamp", "latitude", "satellites", "fix", "hdop", "status", "mode"]
+    assert df["satellites"].dtype == np.int64 and df["satellites"].tolist() == [7, 8, 9]
+    assert df["timestamp"].dtype == np.float64
+    #appears late, so earlier samples have no value and it stays float
+    assert df["mode"].dtype == np.float64 and np.isnan(df["mode"].iloc[0]) and df["mode"].iloc[1:].tolist() == [2.0, 3.0]
+    assert np.isnan(df["hdop"].iloc[0]) and df["hdop"].iloc[1:].tolist() == [0.9, 1.1]
+    assert df["fix"].iloc[:2].tolist() == ["3d", "3d"] and df["fix"].isna().iloc[2]
+    assert df["status"].isna().tolist() == [True, False, True] and df["status"].iloc[1] == "ok"
+
+def test_cache_lives_in_cache_dir_keyed_by_filename(tmp_path):
+    source_dir, cache_dir = tmp_path / 'raw', str(tmp_path / 'out')
+    os.makedirs(source_dir)
+    json_path, txt_path = str(source_dir / 'gps.json'), str(source_dir / 'gps.txt')
+    write_json(json_path, [{"timestamp": 1.0, "latitude": 1.0}, {"timestamp": 2.0, "latitude": 2.0}])
+    write_json(txt_path, [{"timestamp": 1.0, "latitude": 5.0}])
+
+    assert read_gps(json_path, cache_dir=cache_dir)["latitude"].tolist() == [1.0, 2.0]
+    assert read_gps(txt_path, cache_dir=cache_dir)["latitude"].tolist() == [5.0]
+    assert sorted(os.listdir(source_dir)) == ['gps.json', 'gps.txt']
+    assert os.path.exists(cache_path_for(json_path, cache_dir)) and os.path.exists(cache_path_for(txt_path, cache_dir))
+    #served from the cache, the two sources with the same stem do not overwrite each other
+    assert read_gps(json_path, cache_dir=cache_dir)["latitude"].tolist() == [1.0, 2.0]
+    assert read_gps(txt_path, cache_dir=cache_dir)["latitude"].tolist() == [5.0]
+
+def test_cache_round_trip_keeps_missing_values(tmp_path):
+    path, cache_dir = str(tmp_path / 'gps.json'), str(tmp_path / 'out')
+    write_json(path, [
+        {"timestamp": 1.0, "latitude": 33.7, "fix": "3d", "valid": True, "note": "None"},
+        {"timestamp": 2.0, "latitude": None, "valid": False, "note": "nan"},
+        {"timestamp": 3.0, "fix": "2d", "satellites": 4},
+    ])
+    fresh = read_gps(path, cache_dir=cache_dir)
+    assert os.path.exists(cache_path_for(path, cache_dir))
+    assert load_columns_cache(path, cache_dir) is not None
+    cached = read_gps(path, cache_dir=cache_dir)
+    pd.testing.assert_frame_equal(cached, fresh)
+    assert cached["fix"].isna().tolist() == [False, True, False]
+    assert cached["note"].iloc[:2].tolist() == ["None", "nan"] and cached["note"].isna().iloc[2]
+    assert cached["valid"].iloc[:2].tolist() == [True, False]
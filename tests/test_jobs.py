@@ -0,0 +1,91 @@
+import time
+import threading
+import pytest
+import pandas as pd
+import jobs
+from jobs import JobManager
+from benchmarks.generate_dataset import generate_dataset
+
+def wait_for(job, timeout:float = 30.0):
+    deadline = time.time() + timeout
+    while job.state in ("queued", "running"):
+        assert time.time() < deadline, f"job still {job.state}"
+        time.sleep(0.01)
+
+def test_one_active_sync_per_folder(monkeypatch, tmp_path):
+    release = threading.Event()
+    def blocking_sync(folder_path, lidar_storage = None, progress = None):
+        release.wait(10)
+        raise RuntimeError("not synchronized in this test")
+    monkeypatch.setattr(jobs, "synchronize_folder", blocking_sync)
+    manager = JobManager(max_workers=2, max_pending=4, history=10)
+    folder = str(tmp_path)
+
+    job, created = manager.submit(folder, "npy")
+    assert created
+    #same folder, spelled differently, same storage: the active job comes back
+    assert manager.submit(folder + "/.", "npy") == (job, False)
+    #another storage would write the same outputs concurrently
+    with pytest.raises(RuntimeError, match="lidar_storage=npy"):
+        manager.submit(folder, "packed")
+    with pytest.raises(RuntimeError, match=job.job_id):
+        manager.submit_inline(folder, "npy")
+    #other folders are not affected
+    other, created = manager.submit(str(tmp_path / "other"), "packed")
+    assert created and other is not job
+
+    release.set()
+    wait_for(job)
+    wait_for(other)
+    assert job.state == "failed" and job.result is None
+    assert manager.submit(folder, "packed")[1]
+
+def test_finished_job_keeps_a_summary(tmp_path):
+    folder = str(tmp_path / "ride")
+    generate_dataset(folder, duration_s=2, points=200, width=16, height=12)
+    manager = JobManager(max_workers=1, max_pending=4, history=10)
+
+    synchronized_df = manager.submit_inline(folder).result()
+    job, created = manager.submit(folder)
+    assert created
+    wait_for(job)
+    assert job.state == "done"
+    assert job.result == {"records": len(synchronized_df), "sync_index": folder + "/sync_index.npz"}
+    status = job.status(include_data=True)
+    assert status["records"] == len(status["data"]) == len(synchronized_df)
+    assert [record["timestamp"] for record in status["data"]] == sorted(synchronized_df["timestamp"].tolist())
+
+def test_inline_syncs_share_the_bounded_pool(monkeypatch, tmp_path):
+    release = threading.Event()
+    running = []
+    def blocking_sync(folder_path, lidar_storage = None, progress = None):
+        running.append((folder_path, threading.current_thread().name))
+        release.wait(10)
+        return pd.DataFrame({"timestamp": [1.0]})
+    monkeypatch.setattr(jobs, "synchronize_folder", blocking_sync)
+    manager = JobManager(max_workers=1, max_pending=1, history=10)
+
+    first = manager.submit_inline(str(tmp_path / "a"))
+    deadline = time.time() + 10
+    while not running:
+        assert time.time() < deadline
+        time.sleep(0.01)
+    #one worker: the second waits in the queue instead of running on the caller's thread
+    second = manager.submit_inline(str(tmp_path / "b"))
+    time.sleep(0.1)
+    assert [folder for folder, _ in running] == [str(tmp_path / "a")]
+    assert running[0][1].startswith("sync-job")
+    with pytest.raises(RuntimeError, match="Too many queued"):
+        manager.submit_inline(str(tmp_path / "c"))
+    release.set()
+    assert len(first.result(10)) == len(second.result(10)) == 1
+    assert [folder for folder, _ in running] == [str(tmp_path / "a"), str(tmp_path / "b")]
+
+def test_inline_failure_reaches_the_caller(monkeypatch, tmp_path):
+    def failing_sync(folder_path, lidar_storage = None, progress = None):
+        raise ValueError("no lidar folder")
+    monkeypatch.setattr(jobs, "synchronize_folder", failing_sync)
+    manager = JobManager(max_workers=1, max_pending=1, history=10)
+    with pytest.raises(ValueError, match="no lidar folder"):
+        manager.submit_inline(str(tmp_path)).result(10)
+    assert manager.submit(str(tmp_path))[1]
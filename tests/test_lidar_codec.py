@@ -0,0 +1,41 @@
+import numpy as np
+import pytest
+from extraction.lidar_codec import encode_sweep, decode_sweep, check_error_bound, HEADER
+
+def sweep(n:int = 1000)->np.ndarray:
+    rng = np.random.default_rng(0)
+    points = rng.uniform(-40, 40, (n, 4)).astype(np.float32)
+    points[:, 3] = rng.random(n)
+    return points
+
+def test_round_trip_within_bound():
+    points = sweep()
+    data = encode_sweep(points)
+    decoded = decode_sweep(data)
+    check_error_bound(points, decoded, data)
+    assert np.abs(decoded[:, :3] - points[:, :3]).max() <= 0.005 + 1e-4
+
+@pytest.mark.parametrize("value", [np.nan, np.inf, -np.inf])
+@pytest.mark.parametrize("channel", [0, 3])
+def test_non_finite_points_are_dropped(value, channel):
+    points = sweep()
+    points[[3, 500], channel] = value
+    data = encode_sweep(points)
+    decoded = decode_sweep(data)
+    assert len(decoded) == len(points) - 2 and np.isfinite(decoded).all()
+    check_error_bound(points, decoded, data)
+    np.testing.assert_allclose(decoded, np.delete(points, [3, 500], axis=0), atol=0.006)
+
+def test_error_check_fails_on_non_finite_error():
+    points = sweep()
+    data = encode_sweep(points)
+    decoded = decode_sweep(data)
+    decoded[7, 0] = np.nan
+    with pytest.raises(ValueError, match="exceeds bound"):
+        check_error_bound(points, decoded, data)
+    #a header with a NaN offset decodes to NaN everywhere and must not pass either
+    values = list(HEADER.unpack_from(data))
+    values[7] = np.nan
+    corrupt = HEADER.pack(*values) + data[HEADER.size:]
+    with pytest.raises(ValueError, match="exceeds bound"):
+        check_error_bound(points, decode_sweep(corrupt), corrupt)
@@ -0,0 +1,88 @@
+import os
+import numpy as np
+from extraction import lidar_store
+from extraction.lidar_store import write_lidar_store, STORE_DATA_NAME, POINT_BYTES
+
+def sweep(second:int, points:int = None)->np.ndarray:
+    rng = np.random.default_rng(second)
+    return rng.random((points or 5 + second, 4), dtype=np.float32)
+
+def write_sweep(folder, second:int, points:int = None)->np.ndarray:
+    data = sweep(second, points)
+    data.tofile(os.path.join(folder, f"lidar_{second}_000000000.bin"))
+    return data
+
+def pack(monkeypatch, folder, store_dir)->tuple:
+    """(store, mode of the data write: 'wb' rebuild, 'r+b' append, None untouched)"""
+    modes = []
+    write_sweeps = lidar_store._write_sweeps
+    def recording(folder_path, filenames, data_path, mode, start_row):
+        modes.append(mode)
+        return write_sweeps(folder_path, filenames, data_path, mode, start_row)
+    monkeypatch.setattr(lidar_store, "_write_sweeps", recording)
+    store = write_lidar_store(str(folder), str(store_dir))
+    return store, modes[0] if modes else None
+
+def assert_store(store, expected:dict):
+    """expected maps timestamp to the sweep, in any order"""
+    assert store.timestamps.tolist() == sorted(expected)
+    for i, timestamp in enumerate(sorted(expected)):
+        np.testing.assert_array_equal(store.frame(i), expected[timestamp])
+
+def test_store_branches(tmp_path, monkeypatch):
+    src, out = tmp_path / "src", tmp_path / "out"
+    src.mkdir()
+    expected = {float(s): write_sweep(src, s) for s in (10, 11, 12)}
+    store, mode = pack(monkeypatch, src, out)
+    assert mode == 'wb'
+    assert_store(store, expected)
+
+    #unchanged
+    store, mode = pack(monkeypatch, src, out)
+    assert mode is None
+    assert_store(store, expected)
+
+    #newer sweeps are appended
+    expected.update({float(s): write_sweep(src, s) for s in (13, 14)})
+    store, mode = pack(monkeypatch, src, out)
+    assert mode == 'r+b'
+    assert_store(store, expected)
+    assert os.path.getsize(out / STORE_DATA_NAME) == sum(len(points) for points in expected.values()) * POINT_BYTES
+
+    #an older sweep arriving late rebuilds in timestamp order
+    expected[9.0] = write_sweep(src, 9)
+    store, mode = pack(monkeypatch, src, out)
+    assert mode == 'wb'
+    assert_store(store, expected)
+
+    #removed sweep
+    os.remove(src / "lidar_12_000000000.bin")
+    del expected[12.0]
+    store, mode = pack(monkeypatch, src, out)
+    assert mode == 'wb'
+    assert_store(store, expected)
+
+    #changed sweep
+    expected[11.0] = write_sweep(src, 11, points=40)
+    store, mode = pack(monkeypatch, src, out)
+    assert mode == 'wb'
+    assert_store(store, expected)
+
+def test_append_drops_rows_of_an_interrupted_append(tmp_path, monkeypatch):
+    src, out = tmp_path / "src", tmp_path / "out"
+    src.mkdir()
+    expected = {float(s): write_sweep(src, s) for s in (1, 2)}
+    pack(monkeypatch, src, out)
+    #rows written past the index by an append that never saved it
+    with open(out / STORE_DATA_NAME, 'ab') as f:
+        sweep(99).tofile(f)
+    expected[3.0] = write_sweep(src, 3)
+    store, mode = pack(monkeypatch, src, out)
+    assert mode == 'r+b'
+    assert_store(store, expected)
+    assert os.path.getsize(out / STORE_DATA_NAME) == sum(len(points) for points in expected.values()) * POINT_BYTES
+
+def test_empty_folder(tmp_path):
+    (tmp_path / "src").mkdir()
+    store = write_lidar_store(str(tmp_path / "src"), str(tmp_path / "out"))
+    assert len(store) == 0 and store.frame_range(0, 5)[0].shape == (0, 4)
@@ -0,0 +1,122 @@
+import os
+import json
+import pytest
+import pandas as pd
+from config import settings
+from metrics import metrics
+from extraction import live
+from extraction.live import LiveSynchronizer, JsonArrayTail
+from extraction.pipeline import synchronize_folder
+from benchmarks.generate_dataset import generate_dataset
+from benchmarks.bench_sync import assert_equivalent
+
+def touch(folder, name:str, mtime:float):
+    path = os.path.join(folder, name)
+    open(path, 'wb').close()
+    os.utime(path, (mtime, mtime))
+
+@pytest.fixture
+def synchronizer(tmp_path):
+    os.makedirs(str(tmp_path) + settings.LIDAR_DIR)
+    return LiveSynchronizer(str(tmp_path), buffer_size=4, settle_s=1.0)
+
+def test_new_files_parses_each_name_once(synchronizer, monkeypatch):
+    parsed = []
+    extract_timestamp = live.extract_timestamp
+    def counting_extract(name, sensor):
+        parsed.append(name)
+        return extract_timestamp(name, sensor)
+    monkeypatch.setattr(live, "extract_timestamp", counting_extract)
+    folder = synchronizer.lidar_path
+    touch(folder, "lidar_100_000000000.bin", 0)
+    touch(folder, "lidar_101_000000000.bin", 0)
+    touch(folder, "lidar_102_000000000.bin", 50)  #still being written at now=50
+    touch(folder, "notes.txt", 0)
+
+    found = synchronizer._new_files("lidar", folder, now=50)
+    assert found == [(100.0, "lidar_100_000000000.bin"), (101.0, "lidar_101_000000000.bin")]
+    synchronizer.high_water["lidar"] = "lidar_101_000000000.bin"
+    assert synchronizer._new_files("lidar", folder, now=50.5) == []
+    assert synchronizer._new_files("lidar", folder, now=60) == [(102.0, "lidar_102_000000000.bin")]
+    synchronizer.high_water["lidar"] = "lidar_102_000000000.bin"
+    touch(folder, "lidar_103_000000000.bin", 0)
+    assert synchronizer._new_files("lidar", folder, now=60) == [(103.0, "lidar_103_000000000.bin")]
+    assert parsed == [f"lidar_{t}_000000000.bin" for t in (100, 101, 102, 103)]
+
+def dropped_metric(sensor:str)->float:
+    return metrics._counters.get(('live_dropped_total', (('sensor', sensor),)), 0.0)
+
+def test_evicted_reference_samples_are_counted(synchronizer):
+    before = dropped_metric("lidar")
+    synchronizer.reference = "lidar"
+    for t in range(10):
+        synchronizer._append("lidar", float(t), {"lidar": f"{t}.npy"})
+        synchronizer._append("image", float(t), {"image": f"{t}.npy"})
+    assert synchronizer._emit(final=False) == []  #imu/gps have nothing yet
+    assert synchronizer.records_dropped == 6
+    assert dropped_metric("lidar") - before == 6
+    #samples already emitted are not lost when they leave the buffer
+    synchronizer.emitted_until = 20.0
+    for t in range(10, 15):
+        synchronizer._append("lidar", float(t), {"lidar": f"{t}.npy"})
+    synchronizer._emit(final=False)
+    assert synchronizer.records_dropped == 6
+
+def test_evicted_samples_still_needed_are_counted(synchronizer):
+    before = dropped_metric("imu")
+    synchronizer.reference = "lidar"
+    synchronizer._append("lidar", 0.0, {"lidar": "0.npy"})
+    assert synchronizer._room("imu") == 4
+    for t in range(1, 7):
+        synchronizer._append("imu", float(t), {"angular_velocity_x": float(t)})
+    #the sample at 1 is the closest one to the pending record at 0, and the one at 2 brackets it
+    synchronizer._emit(final=False)
+    assert synchronizer.samples_dropped == 2
+    assert synchronizer.records_dropped == 0
+    assert dropped_metric("imu") - before == 2
+    #once the record is emitted only the last sample at or before the next one is kept
+    synchronizer.emitted_until = 0.0
+    synchronizer._append("lidar", 4.5, {"lidar": "4.npy"})
+    assert synchronizer._room("imu") == 1
+
+def test_json_tail_poll_limit(tmp_path):
+    path = str(tmp_path / "imu.json")
+    with open(path, 'w') as f:
+        f.write('[' + ', '.join(json.dumps({"timestamp": t}) for t in range(10)))
+    tail = JsonArrayTail(path, chunk_bytes=16)
+    assert [e["timestamp"] for e in tail.poll(3)] == [0, 1, 2]
+    assert tail.poll(0) == []
+    assert [e["timestamp"] for e in tail.poll()] == list(range(3, 10))
+    with open(path, 'a') as f:
+        f.write(', {"timestamp": 10}]')
+    assert tail.poll(5) == [{"timestamp": 10}]
+    assert tail.finished
+
+def test_backlog_longer_than_the_buffers_matches_the_batch_sync(tmp_path):
+    folder = str(tmp_path) + '/'
+    generate_dataset(folder, duration_s=5, points=100, width=8, height=6)
+    #attaching to a ride in progress: every sensor has more samples waiting than its buffer holds
+    synchronizer = LiveSynchronizer(folder, buffer_size=16, settle_s=0.0)
+    records = synchronizer.poll()
+    assert len(records) > 0
+    records += synchronizer.flush()
+    batch = synchronize_folder(folder, 'npy')
+    assert len(records) == len(batch)
+    assert_equivalent(pd.DataFrame(records), batch)
+    assert synchronizer.records_dropped == synchronizer.samples_dropped == 0
+    assert all(len(ring) <= 16 for ring in synchronizer.rings.values())
+
+@pytest.mark.parametrize("kept", [0, 1])
+def test_flush_aligns_a_nearly_empty_gps_log_like_the_batch_sync(tmp_path, kept):
+    folder = str(tmp_path) + '/'
+    generate_dataset(folder, duration_s=2, points=200, width=16, height=12)
+    with open(folder + settings.GPS_PATH) as f:
+        gps = json.load(f)
+    with open(folder + settings.GPS_PATH, 'w') as f:
+        json.dump(gps[:kept], f)
+    synchronizer = LiveSynchronizer(folder, settle_s=0.0)
+    assert synchronizer.poll() == []  #GPS never gets 2 samples, so only the end of the ride settles it
+    records = synchronizer.flush()
+    batch = synchronize_folder(folder, 'npy')
+    assert len(records) == len(batch) > 0
+    assert_equivalent(pd.DataFrame(records), batch)
@@ -0,0 +1,67 @@
+import os
+import numpy as np
+from extraction import lidar_ex
+from extraction.manifest import load_manifest, save_manifest, scan_sources, make_entry, MANIFEST_NAME
+from extraction.lidar_ex import read_lidar_from_folder
+
+def write_sweep(folder, name:str, points:int = 10, seed:int = 0):
+    np.random.default_rng(seed).random((points, 4), dtype=np.float32).tofile(os.path.join(folder, name))
+
+def convert_counting(monkeypatch, folder, out_dir)->tuple:
+    """(timestamp -> out path, converted filenames) of one read_lidar_from_folder run"""
+    converted = []
+    process_file = lidar_ex.process_file
+    def counting(filename, *args):
+        converted.append(filename)
+        return process_file(filename, *args)
+    monkeypatch.setattr(lidar_ex, "process_file", counting)
+    return read_lidar_from_folder(folder, out_dir), sorted(converted)
+
+def test_scan_sources(tmp_path):
+    src, out = tmp_path / "src", tmp_path / "out"
+    src.mkdir()
+    out.mkdir()
+    for name in ("lidar_1_000000000.bin", "lidar_2_000000000.bin", "lidar_3_000000000.bin"):
+        write_sweep(src, name)
+    (src / "image_1_000000000.bin").write_bytes(b"")
+    stat = {name: os.stat(src / name) for name in os.listdir(src)}
+    manifest = {
+        #unchanged with its output present
+        "lidar_1_000000000.bin": make_entry(stat["lidar_1_000000000.bin"].st_size, stat["lidar_1_000000000.bin"].st_mtime_ns, 1.0, str(out / "a.npy")),
+        #size changed
+        "lidar_2_000000000.bin": make_entry(1, stat["lidar_2_000000000.bin"].st_mtime_ns, 2.0, str(out / "b.npy")),
+        #output deleted
+        "lidar_3_000000000.bin": make_entry(stat["lidar_3_000000000.bin"].st_size, stat["lidar_3_000000000.bin"].st_mtime_ns, 3.0, str(out / "missing.npy")),
+        #source removed
+        "lidar_4_000000000.bin": make_entry(1, 1, 4.0, str(out / "a.npy")),
+    }
+    (out / "a.npy").write_bytes(b"")
+    (out / "b.npy").write_bytes(b"")
+    fresh, pending = scan_sources(str(src), "lidar", str(out), manifest)
+    assert list(fresh) == ["lidar_1_000000000.bin"]
+    assert sorted(name for name, _, _ in pending) == ["lidar_2_000000000.bin", "lidar_3_000000000.bin"]
+
+def test_manifest_round_trip_and_unreadable(tmp_path):
+    manifest = {"lidar_1_000000000.bin": make_entry(1, 2, 1.0, "x.npy")}
+    save_manifest(str(tmp_path), manifest)
+    assert load_manifest(str(tmp_path)) == manifest
+    assert not os.path.exists(tmp_path / (MANIFEST_NAME + ".tmp"))
+    (tmp_path / MANIFEST_NAME).write_text("{truncated")
+    assert load_manifest(str(tmp_path)) == {}
+
+def test_rerun_converts_only_new_or_changed(tmp_path, monkeypatch):
+    src, out = tmp_path / "src", str(tmp_path / "out")
+    src.mkdir()
+    for second in range(3):
+        write_sweep(src, f"lidar_{second}_000000000.bin", seed=second)
+    first, converted = convert_counting(monkeypatch, str(src), out)
+    assert len(converted) == 3 and list(first) == [0.0, 1.0, 2.0]
+
+    assert convert_counting(monkeypatch, str(src), out)[1] == []
+    write_sweep(src, "lidar_1_000000000.bin", points=20, seed=9)
+    write_sweep(src, "lidar_3_000000000.bin", seed=3)
+    os.remove(src / "lidar_0_000000000.bin")
+    result, converted = convert_counting(monkeypatch, str(src), out)
+    assert converted == ["lidar_1_000000000.bin", "lidar_3_000000000.bin"]
+    assert list(result) == [1.0, 2.0, 3.0]
+    assert np.load(result[1.0]).shape == (20, 4)
@@ -0,0 +1,25 @@
+import pytest
+import pandas as pd
+from metrics import Metrics, metrics
+from extraction.sync import synchronize_frame
+
+def test_label_values_are_escaped():
+    m = Metrics()
+    m.inc('frames_total', 2, stage='C:\\rides\\"north"\nloop')
+    line = m.render().splitlines()[-1]
+    assert line == 'bike_frames_total{stage="C:\\\\rides\\\\\\"north\\"\\nloop"} 2.0'
+
+def test_unknown_engine_is_rejected_before_timing():
+    empty = pd.DataFrame({"timestamp": []})
+    with pytest.raises(ValueError, match="Unknown sync engine"):
+        synchronize_frame({1.0: "a"}, {1.0: "b"}, empty, empty, engine="bogus")
+    assert 'stage="sync_bogus"' not in metrics.render()
+
+def test_runs_without_frames_keep_the_last_throughput():
+    m = Metrics()
+    m.record_frames('lidar_convert', 10, 2.0)
+    m.record_frames('lidar_convert', 0, 0.5)
+    with m.timer('image_convert', frames=0):
+        pass
+    assert m._gauges == {('frames_per_second', (('stage', 'lidar_convert'),)): 5.0}
+    assert m._counters == {('frames_total', (('stage', 'lidar_convert'),)): 10.0}
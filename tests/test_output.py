@@ -0,0 +1,33 @@
+import json
+import numpy as np
+import pandas as pd
+from extraction.output import iter_ndjson, iter_records, dumps_record
+
+def strict_loads(line:str)->dict:
+    def reject(constant):
+        raise ValueError(f"non standard JSON constant {constant}")
+    return json.loads(line, parse_constant=reject)
+
+def make_df()->pd.DataFrame:
+    return pd.DataFrame({
+        "timestamp": [1.0, 2.0, 3.0, 4.0, 5.0],
+        "lidar": [f"/out/lidar_{i}.npy" for i in range(5)],
+        "latitude": [33.7, np.nan, 33.8, np.inf, -np.inf],
+        "label": ["a", None, float("nan"), "d", "e"],
+    })
+
+def test_ndjson_is_strict_json_with_nulls():
+    df = make_df()
+    chunks = list(iter_ndjson(df, chunk_size=2))
+    assert len(chunks) == 3
+    records = [strict_loads(line) for chunk in chunks for line in chunk.decode('utf-8').splitlines()]
+    assert [record["latitude"] for record in records] == [33.7, None, 33.8, None, None]
+    assert [record["label"] for record in records] == ["a", None, None, "d", "e"]
+    assert [record["lidar"] for record in records] == df["lidar"].tolist()
+
+def test_records_match_dataframe_for_finite_values():
+    df = make_df().drop(columns=["latitude", "label"])
+    assert list(iter_records(df, chunk_size=3)) == df.to_dict(orient="records")
+
+def test_dumps_record():
+    assert strict_loads(dumps_record({"t": 1.5, "x": float("nan"), "path": "p"})) == {"t": 1.5, "x": None, "path": "p"}
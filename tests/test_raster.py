@@ -0,0 +1,52 @@
+import os
+import numpy as np
+import pytest
+from config import settings
+from projection.calibrate import overlay_points_sequential
+from projection.raster import rasterize_points, reflectance_to_bgr
+from benchmarks.bench_overlay import load_frame
+
+KITTI_FRAMES = ['0', '1', '2', '3', '4', '5']
+
+def reference_overlay(image:np.ndarray, points_2d:np.ndarray, reflectance:np.ndarray)->np.ndarray:
+    return overlay_points_sequential(image.copy(), points_2d, (reflectance * 255).astype(np.uint8))
+
+def test_matches_cv2_loop_on_edge_cases():
+    """Out of bounds, fractional, edge and repeated pixels, later points win"""
+    rng = np.random.default_rng(0)
+    image = rng.integers(0, 256, (48, 64, 3), dtype=np.uint8)
+    points_2d = np.concatenate([
+        rng.uniform(-10, 74, (2000, 2)),
+        [[0, 0], [63.999, 47.999], [64, 10], [10, 48], [-0.5, 5], [5, -0.001], [3.2, 4.7], [3.9, 4.1]],
+    ])
+    reflectance = rng.random(len(points_2d), dtype=np.float32)
+    expected = reference_overlay(image, points_2d, reflectance)
+    actual = rasterize_points(image.copy(), points_2d, reflectance_to_bgr(reflectance))
+    assert actual.tobytes() == expected.tobytes()
+
+@pytest.mark.skipif(not os.path.isdir(settings.BONUS_LIDAR_DIR), reason="KITTI bonus data not available")
+@pytest.mark.parametrize("frame_number", KITTI_FRAMES)
+def test_matches_cv2_loop_on_kitti(frame_number):
+    image, points_2d, reflectance = load_frame(frame_number)
+    expected = reference_overlay(image, points_2d, reflectance)
+    actual = rasterize_points(image.copy(), points_2d, reflectance_to_bgr(reflectance))
+    assert actual.tobytes() == expected.tobytes()
+
+def test_unknown_blend_mode():
+    with pytest.raises(ValueError):
+        rasterize_points(np.zeros((4, 4, 3), dtype=np.uint8), np.zeros((1, 2)), np.zeros((1, 3), dtype=np.uint8), mode='max')
+
+def test_radius_is_clamped():
+    image = np.zeros((64, 64, 3), dtype=np.uint8)
+    colors = np.full((1, 3), 255, dtype=np.uint8)
+    huge = rasterize_points(image.copy(), np.array([[32.0, 32.0]]), colors, radius=10 ** 6)
+    capped = rasterize_points(image.copy(), np.array([[32.0, 32.0]]), colors, radius=settings.OVERLAY_MAX_RADIUS)
+    assert huge.tobytes() == capped.tobytes()
+
+def test_api_rejects_large_radius():
+    from fastapi.testclient import TestClient
+    import main
+    client = TestClient(main.app)
+    for path in ("/project-lidar?frame_number=0", "/project-lidar/sequence?start=0&end=0"):
+        assert client.get(f"{path}&radius={settings.OVERLAY_MAX_RADIUS + 1}").status_code == 422
+        assert client.get(f"{path}&radius=-1").status_code == 422
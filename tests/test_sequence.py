@@ -0,0 +1,46 @@
+import os
+import cv2
+import pytest
+from config import settings
+from projection import sequence
+from projection.sequence import render_sequence, sequence_frame_name, sequence_pool
+
+pytestmark = pytest.mark.skipif(not os.path.isdir(settings.BONUS_LIDAR_DIR), reason="KITTI bonus data not available")
+
+def test_shared_pool_matches_threads(tmp_path):
+    """Process renders on the one shared pool, which spawns instead of forking, match thread renders"""
+    rendered = {}
+    for executor in ('process', 'thread', 'process'):
+        out_dir = tmp_path / executor
+        assert render_sequence(0, 2, str(out_dir), 'png', radius=1, blend='alpha', max_workers=2, executor=executor)['frames'] == 3
+        rendered[executor] = [cv2.imread(str(out_dir / sequence_frame_name(n, 'png'))).tobytes() for n in range(3)]
+    assert rendered['process'] == rendered['thread']
+    pool, workers = sequence_pool()
+    assert pool is sequence._pool and workers == 2
+    assert pool._mp_context.get_start_method() in ('forkserver', 'spawn')
+
+def test_failed_frame_leaves_the_pool_usable(tmp_path):
+    with pytest.raises(ValueError, match="Unknown blend mode"):
+        render_sequence(0, 1, str(tmp_path / 'bad'), 'png', blend='bogus', executor='process')
+    assert render_sequence(0, 1, str(tmp_path / 'good'), 'png', executor='process')['frames'] == 2
+
+def test_calibration_change_reaches_the_shared_pool(tmp_path, monkeypatch):
+    calib_path = tmp_path / "calib_velo_to_cam.txt"
+    original = open(settings.CALIB_VELO_TO_CAM).read()
+    calib_path.write_text(original)
+    monkeypatch.setattr(settings, "CALIB_VELO_TO_CAM", str(calib_path))
+
+    def render_both(name:str)->list:
+        outputs = []
+        for executor in ('process', 'thread'):
+            out_dir = tmp_path / f"{name}_{executor}"
+            render_sequence(0, 1, str(out_dir), 'png', executor=executor)
+            outputs.append([cv2.imread(str(out_dir / sequence_frame_name(n, 'png'))).tobytes() for n in range(2)])
+        assert outputs[0] == outputs[1]
+        return outputs[0]
+
+    before = render_both("before")
+    calib_path.write_text(original.replace("T: -1.377769e-02", "T: 4.862231e-01"))
+    stat = os.stat(calib_path)
+    os.utime(calib_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    assert render_both("after") != before
@@ -0,0 +1,73 @@
+import numpy as np
+import pandas as pd
+import pytest
+from extraction.helper import closest_index
+from extraction.sync import synchronize_columns, synchronize_frame_pandas
+from extraction.sync_index import query_nearest
+from extraction.lidar_store import LidarStore, STORE_INDEX_NAME
+from benchmarks.bench_sync import assert_equivalent
+
+#timestamps are multiples of 1/8 s so ties are exact in floating point
+LIDAR = {1.0 + 0.125 * i: f"lidar_{i}.npy" for i in range(16)}  #8 Hz
+IMAGE = {0.875 + 0.25 * i: f"image_{i}.npy" for i in range(9)}  #4 Hz reference, starts before and ends after the lidar
+
+def imu_frame(timestamps)->pd.DataFrame:
+    timestamps = np.asarray(timestamps, dtype=np.float64)
+    return pd.DataFrame({
+        "timestamp": timestamps,
+        "angular_velocity_x": np.sin(timestamps),
+        "linear_acceleration_z": 9.81 + np.cos(timestamps),
+    })
+
+def gps_frame(timestamps)->pd.DataFrame:
+    timestamps = np.asarray(timestamps, dtype=np.float64)
+    return pd.DataFrame({
+        "timestamp": timestamps,
+        "latitude": 33.77 + 1e-5 * timestamps ** 2,
+        "longitude": -84.39 + 2e-5 * timestamps,
+        "altitude": 290.0 + timestamps,
+    })
+
+def synchronize_both(imu_df:pd.DataFrame, gps_df:pd.DataFrame)->tuple:
+    numpy_df = pd.DataFrame(synchronize_columns(LIDAR, IMAGE, imu_df, gps_df))
+    pandas_df = synchronize_frame_pandas(LIDAR, IMAGE, imu_df, gps_df)
+    return numpy_df, pandas_df
+
+def test_ties_go_left():
+    #8 Hz IMU offset by 1/16 s: every reference timestamp is exactly between two samples
+    imu_df = imu_frame(0.8125 + 0.125 * np.arange(20))
+    numpy_df, pandas_df = synchronize_both(imu_df, gps_frame([1.0, 2.0, 3.0]))
+    assert_equivalent(numpy_df, pandas_df)
+    ref = numpy_df["timestamp"].to_numpy()
+    expected = imu_df["angular_velocity_x"].to_numpy()[np.searchsorted(imu_df["timestamp"].to_numpy(), ref) - 1]
+    assert np.array_equal(numpy_df["angular_velocity_x"].to_numpy(), expected)
+    #image is the reference (slower), the lidar sweep halfway between two frames is the earlier one
+    assert numpy_df["lidar"].tolist() == pandas_df["lidar"].tolist()
+
+def test_extrapolates_sparse_sensor_past_both_ends():
+    #1 Hz GPS covering only the middle of the ride is interpolated and extrapolated linearly
+    numpy_df, pandas_df = synchronize_both(imu_frame(np.arange(0.5, 3.5, 0.05)), gps_frame([1.5, 2.0, 2.25]))
+    assert_equivalent(numpy_df, pandas_df)
+    ref = numpy_df["timestamp"].to_numpy()
+    assert ref[0] < 1.5 and ref[-1] > 2.25
+    slope = (2.0e-5 * 2.25 - 2.0e-5 * 2.0) / 0.25
+    assert numpy_df["longitude"].iloc[-1] == pytest.approx(-84.39 + 2e-5 * 2.25 + (ref[-1] - 2.25) * slope)
+
+@pytest.mark.parametrize("imu_df", [imu_frame([]), pd.DataFrame()], ids=["no_rows", "no_columns"])
+def test_empty_imu(imu_df):
+    numpy_df, pandas_df = synchronize_both(imu_df, gps_frame([1.0, 2.0, 3.0]))
+    assert_equivalent(numpy_df, pandas_df)
+    assert len(numpy_df) == len(IMAGE)
+    for name in imu_df.columns.drop("timestamp", errors="ignore"):
+        assert numpy_df[name].isna().all()
+
+def test_nearest_lookups_share_tie_rule(tmp_path):
+    timestamps = np.array([1.0, 1.5, 2.0, 3.0])
+    queries = np.array([0.0, 1.25, 1.75, 2.5, 1.5, 9.0])
+    expected = [0, 0, 1, 2, 1, 3]
+    assert closest_index(timestamps, queries).tolist() == expected
+    index = {"timestamp": timestamps, "lidar": np.array(["a", "b", "c", "d"])}
+    assert [query_nearest(index, t)["lidar"] for t in queries] == ["abcd"[i] for i in expected]
+    np.savez(tmp_path / STORE_INDEX_NAME, timestamps=timestamps, offsets=np.zeros(len(timestamps) + 1, dtype=np.int64))
+    store = LidarStore(str(tmp_path))
+    assert [store.nearest(t) for t in queries] == expected
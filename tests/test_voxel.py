@@ -0,0 +1,84 @@
+import os
+import numpy as np
+import pytest
+from extraction import voxel
+from extraction.voxel import voxel_downsample, write_lod_levels, load_lod, load_record_lod, lod_path
+from extraction.lidar_store import write_lidar_store
+from extraction.lidar_ex import read_lidar_from_folder
+
+def cloud(n:int = 2000, seed:int = 0)->np.ndarray:
+    rng = np.random.default_rng(seed)
+    points = np.empty((n, 4), dtype=np.float32)
+    points[:, :3] = rng.uniform(-5, 5, (n, 3))
+    points[:, 3] = rng.random(n)
+    return points
+
+def reference_downsample(points:np.ndarray, voxel_size:float, mode:str)->np.ndarray:
+    """Dict of voxel -> points, in order of the first hit"""
+    voxels = {}
+    for point in points:
+        voxels.setdefault(tuple(np.floor(point[:3] / voxel_size).astype(np.int64)), []).append(point)
+    if mode == 'first':
+        return np.array([members[0] for members in voxels.values()], dtype=np.float32)
+    return np.array([np.mean(np.array(members, dtype=np.float64), axis=0) for members in voxels.values()], dtype=np.float32)
+
+@pytest.mark.parametrize("mode", ["centroid", "first"])
+@pytest.mark.parametrize("voxel_size", [0.5, 2.0])
+def test_matches_reference(mode, voxel_size):
+    points = cloud()
+    np.testing.assert_allclose(voxel_downsample(points, voxel_size, mode), reference_downsample(points, voxel_size, mode), atol=1e-5)
+
+def test_invalid_arguments():
+    with pytest.raises(ValueError, match="voxel mode"):
+        voxel_downsample(cloud(), 1.0, 'median')
+    with pytest.raises(ValueError, match="positive"):
+        voxel_downsample(cloud(), 0, 'first')
+    assert voxel_downsample(np.empty((0, 4), dtype=np.float32), 1.0).shape == (0, 4)
+
+def test_level_selection(tmp_path, monkeypatch):
+    points = cloud()
+    sizes = [0.5, 2.0]
+    sweep_path = str(tmp_path / "lidar_1_000000000.npy")
+    np.save(sweep_path, points)
+    assert write_lod_levels(points, sweep_path, sizes) == [lod_path(sweep_path, 1), lod_path(sweep_path, 2)]
+
+    np.testing.assert_array_equal(load_lod(sweep_path, 0, sizes), points)
+    levels = [load_lod(sweep_path, level, sizes) for level in (1, 2)]
+    assert len(points) > len(levels[0]) > len(levels[1])
+    #precomputed files are used as is
+    calls = []
+    monkeypatch.setattr(voxel, "voxel_downsample", lambda *args: calls.append(args) or args[0])
+    np.testing.assert_array_equal(load_lod(sweep_path, 2, sizes), levels[1])
+    assert calls == []
+    #a missing level is computed from the full sweep with its voxel size
+    os.remove(lod_path(sweep_path, 2))
+    load_lod(sweep_path, 2, sizes, 'first')
+    assert calls[0][1:] == (2.0, 'first')
+    for level in (-1, 3):
+        with pytest.raises(ValueError, match="Unknown LOD level"):
+            load_lod(sweep_path, level, sizes)
+    with pytest.raises(ValueError, match="expected 0..0"):
+        load_lod(sweep_path, 1, [])
+
+def test_packed_store_records_downsample_on_request(tmp_path):
+    src = tmp_path / "src"
+    src.mkdir()
+    points = cloud()
+    points.tofile(src / "lidar_1_000000000.bin")
+    store = write_lidar_store(str(src), str(tmp_path / "store"))
+    record = {"lidar_store": store.store_dir, "lidar_frame": 0}
+    np.testing.assert_array_equal(load_record_lod(record, 0, [1.0]), points)
+    np.testing.assert_allclose(load_record_lod(record, 1, [1.0]), reference_downsample(points, 1.0, 'centroid'), atol=1e-5)
+    with pytest.raises(ValueError, match="Unknown LOD level"):
+        load_record_lod(record, 2, [1.0])
+
+def test_ingest_rewrites_levels_when_sizes_change(tmp_path):
+    src, out = tmp_path / "src", str(tmp_path / "out")
+    src.mkdir()
+    cloud().tofile(src / "lidar_1_000000000.bin")
+    sweep_path = read_lidar_from_folder(str(src), out)[1.0]
+    assert not os.path.exists(lod_path(sweep_path, 1))
+    read_lidar_from_folder(str(src), out, lod_voxel_sizes=[2.0])
+    coarse = len(np.load(lod_path(sweep_path, 1)))
+    read_lidar_from_folder(str(src), out, lod_voxel_sizes=[0.5])
+    assert len(np.load(lod_path(sweep_path, 1))) > coarse